@@ -1,5 +1,28 @@
 from django.contrib import admin
 from .models import *
+from .conteo import PaginadorEstimado
+
+
+class ConteoEstimadoAdmin(admin.ModelAdmin):
+    """Changelist sin COUNT(*) exactos sobre tablas grandes (ver gestion/conteo.py)"""
+    paginator = PaginadorEstimado
+    # Evita el segundo COUNT(*) sobre toda la tabla cuando hay filtros
+    show_full_result_count = False
+
+
+class SoloLecturaAdmin:
+    """
+    Tablas derivadas que mantienen las señales y los comandos rebuild_*:
+    editarlas a mano las desalinearía del histórico, así que solo se consultan.
+    """
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
@@ -18,19 +41,72 @@ class ProveedorAdmin(admin.ModelAdmin):
     search_fields = ('empresa', 'telefono', 'productos')
 
 @admin.register(Compra)
-class CompraAdmin(admin.ModelAdmin):
+class CompraAdmin(ConteoEstimadoAdmin):
     list_display = ('id_compra', 'numero_factura', 'fecha', 'id_proveedor', 'id_producto', 'costo_total', 'cantidad')
     list_filter = ('fecha', 'id_proveedor')
     search_fields = ('numero_factura',)
 
 @admin.register(Venta)
-class VentaAdmin(admin.ModelAdmin):
+class VentaAdmin(ConteoEstimadoAdmin):
     list_display = ('id_venta', 'id_producto', 'id_cliente', 'precio', 'cantidad', 'fecha_creacion')
     list_filter = ('fecha_creacion', 'id_cliente')
     date_hierarchy = 'fecha_creacion'
 
 @admin.register(HistorialPrecio)
-class HistorialPrecioAdmin(admin.ModelAdmin):
+class HistorialPrecioAdmin(ConteoEstimadoAdmin):
     list_display = ('id_precio', 'id_producto', 'fecha', 'precio_sugerido')
     list_filter = ('fecha',)
-    date_hierarchy = 'fecha'
\ No newline at end of file
+    date_hierarchy = 'fecha'
+
+@admin.register(StockProducto)
+class StockProductoAdmin(SoloLecturaAdmin, admin.ModelAdmin):
+    list_display = ('id_producto', 'total_compras', 'total_ventas', 'stock_actual', 'precio_venta', 'fecha_precio')
+    search_fields = ('id_producto__nombre',)
+    readonly_fields = (
+        'id_producto', 'total_compras', 'total_ventas', 'stock_actual', 'costo_promedio',
+        'fecha_ultima_compra', 'fecha_ultima_venta', 'precio_venta', 'fecha_precio', 'id_precio',
+    )
+
+@admin.register(CierreInventario)
+class CierreInventarioAdmin(SoloLecturaAdmin, ConteoEstimadoAdmin):
+    list_display = ('id_producto', 'fecha', 'total_compras', 'total_ventas', 'stock_actual')
+    list_filter = ('fecha',)
+    date_hierarchy = 'fecha'
+    readonly_fields = ('id_producto', 'fecha', 'total_compras', 'total_ventas', 'stock_actual', 'costo_promedio', 'fecha_creacion')
+
+@admin.register(ResumenVentaProducto)
+class ResumenVentaProductoAdmin(SoloLecturaAdmin, ConteoEstimadoAdmin):
+    list_display = ('id_producto', 'granularidad', 'periodo', 'unidades', 'ingresos', 'numero_ventas')
+    list_filter = ('granularidad',)
+    date_hierarchy = 'periodo'
+    readonly_fields = ('id_producto', 'granularidad', 'periodo', 'unidades', 'ingresos', 'numero_ventas', 'fecha_actualizacion')
+
+@admin.register(ResumenVentaCliente)
+class ResumenVentaClienteAdmin(SoloLecturaAdmin, ConteoEstimadoAdmin):
+    list_display = ('id_cliente', 'granularidad', 'periodo', 'unidades', 'ingresos', 'numero_ventas')
+    list_filter = ('granularidad',)
+    date_hierarchy = 'periodo'
+    readonly_fields = ('id_cliente', 'granularidad', 'periodo', 'unidades', 'ingresos', 'numero_ventas', 'fecha_actualizacion')
+
+@admin.register(Job)
+class JobAdmin(ConteoEstimadoAdmin):
+    list_display = ('id', 'tipo', 'estado', 'intentos', 'progreso', 'total', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('estado', 'tipo')
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+
+@admin.register(IndiceBusqueda)
+class IndiceBusquedaAdmin(ConteoEstimadoAdmin):
+    list_display = ('tipo', 'objeto_id', 'titulo', 'detalle', 'fecha_actualizacion')
+    list_filter = ('tipo',)
+    search_fields = ('titulo',)
+    readonly_fields = ('fecha_actualizacion',)
+
+@admin.register(TokenTerminal)
+class TokenTerminalAdmin(admin.ModelAdmin):
+    # Se crean con manage.py create_terminal_token; aquí solo se desactivan
+    list_display = ('nombre', 'activo', 'ultimo_uso', 'fecha_creacion')
+    list_filter = ('activo',)
+    readonly_fields = ('nombre', 'ultimo_uso', 'fecha_creacion')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,358 @@
+"""
+Búsqueda de texto con índices.
+
+Las listas no buscan con ``icontains`` encadenados sobre joins sino que piden
+al backend los ids que coinciden en cada modelo, y filtran con ``pk__in`` o
+``id_producto__in``. Así cada búsqueda usa el índice del modelo buscado:
+
+- PostgreSQL: índices GIN ``gin_trgm_ops`` (pg_trgm) que resuelven ILIKE
+  '%texto%' y ordenan por similitud de trigramas.
+- SQLite: tablas FTS5 con tokenizador trigram, sincronizadas por triggers,
+  ordenadas por bm25.
+- Cualquier otra base de datos (o si faltan los índices): ``icontains``.
+
+El backend se elige según la base de datos o con ``BUSQUEDA_BACKEND``.
+Los índices los crean las migraciones 0011 y 0012 (``IndiceBusqueda``, ver
+gestion/indice.py), con su SQL copiado en la propia migración, y
+``manage.py rebuild_search_index``.
+
+En SQLite, una migración que rehace una tabla indexada (AddField con
+default, AlterField, RemoveField...) borra sus triggers de FTS5 sin avisar.
+``reparar_indices`` los repone tras cada ``migrate`` (receiver post_migrate
+en models.py). Una migración que rehaga una tabla indexada y escriba en ella
+debe reponerlos por su cuenta al final, con el 'rebuild' de FTS5 que
+resincroniza lo escrito sin triggers: la 0013 lo hace después de poblar_clave.
+"""
+import sqlite3
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, F, Case, When, Value, Window, IntegerField, Lookup
+from django.db.models.functions import RowNumber
+from django.utils.module_loading import import_string
+
+from .models import Producto, Cliente, Proveedor, Compra, IndiceBusqueda
+
+# Modelo -> campos indexados
+INDICES = {
+    Producto: ('nombre', 'marca'),
+    Cliente: ('nombre', 'apellido'),
+    Proveedor: ('empresa', 'telefono', 'productos'),
+    Compra: ('numero_factura',),
+    IndiceBusqueda: ('texto',),
+}
+
+# El tokenizador trigram de FTS5 necesita SQLite 3.34 y al menos 3 caracteres
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+MINIMO_TRIGRAMA = 3
+
+
+class Ilike(Lookup):
+    """
+    ``Ilike(F(campo), patron)`` (solo PostgreSQL): a diferencia de icontains,
+    usa los índices trigram. Se usa como expresión y no se registra como
+    lookup, así que no añade ``__ilike`` a todos los CharField del proyecto.
+    """
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
+
+
+def _patron_like(texto):
+    escapado = texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escapado}%'
+
+
+class BusquedaLike:
+    """Sin índices: icontains sobre cada campo, en cualquier base de datos"""
+
+    def coincidencias(self, modelo, texto, campos):
+        """Subconsulta con las pks de ``modelo`` que coinciden con ``texto``"""
+        condicion = Q()
+        for campo in campos:
+            condicion |= Q(**{f'{campo}__icontains': texto})
+        return modelo.objects.filter(condicion).values('pk')
+
+    def relevancia(self, texto, campos):
+        """Expresión de relevancia: coincidencia exacta, al inicio o en medio"""
+        relevancia = Value(0)
+        for campo in campos:
+            relevancia = relevancia + Case(
+                When(**{f'{campo}__iexact': texto}, then=Value(3)),
+                When(**{f'{campo}__istartswith': texto}, then=Value(2)),
+                When(**{f'{campo}__icontains': texto}, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        return relevancia
+
+    def _anotados(self, modelo, texto, campos):
+        return modelo.objects.filter(
+            pk__in=self.coincidencias(modelo, texto, campos)
+        ).annotate(relevancia=self.relevancia(texto, campos))
+
+    def ranking(self, modelo, texto, campos, limite):
+        """[(pk, relevancia)] de mayor a menor relevancia"""
+        return list(
+            self._anotados(modelo, texto, campos)
+            .order_by('-relevancia', 'pk')
+            .values_list('pk', 'relevancia')[:limite]
+        )
+
+    def ranking_agrupado(self, modelo, texto, campos, grupo, limite, columnas):
+        """
+        Las ``limite`` filas más relevantes de cada valor de ``grupo``, en una
+        sola consulta: dicts con ``columnas`` y ``relevancia``
+        """
+        return list(
+            self._anotados(modelo, texto, campos)
+            .annotate(posicion=Window(
+                RowNumber(), partition_by=F(grupo), order_by=[F('relevancia').desc(), F('pk').asc()]
+            ))
+            .filter(posicion__lte=limite)
+            .order_by(grupo, 'posicion')
+            .values(*columnas, 'relevancia')
+        )
+
+
+class BusquedaPostgres(BusquedaLike):
+    """ILIKE sobre índices GIN de trigramas y orden por similitud"""
+
+    def coincidencias(self, modelo, texto, campos):
+        patron = _patron_like(texto)
+        condicion = Q()
+        for campo in campos:
+            condicion |= Q(Ilike(F(campo), patron))
+        return modelo.objects.filter(condicion).values('pk')
+
+    def relevancia(self, texto, campos):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models.functions import Coalesce, Greatest
+
+        similitudes = [Coalesce(TrigramWordSimilarity(texto, campo), Value(0.0)) for campo in campos]
+        return Greatest(*similitudes) if len(similitudes) > 1 else similitudes[0]
+
+
+class BusquedaSqliteFts(BusquedaLike):
+    """Tablas FTS5 (tokenizador trigram) sincronizadas por triggers"""
+
+    def __init__(self):
+        self._tablas = None
+
+    def _disponible(self, modelo, texto):
+        if len(texto) < MINIMO_TRIGRAMA:
+            return False
+        tabla = tabla_fts(modelo)
+        # Una tabla que falta se vuelve a buscar (pudo crearse después);
+        # reparar_indices y crear_indices descartan el backend tras migrar
+        if self._tablas is None or tabla not in self._tablas:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s", ['%_fts'])
+                self._tablas = {fila[0] for fila in cursor.fetchall()}
+        return tabla in self._tablas
+
+    def _consulta(self, modelo, texto, campos):
+        frase = '"{}"'.format(texto.replace('"', '""'))
+        if set(campos) == set(INDICES[modelo]):
+            return frase
+        return '{%s} : %s' % (' '.join(campos), frase)
+
+    def coincidencias(self, modelo, texto, campos):
+        if not self._disponible(modelo, texto):
+            return super().coincidencias(modelo, texto, campos)
+        from django.db.models.expressions import RawSQL
+        tabla = tabla_fts(modelo)
+        return RawSQL(f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s', [self._consulta(modelo, texto, campos)])
+
+    def ranking(self, modelo, texto, campos, limite):
+        if not self._disponible(modelo, texto):
+            return super().ranking(modelo, texto, campos, limite)
+        tabla = tabla_fts(modelo)
+        with connection.cursor() as cursor:
+            # bm25 es negativo: cuanto menor, más relevante
+            cursor.execute(
+                f'SELECT rowid, -bm25({tabla}) FROM {tabla} WHERE {tabla} MATCH %s ORDER BY bm25({tabla}), rowid LIMIT %s',
+                [self._consulta(modelo, texto, campos), limite],
+            )
+            return cursor.fetchall()
+
+    def ranking_agrupado(self, modelo, texto, campos, grupo, limite, columnas):
+        if not self._disponible(modelo, texto):
+            return super().ranking_agrupado(modelo, texto, campos, grupo, limite, columnas)
+        tabla = modelo._meta.db_table
+        fts = tabla_fts(modelo)
+        pk = modelo._meta.pk.column
+        grupo = modelo._meta.get_field(grupo).column
+        seleccion = ', '.join(f'i.{modelo._meta.get_field(columna).column}' for columna in columnas)
+        with connection.cursor() as cursor:
+            # bm25 solo puede usarse junto al MATCH: se calcula en la subconsulta
+            cursor.execute(
+                f"""
+                SELECT * FROM (
+                    SELECT {seleccion}, m.relevancia,
+                           ROW_NUMBER() OVER (PARTITION BY i.{grupo} ORDER BY m.relevancia DESC, i.{pk}) AS posicion
+                    FROM (SELECT rowid AS id, -bm25({fts}) AS relevancia FROM {fts} WHERE {fts} MATCH %s) m
+                    JOIN {tabla} i ON i.{pk} = m.id
+                ) WHERE posicion <= %s
+                ORDER BY {grupo}, posicion
+                """,
+                [self._consulta(modelo, texto, campos), limite],
+            )
+            return [dict(zip((*columnas, 'relevancia'), fila[:-1])) for fila in cursor.fetchall()]
+
+
+_backend = None
+
+
+def get_backend():
+    """Backend de búsqueda configurado o el adecuado a la base de datos"""
+    global _backend
+    if _backend is None:
+        ruta = getattr(settings, 'BUSQUEDA_BACKEND', None)
+        if ruta:
+            _backend = import_string(ruta)()
+        elif connection.vendor == 'postgresql':
+            _backend = BusquedaPostgres()
+        elif connection.vendor == 'sqlite' and SQLITE_TRIGRAM:
+            _backend = BusquedaSqliteFts()
+        else:
+            _backend = BusquedaLike()
+    return _backend
+
+
+def filtrar(queryset, texto, campos=(), relaciones=None):
+    """
+    Filtra ``queryset`` por ``texto`` en sus ``campos`` o en los de modelos
+    relacionados, p. ej. ``relaciones={'id_producto': ('nombre',)}``.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return queryset
+    backend = get_backend()
+    condicion = Q()
+    if campos:
+        condicion |= Q(pk__in=backend.coincidencias(queryset.model, texto, campos))
+    for campo, campos_relacion in (relaciones or {}).items():
+        modelo = queryset.model._meta.get_field(campo).related_model
+        condicion |= Q(**{f'{campo}__in': backend.coincidencias(modelo, texto, campos_relacion)})
+    return queryset.filter(condicion)
+
+
+def buscar(modelo, texto, campos=None, limite=20):
+    """Instancias de ``modelo`` que coinciden con ``texto``, de más a menos relevantes"""
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    ranking = get_backend().ranking(modelo, texto, campos or INDICES[modelo], limite)
+    objetos = modelo.objects.in_bulk([pk for pk, _ in ranking])
+    resultados = []
+    for pk, relevancia in ranking:
+        if pk in objetos:
+            objetos[pk].relevancia = relevancia
+            resultados.append(objetos[pk])
+    return resultados
+
+
+# -------------------- Índices -------------------- #
+def tabla_fts(modelo):
+    return f'{modelo._meta.db_table}_fts'
+
+
+def _sql_sqlite(tabla, pk, campos):
+    fts = f'{tabla}_fts'
+    columnas = ', '.join(campos)
+    nuevos = ', '.join(f'new.{campo}' for campo in campos)
+    viejos = ', '.join(f'old.{campo}' for campo in campos)
+    borrar = f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.{pk}, {viejos});"
+    insertar = f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.{pk}, {nuevos});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columnas}, content='{tabla}', content_rowid='{pk}', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabla} BEGIN {borrar} {insertar} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _sql_postgres(tabla, pk, campos):
+    return [
+        f'CREATE INDEX IF NOT EXISTS {tabla}_{campo}_trgm ON {tabla} USING gin ({campo} gin_trgm_ops)'
+        for campo in campos
+    ]
+
+
+def _modelos(tablas):
+    return [modelo for modelo in INDICES if tablas is None or modelo._meta.db_table in tablas]
+
+
+def sql_indices(vendor, tablas=None):
+    """
+    Sentencias (idempotentes) que crean los índices de búsqueda para
+    ``vendor``, de todas las tablas indexadas o solo de ``tablas``
+    """
+    sentencias = []
+    if vendor == 'postgresql':
+        sentencias.append('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        generar = _sql_postgres
+    elif vendor == 'sqlite' and SQLITE_TRIGRAM:
+        generar = _sql_sqlite
+    else:
+        return sentencias
+    for modelo in _modelos(tablas):
+        sentencias.extend(generar(modelo._meta.db_table, modelo._meta.pk.column, INDICES[modelo]))
+    return sentencias
+
+
+def sql_eliminar_indices(vendor, tablas=None):
+    sentencias = []
+    for modelo in _modelos(tablas):
+        campos = INDICES[modelo]
+        tabla = modelo._meta.db_table
+        if vendor == 'postgresql':
+            sentencias.extend(f'DROP INDEX IF EXISTS {tabla}_{campo}_trgm' for campo in campos)
+        elif vendor == 'sqlite':
+            sentencias.extend(f'DROP TRIGGER IF EXISTS {tabla}_fts_{sufijo}' for sufijo in ('ai', 'ad', 'au'))
+            sentencias.append(f'DROP TABLE IF EXISTS {tabla}_fts')
+    return sentencias
+
+
+def reparar_indices(conexion=None):
+    """
+    Repone los triggers de FTS5 que falten y resincroniza esas tablas.
+    Devuelve las tablas reparadas; fuera de SQLite no hace nada.
+    """
+    global _backend
+    conexion = conexion or connection
+    if conexion.vendor != 'sqlite' or not SQLITE_TRIGRAM:
+        return []
+    # La migración pudo crear o borrar tablas FTS: el backend las vuelve a leer
+    _backend = None
+    reparadas = []
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existentes = {fila[0] for fila in cursor.fetchall()}
+        for modelo in INDICES:
+            tabla = modelo._meta.db_table
+            fts = f'{tabla}_fts'
+            # Sin tabla FTS la migración que la crea aún no se aplicó
+            if tabla not in existentes or fts not in existentes:
+                continue
+            if all(f'{fts}_{sufijo}' in existentes for sufijo in ('ai', 'ad', 'au')):
+                continue
+            for sentencia in _sql_sqlite(tabla, modelo._meta.pk.column, INDICES[modelo]):
+                cursor.execute(sentencia)
+            reparadas.append(tabla)
+    return reparadas
+
+
+def crear_indices(conexion=None):
+    """Crea (o reconstruye) los índices de búsqueda en la base de datos"""
+    global _backend
+    conexion = conexion or connection
+    with conexion.cursor() as cursor:
+        for sentencia in sql_indices(conexion.vendor):
+            cursor.execute(sentencia)
+    _backend = None
@@ -0,0 +1,102 @@
+"""
+Caché del inventario basada en una versión global.
+
+Cada escritura sobre Compra, Venta, HistorialPrecio o Producto incrementa la
+versión, así que las lecturas se sirven desde la caché hasta que los datos
+cambian de verdad.
+
+Los contadores de versión se guardan en la base de datos (VersionCache), no
+en la caché: un incremento hecho por un worker de run_workers, un comando o
+otro proceso de gunicorn invalida a todos los demás aunque cada uno tenga su
+propia LocMemCache. Leer las versiones cuesta una consulta por clave primaria;
+los valores cacheados siguen en el backend configurado.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+VERSION_KEY = 'inventario:version'
+HITS_KEY = 'inventario:hits'
+MISSES_KEY = 'inventario:misses'
+
+def _timeout():
+    return getattr(settings, 'INVENTARIO_CACHE_TIMEOUT', 300)
+
+def _incrementar(key):
+    """Incrementa un contador de la caché creándolo si no existe"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, None):
+            return 1
+        return cache.incr(key)
+
+def get_version(key):
+    """Valor actual de un contador de versión (1 mientras no se haya incrementado)"""
+    return get_versiones([key])[key]
+
+def get_versiones(keys):
+    """Varios contadores de versión en una sola consulta"""
+    from .models import VersionCache
+    versiones = dict(VersionCache.objects.filter(clave__in=keys).values_list('clave', 'version'))
+    return {key: versiones.get(key, 1) for key in keys}
+
+def _incrementar_version(key):
+    """Incrementa un contador de versión para todos los procesos y devuelve el nuevo valor"""
+    from .models import VersionCache
+    if not VersionCache.objects.filter(clave=key).update(version=F('version') + 1):
+        _, creada = VersionCache.objects.get_or_create(clave=key, defaults={'version': 2})
+        if not creada:
+            VersionCache.objects.filter(clave=key).update(version=F('version') + 1)
+    return get_version(key)
+
+def get_version_inventario():
+    """Versión actual del inventario"""
+    return get_version(VERSION_KEY)
+
+def incrementar_version_inventario():
+    """Invalida todo lo cacheado del inventario"""
+    return _incrementar_version(VERSION_KEY)
+
+def cache_inventario(nombre, calcular):
+    """
+    Devuelve el valor cacheado para la versión actual del inventario,
+    calculándolo y guardándolo si no existe
+    """
+    key = f'inventario:{get_version_inventario()}:{nombre}'
+    valor = cache.get(key)
+    if valor is not None:
+        _incrementar(HITS_KEY)
+        return valor
+
+    _incrementar(MISSES_KEY)
+    valor = calcular()
+    cache.set(key, valor, _timeout())
+    return valor
+
+def get_estadisticas_cache():
+    """Contadores de aciertos y fallos de la caché del inventario"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': get_version_inventario(),
+        'hits': hits,
+        'misses': misses,
+        'ratio': hits / total if total else 0.0,
+    }
+
+def reiniciar_estadisticas_cache():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+DASHBOARD_VERSION_KEY = 'dashboard:version:{}'
+
+def get_versiones_dashboard(grupos):
+    """Versión actual de cada grupo de datos del dashboard"""
+    keys = {grupo: DASHBOARD_VERSION_KEY.format(grupo) for grupo in grupos}
+    versiones = get_versiones(list(keys.values()))
+    return {grupo: versiones[key] for grupo, key in keys.items()}
+
+def incrementar_version_dashboard(grupo):
+    """Invalida los widgets del dashboard que dependen de ``grupo``"""
+    return _incrementar_version(DASHBOARD_VERSION_KEY.format(grupo))
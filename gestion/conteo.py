@@ -0,0 +1,94 @@
+"""
+Conteo de filas para paginar sin pagar un COUNT(*) completo en cada página.
+
+Primero se cuenta con un LIMIT de ``umbral + 1`` filas: si el resultado cabe
+en el umbral, ese es el total exacto. Por encima se usa la estimación del
+planificador si la consulta no tiene filtros (pg_class.reltuples en
+PostgreSQL, sqlite_stat1 en SQLite tras un ANALYZE) o, si no, un COUNT(*)
+exacto que se guarda en la caché unos minutos.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def _umbral():
+    return getattr(settings, 'CONTEO_EXACTO_HASTA', 10000)
+
+
+def _timeout():
+    return getattr(settings, 'CONTEO_CACHE_TIMEOUT', 300)
+
+
+def estimar_filas_tabla(modelo, using='default'):
+    """Filas de la tabla de ``modelo`` según las estadísticas de la base de datos, o None"""
+    connection = connections[using]
+    tabla = modelo._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(tabla)])
+            elif connection.vendor == 'sqlite':
+                # La primera cifra de stat es el número de filas de la tabla
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [tabla])
+            else:
+                return None
+            fila = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 no existe hasta el primer ANALYZE
+        return None
+    if not fila or fila[0] is None:
+        return None
+    filas = int(float(str(fila[0]).split()[0]))
+    # reltuples vale -1 en tablas que nunca se analizaron
+    return filas if filas >= 0 else None
+
+
+def conteo_cacheado(queryset):
+    """COUNT(*) exacto de ``queryset`` guardado en la caché por consulta"""
+    sql, params = queryset.query.sql_with_params()
+    clave = hashlib.md5(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+    return cache.get_or_set(f'conteo:{clave}', queryset.count, _timeout())
+
+
+def contar(queryset, umbral=None):
+    """
+    Total de filas de ``queryset``. Devuelve (total, estimado); ``estimado``
+    indica que el total puede no ser exacto.
+    """
+    umbral = umbral or _umbral()
+    queryset = queryset.order_by()
+    acotado = queryset.values('pk')[:umbral + 1].count()
+    if acotado <= umbral:
+        return acotado, False
+
+    sin_filtros = not queryset.query.where and not queryset.query.distinct and not queryset.query.combinator
+    if sin_filtros:
+        estimado = estimar_filas_tabla(queryset.model, queryset.db)
+        if estimado is not None and estimado > umbral:
+            return estimado, True
+    return conteo_cacheado(queryset), True
+
+
+class PaginadorEstimado(Paginator):
+    """Paginator que usa ``contar()`` en lugar de un COUNT(*) exacto"""
+
+    umbral = None
+
+    @cached_property
+    def _conteo(self):
+        if hasattr(self.object_list, 'query'):
+            return contar(self.object_list, self.umbral)
+        return len(self.object_list), False
+
+    @cached_property
+    def count(self):
+        return self._conteo[0]
+
+    @property
+    def count_estimado(self):
+        return self._conteo[1]
@@ -0,0 +1,279 @@
+"""
+Costo promedio ponderado móvil por producto.
+
+Cada compra recalcula el costo promedio ponderando el stock existente y la
+cantidad comprada; cada venta consume stock al costo promedio vigente sin
+modificarlo. El valor del inventario es siempre ``stock * costo_promedio``.
+
+Los movimientos que llegan en orden (lo habitual) se aplican en O(1) sobre
+StockProducto. Las ediciones, eliminaciones y movimientos con fecha pasada
+reproducen solo ese producto a partir de su último cierre mensual.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Q, F
+from django.utils import timezone
+
+from .models import Compra, Venta, StockProducto, CierreInventario
+
+PRECISION = Decimal('0.0001')
+
+# En un mismo día las compras se aplican antes que las ventas
+COMPRA, VENTA = 0, 1
+
+# Productos entre avisos de progreso al reproducir el histórico
+LOTE_PROGRESO = 1000
+
+
+def aplicar_compra(stock, costo_promedio, cantidad, costo_unitario):
+    """Devuelve (stock, costo_promedio) tras una compra"""
+    nuevo_stock = stock + cantidad
+    costo_unitario = Decimal(costo_unitario)
+    if stock <= 0 or nuevo_stock <= 0:
+        # Sin existencias previas el costo es el de la compra
+        return nuevo_stock, costo_unitario.quantize(PRECISION)
+    costo = (stock * Decimal(costo_promedio) + cantidad * costo_unitario) / nuevo_stock
+    return nuevo_stock, costo.quantize(PRECISION)
+
+
+def aplicar_venta(stock, costo_promedio, cantidad):
+    """Devuelve (stock, costo_promedio) tras una venta; el promedio no cambia"""
+    return stock - cantidad, costo_promedio
+
+
+def movimiento_compra(fecha, id_compra, cantidad, costo_unitario):
+    return (fecha, COMPRA, id_compra, cantidad, costo_unitario)
+
+
+def movimiento_venta(fecha_creacion, id_venta, cantidad):
+    return (timezone.localdate(fecha_creacion), VENTA, (fecha_creacion, id_venta), cantidad, None)
+
+
+def reproducir(estado, movimientos):
+    """
+    Aplica una lista de movimientos (ya ordenados) sobre un estado
+    ``{'total_compras', 'total_ventas', 'costo_promedio', 'fecha_ultima_compra', 'fecha_ultima_venta'}``
+    """
+    stock = estado['total_compras'] - estado['total_ventas']
+    costo = estado['costo_promedio']
+    for fecha, tipo, _, cantidad, costo_unitario in movimientos:
+        if tipo == COMPRA:
+            stock, costo = aplicar_compra(stock, costo, cantidad, costo_unitario)
+            estado['total_compras'] += cantidad
+            estado['fecha_ultima_compra'] = fecha
+        else:
+            stock, costo = aplicar_venta(stock, costo, cantidad)
+            estado['total_ventas'] += cantidad
+            estado['fecha_ultima_venta'] = fecha
+    estado['costo_promedio'] = costo
+    return estado
+
+
+def estado_vacio():
+    return {
+        'total_compras': 0,
+        'total_ventas': 0,
+        'costo_promedio': Decimal('0'),
+        'fecha_ultima_compra': None,
+        'fecha_ultima_venta': None,
+    }
+
+
+def estado_desde_cierre(cierre):
+    """Estado inicial a partir de un cierre (dict con los campos de CierreInventario)"""
+    if not cierre:
+        return estado_vacio()
+    return {
+        'total_compras': cierre['total_compras'],
+        'total_ventas': cierre['total_ventas'],
+        'costo_promedio': cierre['costo_promedio'],
+        # Cota inferior de la fecha del último movimiento de cada tipo
+        'fecha_ultima_compra': cierre['fecha'],
+        'fecha_ultima_venta': cierre['fecha'],
+    }
+
+
+def _inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def movimientos_producto(producto_id, despues_de=None, hasta=None):
+    """Compras y ventas de un producto, ordenadas, posteriores al día ``despues_de``"""
+    compras = Compra.objects.filter(id_producto=producto_id)
+    ventas = Venta.objects.filter(id_producto=producto_id)
+    if despues_de:
+        compras = compras.filter(fecha__gt=despues_de)
+        ventas = ventas.filter(fecha_creacion__gte=_inicio_dia(despues_de + timedelta(days=1)))
+    if hasta:
+        compras = compras.filter(fecha__lte=hasta)
+        ventas = ventas.filter(fecha_creacion__lt=_inicio_dia(hasta + timedelta(days=1)))
+
+    movimientos = [
+        movimiento_compra(*fila)
+        for fila in compras.values_list('fecha', 'id_compra', 'cantidad', 'costo_unitario')
+    ]
+    movimientos.extend(
+        movimiento_venta(*fila)
+        for fila in ventas.values_list('fecha_creacion', 'id_venta', 'cantidad')
+    )
+    movimientos.sort(key=lambda m: m[:3])
+    return movimientos
+
+
+def recalcular_costo_producto(producto_id, desde=None):
+    """
+    Reproduce el costo de un producto a partir del último cierre anterior
+    a ``desde`` (o de todo el histórico) y lo guarda en StockProducto
+    """
+    cierre = None
+    if desde:
+        cierre = CierreInventario.objects.filter(
+            id_producto=producto_id, fecha__lt=desde
+        ).order_by('-fecha').values('fecha', 'total_compras', 'total_ventas', 'costo_promedio').first()
+
+    estado = reproducir(
+        estado_desde_cierre(cierre),
+        movimientos_producto(producto_id, despues_de=cierre['fecha'] if cierre else None),
+    )
+    StockProducto.objects.filter(id_producto=producto_id).update(
+        costo_promedio=estado['costo_promedio'],
+        fecha_ultima_compra=estado['fecha_ultima_compra'],
+        fecha_ultima_venta=estado['fecha_ultima_venta'],
+    )
+
+
+def registrar_compra(compra):
+    """
+    Aplica una compra nueva en O(1) si es posterior a todos los movimientos
+    del producto; si no, reproduce el producto desde la fecha de la compra.
+    Se llama después de sumar la cantidad al stock.
+    """
+    with transaction.atomic():
+        stock = StockProducto.objects.select_for_update().filter(id_producto=compra.id_producto_id).first()
+        if stock is None:
+            return
+        en_orden = (
+            (stock.fecha_ultima_compra is None or compra.fecha >= stock.fecha_ultima_compra) and
+            (stock.fecha_ultima_venta is None or compra.fecha > stock.fecha_ultima_venta)
+        )
+        if not en_orden:
+            recalcular_costo_producto(compra.id_producto_id, desde=compra.fecha)
+            return
+
+        # Con la misma precisión con la que se persiste, igual que al reproducir
+        costo_unitario = Decimal(compra.costo_unitario).quantize(Decimal('0.01'))
+        _, stock.costo_promedio = aplicar_compra(
+            stock.stock_actual - compra.cantidad, stock.costo_promedio, compra.cantidad, costo_unitario
+        )
+        stock.fecha_ultima_compra = compra.fecha
+        stock.save(update_fields=['costo_promedio', 'fecha_ultima_compra'])
+
+
+def registrar_venta(venta):
+    """
+    Una venta en orden no cambia el costo promedio: solo avanza la fecha
+    del último movimiento. Con fecha pasada se reproduce el producto.
+    """
+    fecha = timezone.localdate(venta.fecha_creacion)
+    en_orden = StockProducto.objects.filter(id_producto=venta.id_producto_id).filter(
+        Q(fecha_ultima_venta__isnull=True) | Q(fecha_ultima_venta__lte=fecha),
+        Q(fecha_ultima_compra__isnull=True) | Q(fecha_ultima_compra__lte=fecha),
+    ).update(fecha_ultima_venta=fecha)
+    if not en_orden:
+        recalcular_costo_producto(venta.id_producto_id, desde=fecha)
+
+
+def agrupar_por_producto(compras, ventas):
+    """Agrupa filas de compras y ventas en {producto: [movimientos ordenados]}"""
+    movimientos = {}
+    for producto_id, *fila in compras:
+        movimientos.setdefault(producto_id, []).append(movimiento_compra(*fila))
+    for producto_id, *fila in ventas:
+        movimientos.setdefault(producto_id, []).append(movimiento_venta(*fila))
+    for lista in movimientos.values():
+        lista.sort(key=lambda m: m[:3])
+    return movimientos
+
+
+def recalcular_costos(productos=None, progreso=None):
+    """
+    Reproduce todo el histórico; devuelve {producto_id: estado}.
+    Recorre compras y ventas ordenadas por producto, con un solo producto en memoria.
+    ``progreso`` recibe los productos reproducidos cada ``LOTE_PROGRESO``.
+    """
+    compras = Compra.objects.order_by('id_producto', 'fecha', 'id_compra')
+    ventas = Venta.objects.order_by('id_producto', 'fecha_creacion', 'id_venta')
+    if productos is not None:
+        compras = compras.filter(id_producto__in=productos)
+        ventas = ventas.filter(id_producto__in=productos)
+
+    grupos_compras = groupby(
+        compras.values_list('id_producto', 'fecha', 'id_compra', 'cantidad', 'costo_unitario').iterator(chunk_size=5000),
+        key=itemgetter(0),
+    )
+    grupos_ventas = groupby(
+        ventas.values_list('id_producto', 'fecha_creacion', 'id_venta', 'cantidad').iterator(chunk_size=5000),
+        key=itemgetter(0),
+    )
+
+    estados = {}
+    siguiente_compra = next(grupos_compras, None)
+    siguiente_venta = next(grupos_ventas, None)
+    while siguiente_compra or siguiente_venta:
+        producto_id = min(g[0] for g in (siguiente_compra, siguiente_venta) if g)
+        movimientos = []
+        if siguiente_compra and siguiente_compra[0] == producto_id:
+            movimientos.extend(movimiento_compra(*fila[1:]) for fila in siguiente_compra[1])
+            siguiente_compra = next(grupos_compras, None)
+        if siguiente_venta and siguiente_venta[0] == producto_id:
+            movimientos.extend(movimiento_venta(*fila[1:]) for fila in siguiente_venta[1])
+            siguiente_venta = next(grupos_ventas, None)
+        movimientos.sort(key=lambda m: m[:3])
+        estados[producto_id] = reproducir(estado_vacio(), movimientos)
+        if progreso and len(estados) % LOTE_PROGRESO == 0:
+            progreso(len(estados))
+    if progreso:
+        progreso(len(estados))
+    return estados
+
+
+def estados_as_of(fecha, productos=None):
+    """
+    Estado de cada producto al cierre del día ``fecha``: su cierre mensual
+    más cercano más los movimientos posteriores a ese cierre.
+    Devuelve {producto_id: estado} solo para productos con movimientos.
+    """
+    cierres = CierreInventario.objects.filter(
+        id_producto=OuterRef('id_producto'), fecha__lte=fecha
+    ).order_by('-fecha')
+    ultimo_cierre = Subquery(cierres.values('fecha')[:1])
+
+    base = CierreInventario.objects.filter(fecha__lte=fecha, fecha=ultimo_cierre)
+    compras = Compra.objects.filter(fecha__lte=fecha).annotate(cierre=ultimo_cierre).filter(
+        Q(cierre__isnull=True) | Q(fecha__gt=F('cierre'))
+    )
+    ventas = Venta.objects.filter(
+        fecha_creacion__lt=_inicio_dia(fecha + timedelta(days=1))
+    ).annotate(cierre=ultimo_cierre).filter(
+        Q(cierre__isnull=True) | Q(fecha_creacion__date__gt=F('cierre'))
+    )
+    if productos is not None:
+        base = base.filter(id_producto__in=productos)
+        compras = compras.filter(id_producto__in=productos)
+        ventas = ventas.filter(id_producto__in=productos)
+
+    estados = {
+        cierre['id_producto']: estado_desde_cierre(cierre)
+        for cierre in base.values('id_producto', 'fecha', 'total_compras', 'total_ventas', 'costo_promedio')
+    }
+    movimientos = agrupar_por_producto(
+        compras.order_by().values_list('id_producto', 'fecha', 'id_compra', 'cantidad', 'costo_unitario'),
+        ventas.order_by().values_list('id_producto', 'fecha_creacion', 'id_venta', 'cantidad'),
+    )
+    for producto_id, lista in movimientos.items():
+        reproducir(estados.setdefault(producto_id, estado_vacio()), lista)
+    return estados
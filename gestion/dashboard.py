@@ -0,0 +1,156 @@
+"""
+Datos del dashboard, cacheados por widget.
+
+Cada widget depende de uno o más grupos de datos (catálogo, compras,
+ventas) y se cachea con su propio TTL bajo una clave que incluye la versión
+de esos grupos y el mes en curso. Las escrituras incrementan la versión de
+su grupo (ver receivers en models.py), así que un widget solo se recalcula
+cuando cambió algo de lo que muestra o venció su TTL.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum, Count, Value, CharField, DecimalField, IntegerField
+from django.utils.functional import SimpleLazyObject
+from asgiref.sync import sync_to_async
+
+from .cache import get_versiones_dashboard
+from .models import Producto, Cliente, Proveedor, Compra, Venta
+from .rollups import top_productos
+from .utils import en_paralelo, inicio_mes_actual
+
+# Grupos de datos; cada escritura incrementa la versión del suyo
+CATALOGO = 'catalogo'
+COMPRAS = 'compras'
+VENTAS = 'ventas'
+
+# Segundos que vive cada widget aunque no haya escrituras
+TTL_POR_DEFECTO = {
+    'conteos': 600,
+    'resumen_mes': 120,
+    'productos_mas_vendidos': 300,
+    'ultimas_compras': 120,
+}
+
+
+def _ttl(widget):
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', {}).get(widget, TTL_POR_DEFECTO[widget])
+
+
+def calcular_conteos():
+    """Productos, clientes y proveedores en una sola consulta (UNION ALL)"""
+    def conteo(modelo, nombre):
+        return modelo.objects.order_by().annotate(
+            tabla=Value(nombre, output_field=CharField())
+        ).values('tabla').annotate(n=Count('pk')).values_list('tabla', 'n')
+
+    conteos = dict(conteo(Producto, 'productos').union(
+        conteo(Cliente, 'clientes'), conteo(Proveedor, 'proveedores'), all=True
+    ))
+    return {
+        'total_productos': conteos.get('productos', 0),
+        'total_clientes': conteos.get('clientes', 0),
+        'total_proveedores': conteos.get('proveedores', 0),
+    }
+
+
+def calcular_resumen_mes(inicio_mes):
+    """Totales de compras y ventas del mes en una sola consulta (UNION ALL)"""
+    def totales(queryset, nombre, campo_total):
+        return queryset.order_by().annotate(
+            tabla=Value(nombre, output_field=CharField())
+        ).values('tabla').annotate(
+            total=Sum(campo_total, output_field=DecimalField()),
+            cantidad=Sum('cantidad', output_field=IntegerField()),
+        ).values_list('tabla', 'total', 'cantidad')
+
+    filas = {
+        tabla: (total, cantidad)
+        for tabla, total, cantidad in totales(
+            Compra.objects.filter(fecha__gte=inicio_mes.date()), 'compras', 'costo_total'
+        ).union(
+            totales(Venta.objects.filter(fecha_creacion__gte=inicio_mes), 'ventas', 'total'), all=True
+        )
+    }
+    compras_total, compras_cantidad = filas.get('compras', (None, None))
+    ventas_total, ventas_cantidad = filas.get('ventas', (None, None))
+    return {
+        'compras_mes': compras_total or 0,
+        'compras_mes_cantidad': compras_cantidad or 0,
+        'ventas_mes': ventas_total or 0,
+        'ventas_mes_cantidad': ventas_cantidad or 0,
+    }
+
+
+def calcular_productos_mas_vendidos(inicio_mes):
+    return list(top_productos(desde=inicio_mes.date(), granularidad='mes', limite=5))
+
+
+def calcular_ultimas_compras(inicio_mes):
+    return list(
+        Compra.objects.filter(fecha__gte=inicio_mes.date()).select_related('id_producto').order_by('-fecha')[:5]
+    )
+
+
+# Widget -> (grupos de los que depende, función que lo calcula)
+WIDGETS = {
+    'conteos': ((CATALOGO,), lambda inicio_mes: calcular_conteos()),
+    'resumen_mes': ((COMPRAS, VENTAS), calcular_resumen_mes),
+    'productos_mas_vendidos': ((VENTAS, CATALOGO), calcular_productos_mas_vendidos),
+    'ultimas_compras': ((COMPRAS, CATALOGO), calcular_ultimas_compras),
+}
+
+
+def claves_dashboard(inicio_mes=None):
+    """Clave de caché de cada widget para las versiones actuales"""
+    inicio_mes = inicio_mes or inicio_mes_actual()
+    versiones = get_versiones_dashboard((CATALOGO, COMPRAS, VENTAS))
+    claves = {}
+    for widget, (grupos, _) in WIDGETS.items():
+        sufijo = '.'.join(str(versiones[grupo]) for grupo in grupos)
+        claves[widget] = f'dashboard:{widget}:{inicio_mes:%Y-%m}:{sufijo}'
+    return claves
+
+
+def get_widget(widget, clave, inicio_mes):
+    """Valor cacheado de un widget, calculándolo si no está"""
+    valor = cache.get(clave)
+    if valor is None:
+        valor = WIDGETS[widget][1](inicio_mes)
+        cache.set(clave, valor, _ttl(widget))
+    return valor
+
+
+def _contexto(claves, widgets):
+    contexto = dict(widgets)
+    # Para la caché de fragmentos de la plantilla
+    contexto['claves_dashboard'] = claves
+    contexto['ttl_dashboard'] = {widget: _ttl(widget) for widget in WIDGETS}
+    return contexto
+
+
+def get_dashboard_data():
+    """
+    Contexto del dashboard. Cada widget se resuelve de forma perezosa: si la
+    plantilla sirve su fragmento desde la caché, ni siquiera se lee el dato.
+    """
+    inicio_mes = inicio_mes_actual()
+    claves = claves_dashboard(inicio_mes)
+    return _contexto(claves, {
+        widget: SimpleLazyObject(partial(get_widget, widget, clave, inicio_mes))
+        for widget, clave in claves.items()
+    })
+
+
+async def aget_dashboard_data():
+    """
+    Variante asíncrona: los widgets se calculan a la vez, cada uno en su
+    hilo, así que en frío tarda lo que el widget más lento y no la suma.
+    """
+    inicio_mes = inicio_mes_actual()
+    claves = await sync_to_async(claves_dashboard)(inicio_mes)
+    valores = await en_paralelo(*(
+        partial(get_widget, widget, clave, inicio_mes) for widget, clave in claves.items()
+    ))
+    return _contexto(claves, zip(claves, valores))
@@ -0,0 +1,284 @@
+"""
+Exportación de listas a CSV y XLSX por streaming.
+
+Las filas se leen con ``values_list(...).iterator(chunk_size=LOTE)`` (cursor
+de servidor en PostgreSQL) y se escriben en una StreamingHttpResponse lote a
+lote, así que la memoria no crece con el número de filas exportadas.
+
+El XLSX es un libro mínimo (una hoja, cadenas en línea y tres estilos) que
+zipfile escribe sobre un destino sin ``seek``: cada entrada lleva sus tamaños
+en un descriptor al final, y lo ya comprimido se entrega al cliente en cuanto
+se recoge.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Concat
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Filas por lectura de la base de datos y por trozo de la respuesta
+LOTE = 2000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Columnas de cada lista: (encabezado, lookup o expresión)
+COLUMNAS_VENTAS = [
+    ('Venta', 'id_venta'),
+    ('Fecha', 'fecha_creacion'),
+    ('Producto', 'id_producto__nombre'),
+    ('Cliente', Case(
+        When(id_cliente__isnull=True, then=Value('')),
+        default=Concat('id_cliente__nombre', Value(' '), 'id_cliente__apellido'),
+        output_field=CharField(),
+    )),
+    ('Cantidad', 'cantidad'),
+    ('Precio unitario', 'precio'),
+    ('Total', 'total'),
+]
+
+COLUMNAS_COMPRAS = [
+    ('Factura', 'numero_factura'),
+    ('Fecha', 'fecha'),
+    ('Proveedor', 'id_proveedor__empresa'),
+    ('Producto', 'id_producto__nombre'),
+    ('Cantidad', 'cantidad'),
+    ('Costo unitario', 'costo_unitario'),
+    ('Costo total', 'costo_total'),
+    ('% ganancia', 'porcentaje_ganancia'),
+    ('Precio de venta', 'precio'),
+    ('Ganancia total', 'ganancia_total'),
+]
+
+COLUMNAS_HISTORIAL = [
+    ('Producto', 'id_producto__nombre'),
+    ('Fecha', 'fecha'),
+    ('Precio sugerido', 'precio_sugerido'),
+]
+
+# Sobre el queryset anotado de utils.get_inventario_queryset o las filas de get_inventario_data
+COLUMNAS_INVENTARIO = [
+    ('Producto', 'nombre'),
+    ('Marca', 'marca'),
+    ('Compras', 'total_compras'),
+    ('Ventas', 'total_ventas'),
+    ('Stock', 'stock_actual'),
+    ('Costo promedio', 'costo_promedio'),
+    ('Precio de venta', 'precio_venta'),
+    ('Valor total', 'valor_total'),
+]
+
+
+def filas_queryset(queryset, columnas):
+    """
+    Tuplas de ``queryset`` leídas por lotes. ``columnas`` es una lista de
+    (encabezado, campo), donde el campo es un lookup o una expresión.
+    """
+    campos = []
+    anotaciones = {}
+    for indice, (_, campo) in enumerate(columnas):
+        if isinstance(campo, str):
+            campos.append(campo)
+        else:
+            anotaciones[f'columna_{indice}'] = campo
+            campos.append(f'columna_{indice}')
+    return queryset.annotate(**anotaciones).values_list(*campos).iterator(chunk_size=LOTE)
+
+
+def _fecha_local(valor):
+    if timezone.is_aware(valor):
+        valor = timezone.localtime(valor)
+    return valor.replace(tzinfo=None)
+
+
+# -------------------- CSV -------------------- #
+class _Eco:
+    """csv.writer escribe aquí y recibe la línea formateada"""
+
+    def write(self, valor):
+        return valor
+
+
+def _celda_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return _fecha_local(valor).strftime('%Y-%m-%d %H:%M:%S')
+    return valor
+
+
+def generar_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel abra el archivo como UTF-8
+    yield '\ufeff' + escritor.writerow(encabezados)
+    lote = []
+    for fila in filas:
+        lote.append(escritor.writerow([_celda_csv(valor) for valor in fila]))
+        if len(lote) == LOTE:
+            yield ''.join(lote)
+            lote = []
+    if lote:
+        yield ''.join(lote)
+
+
+# -------------------- XLSX -------------------- #
+NS_HOJA = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_RELACIONES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PAQUETE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+PARTES_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<Relationships xmlns="{NS_PAQUETE}">'
+        f'<Relationship Id="rId1" Type="{NS_RELACIONES}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<workbook xmlns="{NS_HOJA}" xmlns:r="{NS_RELACIONES}">'
+        '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<Relationships xmlns="{NS_PAQUETE}">'
+        f'<Relationship Id="rId1" Type="{NS_RELACIONES}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{NS_RELACIONES}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilos: 0 normal, 1 fecha, 2 fecha y hora, 3 negrita (encabezados)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<styleSheet xmlns="{NS_HOJA}">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+ESTILO_FECHA = 1
+ESTILO_FECHA_HORA = 2
+ESTILO_ENCABEZADO = 3
+
+# Caracteres de control que XML 1.0 no admite
+_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+# Día 0 de las fechas de Excel (con su 29/02/1900 ficticio ya descontado)
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+
+
+def _celda_xlsx(valor, estilo=None):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    if isinstance(valor, datetime):
+        serial = (_fecha_local(valor) - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c s="{ESTILO_FECHA_HORA}"><v>{serial:.6f}</v></c>'
+    if isinstance(valor, date):
+        serial = (valor - _EPOCA_EXCEL.date()).days
+        return f'<c s="{ESTILO_FECHA}"><v>{serial}</v></c>'
+    texto = escape(_NO_XML.sub('', str(valor)))
+    atributo_estilo = f' s="{estilo}"' if estilo else ''
+    return f'<c t="inlineStr"{atributo_estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xlsx(fila, estilo=None):
+    return '<row>' + ''.join(_celda_xlsx(valor, estilo) for valor in fila) + '</row>'
+
+
+class _Salida:
+    """Destino de zipfile de solo escritura y sin seek: guarda lo escrito hasta recogerlo"""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def recoger(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def generar_xlsx(encabezados, filas, hoja='Datos'):
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in PARTES_XLSX.items():
+            libro.writestr(nombre, contenido.replace('{hoja}', escape(hoja[:31])))
+        yield salida.recoger()
+
+        # El tamaño de la hoja no se conoce de antemano: zip64 por si supera 2 GiB
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as xml:
+            lote = [
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                f'<worksheet xmlns="{NS_HOJA}"><sheetData>',
+                _fila_xlsx(encabezados, ESTILO_ENCABEZADO),
+            ]
+            for fila in filas:
+                lote.append(_fila_xlsx(fila))
+                if len(lote) >= LOTE:
+                    xml.write(''.join(lote).encode())
+                    lote = []
+                    datos = salida.recoger()
+                    if datos:
+                        yield datos
+            lote.append('</sheetData></worksheet>')
+            xml.write(''.join(lote).encode())
+    yield salida.recoger()
+
+
+# -------------------- Respuestas -------------------- #
+def respuesta_exportacion(formato, nombre, encabezados, filas):
+    """StreamingHttpResponse con ``filas`` en ``formato`` ('csv' o 'xlsx')"""
+    if formato == 'xlsx':
+        contenido = generar_xlsx(encabezados, filas, hoja=nombre.capitalize())
+    else:
+        formato = 'csv'
+        contenido = generar_csv(encabezados, filas)
+    response = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+    archivo = f'{nombre}_{timezone.localdate():%Y%m%d}.{formato}'
+    response['Content-Disposition'] = f'attachment; filename="{archivo}"'
+    return response
+
+
+def exportar_queryset(formato, nombre, queryset, columnas):
+    """Exporta ``queryset`` (ya filtrado y ordenado) con las ``columnas`` dadas"""
+    encabezados = [encabezado for encabezado, _ in columnas]
+    return respuesta_exportacion(formato, nombre, encabezados, filas_queryset(queryset, columnas))
@@ -2,8 +2,41 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import *
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
 from django.utils import timezone
 
+
+class SelectAutocompletar(forms.Select):
+    """
+    Select de un ModelChoiceField que solo renderiza la opción elegida; las
+    demás se buscan en /api/autocompletar/<tipo>/ mientras se escribe
+    (static/js/script.js). Al enviar, el campo valida solo el id elegido.
+    """
+
+    def __init__(self, tipo, attrs=None):
+        attrs = {'class': 'form-control', **(attrs or {})}
+        attrs['data-autocompletar'] = reverse_lazy('api_autocompletar', args=[tipo])
+        super().__init__(attrs)
+        self.tipo = tipo
+
+    def optgroups(self, name, value, attrs=None):
+        # No recorre self.choices (toda la tabla): una consulta por pk para lo elegido
+        elegidos = [v for v in value if v not in ('', None)]
+        opciones = []
+        if self.choices.field.empty_label is not None:
+            opciones.append(('', self.choices.field.empty_label))
+        if elegidos:
+            try:
+                opciones.extend(self.choices.choice(obj) for obj in self.choices.queryset.filter(pk__in=elegidos))
+            except (ValueError, TypeError, ValidationError):
+                pass
+        return [
+            (None, [self.create_option(name, valor, etiqueta, str(valor) in value, indice, attrs=attrs)], indice)
+            for indice, (valor, etiqueta) in enumerate(opciones)
+        ]
+
+
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True, label="Correo electrónico")
     
@@ -34,8 +67,8 @@ class CompraForm(forms.ModelForm):
         widgets = {
             'fecha': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'numero_factura': forms.TextInput(attrs={'class': 'form-control'}),
-            'id_proveedor': forms.Select(attrs={'class': 'form-control'}),
-            'id_producto': forms.Select(attrs={'class': 'form-control'}),
+            'id_proveedor': SelectAutocompletar(IndiceBusqueda.PROVEEDOR),
+            'id_producto': SelectAutocompletar(IndiceBusqueda.PRODUCTO),
             'costo_total': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'cantidad': forms.NumberInput(attrs={'class': 'form-control', 'min':'1'}),
             'porcentaje_ganancia': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
@@ -56,13 +89,32 @@ class CompraForm(forms.ModelForm):
         }
 
 
+class ImportarComprasForm(forms.Form):
+    archivo = forms.FileField(
+        label='Archivo',
+        help_text='CSV (separado por comas o punto y coma) o XLSX, con una fila de encabezados.',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
+    omitir_errores = forms.BooleanField(
+        required=False,
+        label='Importar las filas válidas aunque otras tengan errores',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        if not archivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('El archivo debe ser .csv o .xlsx.')
+        return archivo
+
+
 class VentaForm(forms.ModelForm):
     class Meta:
         model = Venta
         fields = '__all__'
         widgets = {
-            'id_producto': forms.Select(attrs={'class': 'form-control'}),
-            'id_cliente': forms.Select(attrs={'class': 'form-control'}),
+            'id_producto': SelectAutocompletar(IndiceBusqueda.PRODUCTO),
+            'id_cliente': SelectAutocompletar(IndiceBusqueda.CLIENTE),
             'precio': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'cantidad': forms.NumberInput(attrs={'class': 'form-control'}),
         }
@@ -0,0 +1,400 @@
+"""
+Importación masiva de compras desde CSV o XLSX.
+
+Las filas se validan por lotes: proveedores, productos y facturas existentes
+se resuelven con una consulta por lote, y costo unitario, precio y ganancias
+se calculan para todo el lote a la vez con las mismas fórmulas que
+``Compra.save()``. Cada lote se inserta con ``bulk_create`` (``COPY`` en
+PostgreSQL) junto con su historial de precios, sin señales por fila.
+
+Lo que los receivers de Compra harían fila a fila se hace una sola vez al
+final: stock, costo promedio y precio vigente de los productos afectados
+(``recalcular_stock``), cierres, índice de búsqueda y versiones de caché.
+
+Si alguna fila tiene errores no se importa nada, salvo con ``omitir_errores``.
+Desde la web la importación es una tarea en segundo plano (ver jobs.py) que
+antes valida todo el archivo con ``validar_compras``, fuera de la transacción,
+para informar el avance y no escribir nada si hay errores.
+"""
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import incrementar_version_dashboard, incrementar_version_inventario
+from .indice import indexar_lote, normalizar
+from .models import CierreInventario, Compra, HistorialPrecio, Producto, Proveedor, StockProducto
+from .utils import recalcular_stock
+
+# Filas por lote de validación e inserción
+LOTE = 500
+
+CENTAVOS = Decimal('0.01')
+
+# Columna -> encabezados aceptados (sin acentos ni mayúsculas)
+COLUMNAS = {
+    'numero_factura': ('numero_factura', 'factura', 'numero de factura'),
+    'fecha': ('fecha',),
+    'proveedor': ('proveedor', 'id_proveedor', 'empresa'),
+    'producto': ('producto', 'id_producto'),
+    'cantidad': ('cantidad',),
+    'costo_total': ('costo_total', 'costo total'),
+    'porcentaje_ganancia': ('porcentaje_ganancia', '% ganancia', 'porcentaje de ganancia', 'ganancia'),
+}
+
+CAMPOS_COMPRA = [
+    'numero_factura', 'fecha', 'id_proveedor', 'id_producto', 'costo_total', 'cantidad',
+    'costo_unitario', 'porcentaje_ganancia', 'precio', 'ganancia_unitaria', 'ganancia_total',
+]
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede leer (formato, encabezados o dependencia ausente)"""
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.filas = 0
+        self.creadas = 0
+        self.precios = 0
+        self.errores = []  # (número de fila, mensaje)
+        self.productos = set()
+
+    @property
+    def importado(self):
+        return self.creadas > 0
+
+
+# -------------------- Lectura -------------------- #
+def _encabezados(fila):
+    """Índice de cada columna conocida en la fila de encabezados"""
+    aceptados = {alias: columna for columna, alias_columna in COLUMNAS.items() for alias in alias_columna}
+    posiciones = {}
+    for indice, encabezado in enumerate(fila):
+        columna = aceptados.get(normalizar(str(encabezado or '')))
+        if columna and columna not in posiciones:
+            posiciones[columna] = indice
+    faltan = [columna for columna in COLUMNAS if columna not in posiciones]
+    if faltan:
+        raise ErrorImportacion(f'Faltan columnas: {", ".join(faltan)}')
+    return posiciones
+
+
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErrorImportacion('Para importar archivos .xlsx instala openpyxl (pip install openpyxl) o usa CSV.')
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception:
+        raise ErrorImportacion('El archivo no es un .xlsx válido.')
+    try:
+        yield from libro.worksheets[0].iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    try:
+        muestra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.reader(texto, dialecto)
+    except UnicodeDecodeError:
+        raise ErrorImportacion('El CSV debe estar codificado en UTF-8.')
+    finally:
+        # El archivo lo cierra quien lo abrió
+        texto.detach()
+
+
+def leer_filas(archivo, nombre):
+    """
+    (número de fila, dict) de cada fila con datos de un CSV o XLSX abierto
+    en binario. La primera fila son los encabezados.
+    """
+    filas = _filas_xlsx(archivo) if nombre.lower().endswith('.xlsx') else _filas_csv(archivo)
+    try:
+        posiciones = _encabezados(next(filas, None) or [])
+    except ErrorImportacion:
+        filas.close()
+        raise
+    for numero, fila in enumerate(filas, start=2):
+        if not any(valor not in (None, '') for valor in fila):
+            continue
+        yield numero, {
+            columna: fila[indice] if indice < len(fila) else None
+            for columna, indice in posiciones.items()
+        }
+
+
+# -------------------- Validación -------------------- #
+def _texto(valor):
+    return str(valor).strip() if valor is not None else ''
+
+
+def _limpiar(campo, valor):
+    """Valida ``valor`` con el campo del modelo (longitud, dígitos, positivos...)"""
+    try:
+        return Compra._meta.get_field(campo).clean(valor, None)
+    except ValidationError as error:
+        raise ValidationError(f'{campo}: {" ".join(error.messages)}')
+
+
+def _decimal(valor, campo):
+    try:
+        numero = valor if isinstance(valor, Decimal) else Decimal(_texto(valor).replace(',', '.'))
+    except InvalidOperation:
+        raise ValidationError(f'{campo}: "{valor}" no es un número')
+    return _limpiar(campo, numero)
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValidationError(f'fecha: "{texto}" no es una fecha (AAAA-MM-DD o DD/MM/AAAA)')
+
+
+def _buscar(referencias, valor):
+    por_nombre, por_id = referencias
+    return por_nombre[valor] if valor in por_nombre else por_id.get(valor)
+
+
+def _referencias(lote):
+    """
+    Proveedores y productos del lote, por nombre o por id, en dos consultas.
+    Cada uno es (por nombre, por id).
+    """
+    valores = {'proveedor': set(), 'producto': set()}
+    for _, fila in lote:
+        for columna in valores:
+            valores[columna].add(_texto(fila[columna]))
+
+    def ids(valores_columna):
+        return [int(valor) for valor in valores_columna if valor.isdigit()]
+
+    proveedores = ({}, {})
+    for pk, empresa in Proveedor.objects.filter(
+        Q(pk__in=ids(valores['proveedor'])) | Q(empresa__in=valores['proveedor'])
+    ).values_list('pk', 'empresa'):
+        proveedores[0][empresa] = pk
+        proveedores[1][str(pk)] = pk
+
+    productos = ({}, {})
+    for pk, nombre in Producto.objects.filter(
+        Q(pk__in=ids(valores['producto'])) | Q(nombre__in=valores['producto'])
+    ).values_list('pk', 'nombre'):
+        # Un nombre repetido en el catálogo no identifica un producto
+        productos[0][nombre] = None if nombre in productos[0] else pk
+        productos[1][str(pk)] = pk
+    return proveedores, productos
+
+
+def _validar_lote(lote, facturas_vistas):
+    """Separa el lote en filas válidas (dicts con los campos de Compra) y errores"""
+    proveedores, productos = _referencias(lote)
+    facturas = {_texto(fila['numero_factura']) for _, fila in lote}
+    existentes = set(Compra.objects.filter(numero_factura__in=facturas).values_list('numero_factura', flat=True))
+
+    validas, errores = [], []
+    for numero, fila in lote:
+        try:
+            factura = _limpiar('numero_factura', _texto(fila['numero_factura']))
+            if factura in existentes:
+                raise ValidationError(f'la factura {factura} ya existe')
+            if factura in facturas_vistas:
+                raise ValidationError(f'la factura {factura} está repetida en el archivo')
+            proveedor = _buscar(proveedores, _texto(fila['proveedor']))
+            if proveedor is None:
+                raise ValidationError(f'proveedor "{_texto(fila["proveedor"])}" no encontrado')
+            producto = _buscar(productos, _texto(fila['producto']))
+            if producto is None:
+                raise ValidationError(f'producto "{_texto(fila["producto"])}" no encontrado o ambiguo')
+            cantidad = _limpiar('cantidad', _texto(fila['cantidad']))
+            if cantidad < 1:
+                raise ValidationError('cantidad: debe ser mayor a 0')
+            validas.append({
+                'numero_factura': factura,
+                'fecha': _fecha(fila['fecha']),
+                'id_proveedor_id': proveedor,
+                'id_producto_id': producto,
+                'cantidad': cantidad,
+                'costo_total': _decimal(fila['costo_total'], 'costo_total'),
+                'porcentaje_ganancia': _decimal(fila['porcentaje_ganancia'] or 0, 'porcentaje_ganancia'),
+            })
+            facturas_vistas.add(factura)
+        except ValidationError as error:
+            errores.append((numero, '; '.join(error.messages)))
+    return validas, errores
+
+
+def _lotes(filas, lote):
+    pendientes = []
+    for fila in filas:
+        pendientes.append(fila)
+        if len(pendientes) == lote:
+            yield pendientes
+            pendientes = []
+    if pendientes:
+        yield pendientes
+
+
+def validar_compras(filas, lote=LOTE, progreso=None):
+    """
+    Valida ``filas`` sin escribir nada, con las mismas comprobaciones que
+    ``importar_compras``. Devuelve un ResultadoImportacion sin compras creadas.
+    """
+    resultado = ResultadoImportacion()
+    facturas_vistas = set()
+    for filas_lote in _lotes(filas, lote):
+        _, errores = _validar_lote(filas_lote, facturas_vistas)
+        resultado.filas += len(filas_lote)
+        resultado.errores.extend(errores)
+        if progreso:
+            progreso(resultado.filas)
+    return resultado
+
+
+def _calcular(validas):
+    """Costo unitario, precio y ganancias de todo el lote, con las fórmulas de Compra.save()"""
+    costos_unitarios = [fila['costo_total'] / fila['cantidad'] for fila in validas]
+    precios = [
+        costo * (1 + fila['porcentaje_ganancia'] / 100)
+        for costo, fila in zip(costos_unitarios, validas)
+    ]
+    for fila, costo, precio in zip(validas, costos_unitarios, precios):
+        ganancia_unitaria = precio - costo
+        fila['costo_unitario'] = costo.quantize(CENTAVOS)
+        fila['precio'] = precio.quantize(CENTAVOS)
+        fila['ganancia_unitaria'] = ganancia_unitaria.quantize(CENTAVOS)
+        fila['ganancia_total'] = (ganancia_unitaria * fila['cantidad']).quantize(CENTAVOS)
+    return validas
+
+
+# -------------------- Escritura -------------------- #
+def _copiar_compras(compras):
+    """COPY de PostgreSQL: una sola sentencia por lote, sin parsear un INSERT enorme"""
+    columnas = [Compra._meta.get_field(campo).column for campo in CAMPOS_COMPRA]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for compra in compras:
+        escritor.writerow([getattr(compra, Compra._meta.get_field(campo).attname) for campo in CAMPOS_COMPRA])
+    buffer.seek(0)
+    sql = f'COPY {Compra._meta.db_table} ({", ".join(columnas)}) FROM STDIN WITH (FORMAT csv)'
+    with connection.cursor() as cursor:
+        crudo = cursor.cursor
+        if hasattr(crudo, 'copy_expert'):
+            crudo.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with crudo.copy(sql) as copia:
+                copia.write(buffer.getvalue())
+    ids = dict(Compra.objects.filter(
+        numero_factura__in=[compra.numero_factura for compra in compras]
+    ).values_list('numero_factura', 'pk'))
+    for compra in compras:
+        compra.pk = ids[compra.numero_factura]
+    return compras
+
+
+def _insertar_compras(validas):
+    compras = [Compra(**fila) for fila in validas]
+    if connection.vendor == 'postgresql':
+        return _copiar_compras(compras)
+    return Compra.objects.bulk_create(compras)
+
+
+def _historial_lote(compras, vigentes, ahora):
+    """
+    Un HistorialPrecio por cada compra que cambia el precio vigente de su
+    producto, como haría ``registrar_precio`` compra a compra
+    """
+    precios = []
+    for compra in compras:
+        producto = compra.id_producto_id
+        if vigentes.get(producto) != compra.precio:
+            precios.append(HistorialPrecio(id_producto_id=producto, precio_sugerido=compra.precio, fecha=ahora))
+            vigentes[producto] = compra.precio
+    HistorialPrecio.objects.bulk_create(precios, batch_size=LOTE)
+    return len(precios)
+
+
+def _precios_vigentes(productos):
+    return dict(StockProducto.objects.filter(
+        id_producto__in=productos, id_precio__isnull=False
+    ).values_list('id_producto', 'precio_venta'))
+
+
+def _refrescar(fechas_por_producto):
+    """Lo que los receivers de Compra harían fila a fila, una vez para toda la importación"""
+    productos = list(fechas_por_producto)
+    CierreInventario.objects.filter(reduce(or_, (
+        Q(id_producto=producto, fecha__gte=fecha) for producto, fecha in fechas_por_producto.items()
+    ))).delete()
+    # Totales, costo promedio (reproducido desde el histórico) y precio vigente
+    recalcular_stock(productos)
+    transaction.on_commit(incrementar_version_inventario)
+    transaction.on_commit(lambda: incrementar_version_dashboard('compras'))
+
+
+def importar_compras(filas, omitir_errores=False, lote=LOTE, progreso=None):
+    """
+    Importa compras desde ``filas`` ((número, dict) como las de ``leer_filas``).
+    Sin ``omitir_errores`` cualquier fila inválida anula toda la importación.
+    Devuelve un ResultadoImportacion.
+    """
+    resultado = ResultadoImportacion()
+    facturas_vistas = set()
+    fechas_por_producto = {}
+    vigentes = {}
+    ahora = timezone.now()
+
+    def procesar(filas_lote):
+        validas, errores = _validar_lote(filas_lote, facturas_vistas)
+        resultado.filas += len(filas_lote)
+        resultado.errores.extend(errores)
+        if not validas or (resultado.errores and not omitir_errores):
+            return
+        compras = _insertar_compras(_calcular(validas))
+        productos = {compra.id_producto_id for compra in compras}
+        vigentes.update(_precios_vigentes(productos - set(vigentes)))
+        resultado.precios += _historial_lote(compras, vigentes, ahora)
+        indexar_lote(compras)
+        for compra in compras:
+            fecha = fechas_por_producto.get(compra.id_producto_id)
+            fechas_por_producto[compra.id_producto_id] = min(fecha, compra.fecha) if fecha else compra.fecha
+        resultado.creadas += len(compras)
+        if progreso:
+            progreso(resultado.filas)
+
+    with transaction.atomic():
+        for filas_lote in _lotes(filas, lote):
+            procesar(filas_lote)
+
+        if resultado.errores and not omitir_errores:
+            transaction.set_rollback(True)
+            resultado.creadas = resultado.precios = 0
+            return resultado
+        if fechas_por_producto:
+            _refrescar(fechas_por_producto)
+            resultado.productos = set(fechas_por_producto)
+    return resultado
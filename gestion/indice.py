@@ -0,0 +1,165 @@
+"""
+Índice de búsqueda global.
+
+Clientes, productos, proveedores, compras (por número de factura) y ventas
+(por id) tienen una fila en ``IndiceBusqueda`` con su tipo, un título y el
+texto buscable. La tabla se indexa como las demás (gestion/busqueda.py), así
+que una búsqueda global es una sola consulta sobre un solo índice, que además
+devuelve los mejores resultados de cada tipo con ROW_NUMBER().
+
+``clave`` guarda el título normalizado (minúsculas, sin acentos) con un
+índice (tipo, clave): los selects con autocompletado piden las primeras filas
+de un tipo cuya clave empieza por lo escrito, como un rango sobre ese índice.
+
+Los receivers de models.py mantienen la fila al guardar o borrar; las cargas
+masivas usan ``indexar_lote`` y ``manage.py rebuild_search_index`` la rehace.
+"""
+import unicodedata
+
+from django.apps import apps as apps_global
+from django.urls import reverse
+
+from .busqueda import get_backend
+from .models import IndiceBusqueda
+
+# Filas por lote al reconstruir
+LOTE = 2000
+
+# Mayor que cualquier carácter: cierra el rango de un prefijo
+FIN_PREFIJO = '\U0010ffff'
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Café Ñandú' -> 'cafe nandu'"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()[:255]
+
+
+def _cliente(obj):
+    return f'{obj.nombre} {obj.apellido}', '', f'{obj.nombre} {obj.apellido}'
+
+
+def _producto(obj):
+    return obj.nombre, obj.marca or '', f'{obj.nombre} {obj.marca or ""}'
+
+
+def _proveedor(obj):
+    return obj.empresa, obj.telefono or '', f'{obj.empresa} {obj.telefono or ""} {obj.productos or ""}'
+
+
+def _compra(obj):
+    return f'Factura {obj.numero_factura}', f'{obj.fecha} · C${obj.costo_total}', obj.numero_factura
+
+
+def _venta(obj):
+    return f'Venta #{obj.pk}', f'{obj.fecha_creacion:%Y-%m-%d} · C${obj.total or 0}', f'venta {obj.pk}'
+
+
+# Modelo -> (tipo, función que devuelve título, detalle y texto)
+DOCUMENTOS = {
+    'Cliente': (IndiceBusqueda.CLIENTE, _cliente),
+    'Producto': (IndiceBusqueda.PRODUCTO, _producto),
+    'Proveedor': (IndiceBusqueda.PROVEEDOR, _proveedor),
+    'Compra': (IndiceBusqueda.COMPRA, _compra),
+    'Venta': (IndiceBusqueda.VENTA, _venta),
+}
+
+
+def documento(obj, modelo=IndiceBusqueda):
+    """Fila del índice para ``obj`` (sin guardar)"""
+    tipo, generar = DOCUMENTOS[obj._meta.object_name]
+    titulo, detalle, texto = generar(obj)
+    return modelo(
+        tipo=tipo, objeto_id=obj.pk, titulo=titulo[:255], detalle=detalle[:255],
+        texto=texto.strip(), clave=normalizar(titulo),
+    )
+
+
+def indexar_lote(objetos, modelo=IndiceBusqueda):
+    """Crea o actualiza las filas de ``objetos`` con un upsert por lote"""
+    filas = [documento(obj, modelo) for obj in objetos]
+    for inicio in range(0, len(filas), LOTE):
+        modelo.objects.bulk_create(
+            filas[inicio:inicio + LOTE],
+            update_conflicts=True,
+            unique_fields=['tipo', 'objeto_id'],
+            update_fields=['titulo', 'detalle', 'texto', 'clave', 'fecha_actualizacion'],
+        )
+
+
+def indexar(obj):
+    indexar_lote([obj])
+
+
+def desindexar(obj):
+    tipo, _ = DOCUMENTOS[obj._meta.object_name]
+    IndiceBusqueda.objects.filter(tipo=tipo, objeto_id=obj.pk).delete()
+
+
+def reconstruir_indice(apps=None):
+    """
+    Rehace el índice desde las tablas de origen y borra las filas huérfanas.
+    Acepta el registro de modelos históricos de una migración.
+    """
+    apps = apps or apps_global
+    modelo = apps.get_model('gestion', 'IndiceBusqueda')
+    total = 0
+    for nombre, (tipo, _) in DOCUMENTOS.items():
+        origen = apps.get_model('gestion', nombre)
+        lote = []
+        for obj in origen.objects.order_by('pk').iterator(chunk_size=LOTE):
+            lote.append(obj)
+            if len(lote) == LOTE:
+                indexar_lote(lote, modelo)
+                total += len(lote)
+                lote = []
+        indexar_lote(lote, modelo)
+        total += len(lote)
+        modelo.objects.filter(tipo=tipo).exclude(objeto_id__in=origen.objects.values('pk')).delete()
+    return total
+
+
+def url_resultado(tipo, objeto_id):
+    if tipo == IndiceBusqueda.COMPRA:
+        return reverse('compra_edit', args=[objeto_id])
+    if tipo == IndiceBusqueda.VENTA:
+        return reverse('venta_edit', args=[objeto_id])
+    vista = {
+        IndiceBusqueda.CLIENTE: 'clientes_view',
+        IndiceBusqueda.PRODUCTO: 'productos_view',
+        IndiceBusqueda.PROVEEDOR: 'proveedores_view',
+    }[tipo]
+    return f'{reverse(vista)}?action=edit&pk={objeto_id}'
+
+
+def buscar_global(texto, limite=5, tipos=None):
+    """
+    Los ``limite`` resultados más relevantes de cada tipo, en una consulta.
+    Devuelve {tipo: [fila, ...]} con los tipos ordenados por su mejor resultado.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return {}
+    filas = get_backend().ranking_agrupado(
+        IndiceBusqueda, texto, ('texto',), 'tipo', limite,
+        columnas=('tipo', 'objeto_id', 'titulo', 'detalle'),
+    )
+    grupos = {}
+    for fila in filas:
+        if tipos and fila['tipo'] not in tipos:
+            continue
+        grupos.setdefault(fila['tipo'], []).append(fila)
+    return dict(sorted(grupos.items(), key=lambda grupo: -grupo[1][0]['relevancia']))
+
+
+def autocompletar(tipo, texto, limite=20):
+    """
+    Las primeras ``limite`` filas de ``tipo`` cuyo título empieza por
+    ``texto``, en orden alfabético. Un rango sobre el índice (tipo, clave):
+    cuesta lo mismo con cien filas que con un millón.
+    """
+    filas = IndiceBusqueda.objects.filter(tipo=tipo)
+    prefijo = normalizar(texto)
+    if prefijo:
+        filas = filas.filter(clave__gte=prefijo, clave__lt=prefijo + FIN_PREFIJO)
+    return list(filas.order_by('clave', 'objeto_id').values('objeto_id', 'titulo', 'detalle')[:limite])
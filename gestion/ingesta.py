@@ -0,0 +1,188 @@
+"""
+Alta de ventas por lotes para los terminales de punto de venta.
+
+Un lote es una lista de ventas (producto, cliente opcional, precio y
+cantidad). Productos y clientes se resuelven con una consulta por lote, el
+total se calcula para todas las filas a la vez y las válidas se insertan con
+``bulk_create`` en una sola transacción; las inválidas se devuelven con sus
+errores sin impedir el alta del resto.
+
+Lo que los receivers de Venta harían venta a venta se hace una vez por lote
+y agrupado: stock por producto, análisis diario por día, resúmenes por
+periodo y producto o cliente, cierres, índice de búsqueda y versiones de caché.
+"""
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import incrementar_version_dashboard, incrementar_version_inventario
+from .costos import registrar_venta
+from .indice import indexar_lote
+from .models import (
+    CierreInventario, Cliente, Producto, Venta,
+    aplicar_delta_analisis, aplicar_movimiento_stock, _datos_resumen,
+)
+from .rollups import aplicar_ventas
+
+# Ventas por sentencia INSERT
+LOTE = 500
+
+
+class ResultadoLote:
+    def __init__(self):
+        self.ventas = []   # (índice en el lote, Venta creada)
+        self.errores = []  # (índice en el lote, {campo: [mensajes]})
+
+
+def _limpiar(campo, valor):
+    """Valida ``valor`` con el campo de Venta (dígitos, decimales, positivos...)"""
+    return Venta._meta.get_field(campo).clean(valor, None)
+
+
+def _entero(valor, mensaje):
+    if isinstance(valor, bool) or not (isinstance(valor, int) or (isinstance(valor, str) and valor.isdigit())):
+        raise ValidationError(mensaje)
+    return int(valor)
+
+
+def _id(valor):
+    return _entero(valor, 'Debe ser un id numérico.')
+
+
+def _precio(valor):
+    if isinstance(valor, bool):
+        raise ValidationError('Debe ser un número.')
+    try:
+        # Los floats de JSON se leen por su texto para no arrastrar error binario
+        precio = Decimal(str(valor))
+    except InvalidOperation:
+        raise ValidationError('Debe ser un número.')
+    if not precio.is_finite():
+        raise ValidationError('Debe ser un número.')
+    if precio <= 0:
+        raise ValidationError('Debe ser mayor a 0.')
+    return _limpiar('precio', precio)
+
+
+def _cantidad(valor):
+    cantidad = _entero(valor, 'Debe ser un número entero.')
+    if cantidad < 1:
+        raise ValidationError('Debe ser mayor a 0.')
+    return _limpiar('cantidad', cantidad)
+
+
+def _validar(filas):
+    """
+    Separa el lote en ventas válidas ((índice, Venta) sin guardar) y errores.
+    Productos y clientes se comprueban con una consulta cada uno.
+    """
+    referencias = {'producto': set(), 'cliente': set()}
+    for fila in filas:
+        if isinstance(fila, dict):
+            for campo, ids in referencias.items():
+                try:
+                    ids.add(_id(fila.get(campo)))
+                except ValidationError:
+                    pass
+    productos = set(Producto.objects.filter(pk__in=referencias['producto']).values_list('pk', flat=True))
+    clientes = set(Cliente.objects.filter(pk__in=referencias['cliente']).values_list('pk', flat=True))
+
+    validas, errores = [], []
+    for indice, fila in enumerate(filas):
+        if not isinstance(fila, dict):
+            errores.append((indice, {'__all__': ['Cada venta debe ser un objeto.']}))
+            continue
+        datos, errores_fila = {}, {}
+        for campo, limpiar in (('producto', _id), ('precio', _precio), ('cantidad', _cantidad)):
+            try:
+                datos[campo] = limpiar(fila.get(campo))
+            except ValidationError as error:
+                errores_fila[campo] = error.messages
+        if 'producto' in datos and datos['producto'] not in productos:
+            errores_fila['producto'] = ['Producto no encontrado.']
+        if fila.get('cliente') is not None:
+            try:
+                datos['cliente'] = _id(fila['cliente'])
+                if datos['cliente'] not in clientes:
+                    raise ValidationError('Cliente no encontrado.')
+            except ValidationError as error:
+                errores_fila['cliente'] = error.messages
+        if errores_fila:
+            errores.append((indice, errores_fila))
+            continue
+        validas.append((indice, Venta(
+            id_producto_id=datos['producto'],
+            id_cliente_id=datos.get('cliente'),
+            precio=datos['precio'],
+            cantidad=datos['cantidad'],
+        )))
+    return validas, errores
+
+
+def _calcular_totales(validas):
+    """El total de Venta.save() para todo el lote; descarta los que no caben en el campo"""
+    correctas, errores = [], []
+    for indice, venta in validas:
+        venta.total = venta.precio * venta.cantidad
+        try:
+            _limpiar('total', venta.total)
+        except ValidationError as error:
+            errores.append((indice, {'total': error.messages}))
+            continue
+        correctas.append((indice, venta))
+    return correctas, errores
+
+
+def _aplicar(ventas):
+    """Lo que los receivers de Venta harían una a una, agrupado por producto y por día"""
+    unidades = defaultdict(int)
+    ultimas = {}
+    desde = {}
+    totales_dia = defaultdict(Decimal)
+    for venta in ventas:
+        producto = venta.id_producto_id
+        fecha = timezone.localdate(venta.fecha_creacion)
+        unidades[producto] += venta.cantidad
+        ultimas[producto] = venta
+        desde[producto] = min(desde.get(producto, fecha), fecha)
+        totales_dia[fecha] += venta.total
+
+    for producto, cantidad in unidades.items():
+        aplicar_movimiento_stock(producto, ventas=cantidad)
+        # Con la última venta basta: las anteriores del lote no la preceden
+        registrar_venta(ultimas[producto])
+    CierreInventario.objects.filter(reduce(or_, (
+        Q(id_producto=producto, fecha__gte=fecha) for producto, fecha in desde.items()
+    ))).delete()
+    for fecha, total in totales_dia.items():
+        aplicar_delta_analisis(fecha, total)
+    aplicar_ventas(_datos_resumen(venta) for venta in ventas)
+    indexar_lote(ventas)
+    transaction.on_commit(incrementar_version_inventario)
+    transaction.on_commit(lambda: incrementar_version_dashboard('ventas'))
+
+
+def registrar_ventas(filas):
+    """
+    Da de alta las ventas válidas de ``filas`` (lista de dicts con producto,
+    cliente, precio y cantidad) y devuelve un ResultadoLote con las creadas y
+    los errores de las demás, por su posición en el lote.
+    """
+    resultado = ResultadoLote()
+    validas, errores = _validar(filas)
+    validas, errores_total = _calcular_totales(validas)
+    resultado.errores = sorted(errores + errores_total, key=lambda error: error[0])
+    if not validas:
+        return resultado
+
+    with transaction.atomic():
+        ventas = Venta.objects.bulk_create([venta for _, venta in validas], batch_size=LOTE)
+        _aplicar(ventas)
+    resultado.ventas = [(indice, venta) for (indice, _), venta in zip(validas, ventas)]
+    return resultado
@@ -0,0 +1,310 @@
+"""
+Cola de tareas en segundo plano sobre la base de datos.
+
+Las vistas encolan un Job con ``encolar()`` y responden de inmediato; el
+comando ``run_workers`` lo ejecuta en otro proceso. No hace falta ningún
+broker: un worker toma una tarea con un UPDATE condicionado al estado, así
+que dos workers nunca ejecutan la misma tarea, en cualquier base de datos.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import date, timedelta
+
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.db.models import F
+from django.db.models.sql import UpdateQuery
+from django.db.models.sql.constants import CURSOR
+from django.utils import timezone
+
+from .importar import importar_compras, leer_filas, validar_compras
+from .models import Job
+from .utils import recalcular_analisis_ventas, recalcular_stock, construir_cierres
+from .rollups import reconstruir_resumenes
+from .precios import compactar_historial
+
+logger = logging.getLogger(__name__)
+
+# Tipo de tarea -> función que la ejecuta
+TAREAS = {}
+
+# Una tarea 'ejecutando' sin actividad durante este tiempo se da por perdida
+TIMEOUT_TAREA = timedelta(minutes=30)
+
+# Errores de fila que se guardan en el resultado de una importación
+MAX_ERRORES_IMPORTACION = 50
+
+
+def tarea(tipo):
+    """Registra una función como tarea; recibe ``progreso`` más los parámetros del Job"""
+    def registrar(funcion):
+        TAREAS[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(tipo, parametros=None, usuario=None, max_intentos=3, ejecutar_desde=None):
+    """Crea un Job pendiente y lo devuelve"""
+    if tipo not in TAREAS:
+        raise ValueError(f'Tipo de tarea desconocido: {tipo}')
+    return Job.objects.create(
+        tipo=tipo,
+        parametros=parametros or {},
+        creado_por=usuario if usuario and usuario.is_authenticated else None,
+        max_intentos=max_intentos,
+        ejecutar_desde=ejecutar_desde or timezone.now(),
+    )
+
+
+class Progreso:
+    """
+    Callback que las tareas usan para informar su avance, una vez por lote.
+    Cada aviso es también el latido que ``recuperar_perdidos`` comprueba.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._conexion = None
+
+    def __call__(self, actual, total=None, mensaje=''):
+        campos = {'progreso': actual, 'fecha_actualizacion': timezone.now()}
+        if total is not None:
+            campos['total'] = total
+        if mensaje:
+            campos['mensaje'] = mensaje[:255]
+        if not self._fuera_de_la_transaccion(campos):
+            Job.objects.filter(pk=self.job.pk).update(**campos)
+
+    def _fuera_de_la_transaccion(self, campos):
+        """
+        Dentro de una transacción (importar_compras) el avance no se vería
+        hasta el commit y otro worker daría la tarea por perdida: se escribe
+        en una conexión propia en autocommit. Devuelve False si no se pudo
+        (fuera de una transacción, en SQLite, que admite un solo escritor y
+        tampoco deja recuperar la tarea mientras tanto, o si el Job aún no
+        es visible desde otra conexión).
+        """
+        if not connection.in_atomic_block or connection.vendor == 'sqlite':
+            return False
+        if self._conexion is None:
+            self._conexion = connections.create_connection(DEFAULT_DB_ALIAS)
+        query = Job.objects.filter(pk=self.job.pk).query.chain(UpdateQuery)
+        query.add_update_values(campos)
+        return query.get_compiler(connection=self._conexion).execute_sql(CURSOR) > 0
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+
+def _nombre_worker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def tomar_job():
+    """
+    Toma la siguiente tarea pendiente o devuelve None.
+    El UPDATE condicionado a ``estado=pendiente`` hace de cerrojo.
+    """
+    ahora = timezone.now()
+    candidatos = Job.objects.filter(
+        estado=Job.PENDIENTE, ejecutar_desde__lte=ahora
+    ).order_by('ejecutar_desde', 'pk').values_list('pk', flat=True)[:10]
+
+    for pk in candidatos:
+        tomado = Job.objects.filter(pk=pk, estado=Job.PENDIENTE).update(
+            estado=Job.EJECUTANDO,
+            worker=_nombre_worker(),
+            fecha_inicio=ahora,
+            fecha_actualizacion=ahora,
+        )
+        if tomado:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def reintento(intentos):
+    """Espera antes del siguiente intento: 10s, 40s, 90s..."""
+    return timedelta(seconds=10 * intentos ** 2)
+
+
+def ejecutar_job(job):
+    """Ejecuta un Job ya tomado y registra el resultado o el error"""
+    funcion = TAREAS.get(job.tipo)
+    progreso = Progreso(job)
+    try:
+        if funcion is None:
+            raise ValueError(f'Tipo de tarea desconocido: {job.tipo}')
+        resultado = funcion(progreso, **job.parametros)
+    except Exception as e:
+        error = e
+    else:
+        error = None
+    finally:
+        progreso.cerrar()
+
+    # El avance lo escribió Progreso directamente en la base de datos
+    job.refresh_from_db(fields=['progreso', 'total', 'mensaje'])
+    job.intentos += 1
+    if error is None:
+        job.estado = Job.COMPLETADO
+        job.resultado = resultado
+        job.error = ''
+        job.progreso = job.total or job.progreso
+        job.fecha_fin = timezone.now()
+    else:
+        job.error = ''.join(traceback.format_exception(error))
+        job.mensaje = str(error)[:255]
+        if job.intentos < job.max_intentos and funcion is not None:
+            job.estado = Job.PENDIENTE
+            job.worker = ''
+            job.ejecutar_desde = timezone.now() + reintento(job.intentos)
+        else:
+            job.estado = Job.FALLIDO
+            job.fecha_fin = timezone.now()
+        logger.error('Error en tarea %s (%s): %s', job.pk, job.tipo, error, exc_info=error)
+    job.save()
+    return job
+
+
+def recuperar_perdidos(timeout=TIMEOUT_TAREA):
+    """
+    Tareas de workers que murieron a mitad de ejecución: la ejecución perdida
+    cuenta como un intento, así que vuelven a la cola si les quedan intentos
+    y si no se marcan como fallidas. Devuelve (reencoladas, fallidas).
+    """
+    ahora = timezone.now()
+    perdidas = Job.objects.filter(estado=Job.EJECUTANDO, fecha_actualizacion__lt=ahora - timeout)
+    mensaje = 'El worker dejó de responder durante la ejecución'
+    fallidas = perdidas.filter(intentos__gte=F('max_intentos') - 1).update(
+        estado=Job.FALLIDO, intentos=F('intentos') + 1, mensaje=mensaje, error=mensaje, fecha_fin=ahora,
+    )
+    reencoladas = perdidas.update(
+        estado=Job.PENDIENTE, intentos=F('intentos') + 1, worker='', ejecutar_desde=ahora,
+    )
+    if fallidas or reencoladas:
+        logger.warning('Tareas perdidas: %s vueltas a encolar, %s fallidas', reencoladas, fallidas)
+    return reencoladas, fallidas
+
+
+def bucle_worker(intervalo=2.0, una_vez=False):
+    """
+    Bucle de un worker: toma y ejecuta tareas hasta que se interrumpe.
+    Con ``una_vez`` termina cuando la cola queda vacía.
+    Devuelve cuántas tareas ejecutó.
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # Procesos creados con 'spawn' no heredan la configuración de Django
+        django.setup()
+
+    ejecutadas = 0
+    while True:
+        try:
+            close_old_connections()
+            job = tomar_job()
+            if job is None:
+                if una_vez:
+                    return ejecutadas
+                time.sleep(intervalo)
+                continue
+            ejecutar_job(job)
+            ejecutadas += 1
+        except Exception:
+            # Un fallo de la base de datos no debe terminar el worker:
+            # si la tarea quedó 'ejecutando', recuperar_perdidos la retoma
+            logger.exception('Error en el bucle del worker %s', _nombre_worker())
+            time.sleep(intervalo)
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor) if valor else None
+
+
+# -------------------- Tareas registradas -------------------- #
+@tarea('recalcular_analisis')
+def tarea_recalcular_analisis(progreso, desde=None, hasta=None):
+    progreso(0, 1, 'Recalculando análisis de ventas')
+    escritos, eliminados = recalcular_analisis_ventas(_fecha(desde), _fecha(hasta), progreso=progreso)
+    progreso(1, 1, f'{escritos} días recalculados, {eliminados} eliminados')
+    return {'escritos': escritos, 'eliminados': eliminados}
+
+
+@tarea('recalcular_stock')
+def tarea_recalcular_stock(progreso, productos=None):
+    progreso(0, 1, 'Reconstruyendo stock')
+    total = recalcular_stock(productos, progreso=progreso)
+    progreso(1, 1, f'{total} productos recalculados')
+    return {'productos': total}
+
+
+@tarea('construir_cierres')
+def tarea_construir_cierres(progreso, desde=None, hasta=None):
+    progreso(0, 1, 'Generando cierres mensuales')
+    meses, escritos = construir_cierres(_fecha(desde), _fecha(hasta), progreso=progreso)
+    progreso(1, 1, f'{meses} meses cerrados')
+    return {'meses': meses, 'escritos': escritos}
+
+
+@tarea('reconstruir_resumenes')
+def tarea_reconstruir_resumenes(progreso, desde=None, hasta=None):
+    progreso(0, 1, 'Reconstruyendo resúmenes de ventas')
+    escritas = reconstruir_resumenes(_fecha(desde), _fecha(hasta), progreso=progreso)
+    progreso(1, 1, f'{escritas} filas de resumen escritas')
+    return {'escritas': escritas}
+
+
+@tarea('compactar_precios')
+def tarea_compactar_precios(progreso, productos=None, retencion=True):
+    progreso(0, 1, 'Compactando historial de precios')
+    eliminados = compactar_historial(productos=productos, retencion=retencion, progreso=progreso)
+    progreso(1, 1, f'{eliminados} registros eliminados')
+    return {'eliminados': eliminados}
+
+
+@tarea('importar_compras')
+def tarea_importar_compras(progreso, archivo, nombre, omitir_errores=False):
+    """
+    ``archivo`` es la ruta en default_storage donde la vista dejó el archivo
+    subido; se borra al terminar. Primero se validan todas las filas (el avance
+    se ve mientras tanto) y solo después se importa, en una transacción.
+    """
+    try:
+        with default_storage.open(archivo, 'rb') as entrada:
+            total = sum(1 for _ in leer_filas(entrada, nombre))
+        progreso(0, 2 * total, 'Validando filas')
+        with default_storage.open(archivo, 'rb') as entrada:
+            resultado = validar_compras(
+                leer_filas(entrada, nombre),
+                progreso=lambda filas: progreso(filas, 2 * total, f'{filas} de {total} filas validadas'),
+            )
+        if omitir_errores or not resultado.errores:
+            progreso(total, 2 * total, 'Importando compras')
+            with default_storage.open(archivo, 'rb') as entrada:
+                resultado = importar_compras(
+                    leer_filas(entrada, nombre),
+                    omitir_errores=omitir_errores,
+                    progreso=lambda filas: progreso(total + filas, 2 * total, 'Importando compras'),
+                )
+    finally:
+        default_storage.delete(archivo)
+
+    if resultado.importado:
+        progreso(1, 1, f'{resultado.creadas} compras importadas ({resultado.precios} precios nuevos, '
+                       f'{len(resultado.productos)} productos actualizados)')
+    elif resultado.errores:
+        progreso(1, 1, f'{len(resultado.errores)} filas con errores: no se importó nada')
+    else:
+        progreso(1, 1, 'El archivo no tiene filas')
+    return {
+        'creadas': resultado.creadas,
+        'precios': resultado.precios,
+        'productos': len(resultado.productos),
+        'total_errores': len(resultado.errores),
+        'errores': resultado.errores[:MAX_ERRORES_IMPORTACION],
+    }
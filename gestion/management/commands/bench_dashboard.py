@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from gestion.cache import incrementar_version_dashboard
+from gestion.dashboard import CATALOGO, COMPRAS, VENTAS, WIDGETS, claves_dashboard, aget_dashboard_data, get_widget
+from gestion.utils import inicio_mes_actual
+
+
+def _invalidar():
+    for grupo in (CATALOGO, COMPRAS, VENTAS):
+        incrementar_version_dashboard(grupo)
+
+
+def _con_latencia(segundos):
+    """Envoltorio de consultas que simula la ida y vuelta a un servidor remoto"""
+    def envoltorio(execute, sql, params, many, context):
+        time.sleep(segundos)
+        return execute(sql, params, many, context)
+    return envoltorio
+
+
+def _secuencial():
+    """Lo que hace la vista síncrona en frío: un widget detrás de otro"""
+    inicio_mes = inicio_mes_actual()
+    tiempos = {}
+    for widget, clave in claves_dashboard(inicio_mes).items():
+        inicio = time.perf_counter()
+        get_widget(widget, clave, inicio_mes)
+        tiempos[widget] = time.perf_counter() - inicio
+    return tiempos
+
+
+async def _paralelo(repeticiones):
+    """Lo que hace la vista asíncrona en frío, en un único bucle de eventos como bajo ASGI"""
+    duraciones = []
+    for _ in range(repeticiones):
+        _invalidar()
+        inicio = time.perf_counter()
+        await aget_dashboard_data()
+        duraciones.append(time.perf_counter() - inicio)
+    return duraciones
+
+
+class Command(BaseCommand):
+    help = 'Compara el dashboard en frío calculado en secuencia (WSGI) y en paralelo (vista asíncrona)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument(
+            '--latencia', type=float, default=0,
+            help='Milisegundos añadidos a cada consulta para simular una base de datos en otro host',
+        )
+
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        if options['latencia']:
+            envoltorio = _con_latencia(options['latencia'] / 1000)
+            # La conexión de este hilo y las que abran los hilos de la vista asíncrona
+            connection.execute_wrappers.append(envoltorio)
+            connection_created.connect(
+                lambda sender, connection, **kwargs: connection.execute_wrappers.append(envoltorio), weak=False
+            )
+        secuencial = []
+        por_widget = {widget: 0.0 for widget in WIDGETS}
+
+        for _ in range(repeticiones):
+            _invalidar()
+            inicio = time.perf_counter()
+            tiempos = _secuencial()
+            secuencial.append(time.perf_counter() - inicio)
+            for widget, tiempo in tiempos.items():
+                por_widget[widget] += tiempo
+
+        paralelo = asyncio.run(_paralelo(repeticiones))
+
+        def ms(valores):
+            valores = sorted(valores)
+            return f'media {sum(valores) / len(valores) * 1000:7.2f} ms, mediana {valores[len(valores) // 2] * 1000:7.2f} ms'
+
+        self.stdout.write(f'Repeticiones: {repeticiones} (caché invalidada en cada una), latencia {options["latencia"]} ms')
+        for widget, total in por_widget.items():
+            self.stdout.write(f'  {widget:<24} {total / repeticiones * 1000:7.2f} ms')
+        self.stdout.write(f'Widget más lento: {max(por_widget.values()) / repeticiones * 1000:7.2f} ms')
+        self.stdout.write(f'Secuencial: {ms(secuencial)}')
+        self.stdout.write(f'Paralelo:   {ms(paralelo)}')
@@ -0,0 +1,83 @@
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from gestion.snapshot import InventarioSnapshot
+
+
+def _filas_sinteticas(total):
+    """Filas con el mismo formato que get_inventario_data()"""
+    ahora = timezone.now()
+    marcas = [f'Marca {i}' for i in range(50)]
+    for i in range(1, total + 1):
+        compras = random.randint(0, 500)
+        ventas = random.randint(0, compras)
+        costo = round(random.uniform(1, 500), 2)
+        yield {
+            'id_producto': i,
+            'nombre': f'Producto {i:06d}',
+            'marca': random.choice(marcas),
+            'stock_inicial': 0,
+            'total_compras': compras,
+            'total_ventas': ventas,
+            'stock_actual': compras - ventas,
+            'costo_promedio': costo,
+            'precio_venta': round(costo * 1.3, 2),
+            'valor_total': (compras - ventas) * costo,
+            'ultima_actualizacion': ahora - timedelta(minutes=i),
+        }
+
+
+def _medir(construir):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = construir()
+    duracion = time.perf_counter() - inicio
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, memoria, duracion
+
+
+class Command(BaseCommand):
+    help = 'Compara memoria y tiempo del snapshot columnar contra la lista de dicts del inventario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=20000)
+        parser.add_argument('--filas', type=int, default=50, help='Tamaño de página a extraer')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        total = options['productos']
+        filas = options['filas']
+
+        random.seed(options['seed'])
+        lista, memoria_lista, _ = _medir(lambda: list(_filas_sinteticas(total)))
+
+        random.seed(options['seed'])
+        snapshot, memoria_snapshot, construccion = _medir(lambda: InventarioSnapshot(_filas_sinteticas(total)))
+
+        # Página intermedia ordenada por stock descendente, como en la vista
+        pagina = total // filas // 2
+        inicio = time.perf_counter()
+        ordenada = sorted(lista, key=lambda x: x['stock_actual'], reverse=True)
+        ordenada[pagina * filas:(pagina + 1) * filas]
+        tiempo_lista = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        snapshot.vista('-stock_actual')[pagina * filas:(pagina + 1) * filas]
+        tiempo_snapshot = time.perf_counter() - inicio
+
+        self.stdout.write(f'Productos: {total}')
+        self.stdout.write(f'Lista de dicts:    {memoria_lista / 1024 / 1024:8.2f} MiB')
+        self.stdout.write(
+            f'Snapshot columnar: {memoria_snapshot / 1024 / 1024:8.2f} MiB '
+            f'(incluye {len(snapshot.ordenes)} órdenes precalculados, construido en {construccion:.2f}s)'
+        )
+        self.stdout.write(f'Ahorro: {1 - memoria_snapshot / memoria_lista:.1%}')
+        self.stdout.write(
+            f'Página ordenada: lista {tiempo_lista * 1000:.2f} ms, snapshot {tiempo_snapshot * 1000:.2f} ms'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from gestion.utils import construir_cierres, fecha_iso
+
+
+class Command(BaseCommand):
+    help = 'Genera los cierres mensuales de inventario que falten, de forma incremental'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=fecha_iso, help='Rehacer los cierres desde el mes de esta fecha (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=fecha_iso, help='Último mes a cerrar (YYYY-MM-DD), por defecto el mes pasado')
+
+    def handle(self, *args, **options):
+        meses, escritos = construir_cierres(options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f'{meses} meses cerrados, {escritos} cierres escritos.'))
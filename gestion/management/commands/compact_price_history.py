@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from gestion.precios import compactar_historial, get_retencion
+
+
+class Command(BaseCommand):
+    help = 'Compacta el historial de precios: quita precios repetidos y aplica la política de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--producto', type=int, action='append', dest='productos', help='Solo este producto (se puede repetir)')
+        parser.add_argument('--sin-retencion', action='store_true', help='Solo eliminar precios repetidos')
+        parser.add_argument('--sin-deduplicar', action='store_true', help='Solo aplicar la retención')
+        parser.add_argument('--dias-diario', type=int, help='Reducir a un precio por día lo anterior a estos días')
+        parser.add_argument('--dias-mensual', type=int, help='Reducir a un precio por mes lo anterior a estos días')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Contar sin eliminar')
+
+    def handle(self, *args, **options):
+        retencion = False
+        if not options['sin_retencion']:
+            retencion = get_retencion()
+            if options['dias_diario'] is not None:
+                retencion['diario_despues_de_dias'] = options['dias_diario']
+            if options['dias_mensual'] is not None:
+                retencion['mensual_despues_de_dias'] = options['dias_mensual']
+
+        eliminados = compactar_historial(
+            productos=options['productos'],
+            deduplicar=not options['sin_deduplicar'],
+            retencion=retencion,
+            batch_size=options['batch_size'],
+            simular=options['dry_run'],
+        )
+        accion = 'se eliminarían' if options['dry_run'] else 'eliminados'
+        self.stdout.write(self.style.SUCCESS(f'{eliminados} registros de historial {accion}.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.models import TokenTerminal
+
+
+class Command(BaseCommand):
+    help = 'Crea el token con el que un terminal de punto de venta usa la API de ventas por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombre', help='Nombre del terminal')
+
+    def handle(self, *args, **options):
+        if TokenTerminal.objects.filter(nombre=options['nombre']).exists():
+            raise CommandError(f'Ya existe un token para el terminal "{options["nombre"]}"')
+        _, clave = TokenTerminal.crear(options['nombre'])
+        self.stdout.write(self.style.SUCCESS(f'Token del terminal "{options["nombre"]}" (no se volverá a mostrar):'))
+        self.stdout.write(clave)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.importar import LOTE, ErrorImportacion, importar_compras, leer_filas
+
+
+class Command(BaseCommand):
+    help = 'Importa compras desde un CSV o XLSX (ver gestion/importar.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--omitir-errores',
+            action='store_true',
+            help='Importar las filas válidas aunque otras tengan errores',
+        )
+        parser.add_argument('--lote', type=int, default=LOTE, help=f'Filas por lote (por defecto {LOTE})')
+
+    def handle(self, *args, **options):
+        def progreso(filas):
+            self.stdout.write(f'{filas} filas procesadas')
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_compras(
+                    leer_filas(archivo, options['archivo']),
+                    omitir_errores=options['omitir_errores'],
+                    lote=max(options['lote'], 1),
+                    progreso=progreso,
+                )
+        except (OSError, ErrorImportacion) as error:
+            raise CommandError(str(error))
+
+        for fila, mensaje in resultado.errores:
+            self.stderr.write(f'Fila {fila}: {mensaje}')
+        if resultado.errores and not resultado.importado:
+            raise CommandError(f'{len(resultado.errores)} filas con errores: no se importó nada')
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.creadas} compras importadas, {resultado.precios} precios nuevos, '
+            f'{len(resultado.productos)} productos actualizados'
+        ))
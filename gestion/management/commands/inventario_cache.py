@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from gestion.cache import get_estadisticas_cache, incrementar_version_inventario, reiniciar_estadisticas_cache
+
+
+class Command(BaseCommand):
+    help = 'Muestra los aciertos y fallos de la caché del inventario'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reiniciar los contadores')
+        parser.add_argument('--invalidar', action='store_true', help='Incrementar la versión del inventario')
+
+    def handle(self, *args, **options):
+        if options['invalidar']:
+            incrementar_version_inventario()
+        if options['reset']:
+            reiniciar_estadisticas_cache()
+
+        estadisticas = get_estadisticas_cache()
+        self.stdout.write(
+            f"Versión: {estadisticas['version']} | "
+            f"Aciertos: {estadisticas['hits']} | "
+            f"Fallos: {estadisticas['misses']} | "
+            f"Ratio: {estadisticas['ratio']:.2%}"
+        )
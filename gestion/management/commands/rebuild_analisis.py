@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from gestion.utils import fecha_iso, recalcular_analisis_ventas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el análisis de ventas diario con una sola consulta agrupada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=fecha_iso, help='Primer día a recalcular (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=fecha_iso, help='Último día a recalcular (YYYY-MM-DD), por defecto hoy')
+
+    def handle(self, *args, **options):
+        escritos, eliminados = recalcular_analisis_ventas(options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f'{escritos} días recalculados, {eliminados} días sin ventas eliminados.'))
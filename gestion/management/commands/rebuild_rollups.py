@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from gestion.rollups import reconstruir_resumenes
+from gestion.utils import fecha_iso
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes de ventas por día, semana y mes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=fecha_iso, help='Primer día a reconstruir (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=fecha_iso, help='Último día a reconstruir (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        escritas = reconstruir_resumenes(options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f'{escritas} filas de resumen escritas.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from gestion.busqueda import crear_indices, sql_indices
+from gestion.indice import reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Rehace el índice de búsqueda global y crea o reconstruye los índices de búsqueda (trigramas en PostgreSQL, FTS5 en SQLite)'
+
+    def handle(self, *args, **options):
+        filas = reconstruir_indice()
+        self.stdout.write(f'Índice de búsqueda global: {filas} filas')
+        # En SQLite, rehacer una tabla en una migración borra sus triggers: esto los repone
+        sentencias = sql_indices(connection.vendor)
+        if not sentencias:
+            self.stdout.write(f'La base de datos {connection.vendor} no tiene índices de búsqueda; se usa icontains')
+            return
+        crear_indices()
+        self.stdout.write(self.style.SUCCESS(f'{len(sentencias)} sentencias de índices de búsqueda ejecutadas'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from gestion.utils import recalcular_stock
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla StockProducto a partir del histórico de compras, ventas y precios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--producto',
+            type=int,
+            action='append',
+            dest='productos',
+            help='Recalcular solo este producto (se puede repetir)',
+        )
+
+    def handle(self, *args, **options):
+        total = recalcular_stock(options['productos'])
+        self.stdout.write(self.style.SUCCESS(f'{total} productos recalculados.'))
@@ -0,0 +1,45 @@
+import multiprocessing
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from gestion.jobs import bucle_worker, recuperar_perdidos
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano encoladas en la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=2, help='Número de procesos worker')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre consultas con la cola vacía')
+        parser.add_argument('--una-vez', action='store_true', help='Terminar cuando la cola quede vacía')
+        parser.add_argument(
+            '--timeout', type=int, default=30,
+            help='Minutos sin actividad tras los que una tarea en ejecución se da por perdida',
+        )
+
+    def handle(self, *args, **options):
+        recuperadas, fallidas = recuperar_perdidos(timedelta(minutes=options['timeout']))
+        if recuperadas:
+            self.stdout.write(self.style.WARNING(f'{recuperadas} tareas perdidas vueltas a encolar.'))
+        if fallidas:
+            self.stdout.write(self.style.WARNING(f'{fallidas} tareas perdidas sin intentos restantes marcadas como fallidas.'))
+
+        procesos = max(1, options['procesos'])
+        argumentos = (options['intervalo'], options['una_vez'])
+        if procesos == 1:
+            ejecutadas = bucle_worker(*argumentos)
+            self.stdout.write(self.style.SUCCESS(f'{ejecutadas} tareas ejecutadas.'))
+            return
+
+        # Cada proceso abre su propia conexión a la base de datos
+        connections.close_all()
+        self.stdout.write(f'Iniciando {procesos} workers...')
+        with multiprocessing.Pool(procesos) as pool:
+            try:
+                ejecutadas = sum(pool.starmap(bucle_worker, [argumentos] * procesos))
+            except KeyboardInterrupt:
+                pool.terminate()
+                return
+        self.stdout.write(self.style.SUCCESS(f'{ejecutadas} tareas ejecutadas.'))
@@ -28,6 +28,7 @@ class DemoRestrictionsMiddleware:
             blocked_paths = [
                 '/compras/nueva/',
                 '/compras/editar/',
+                '/compras/importar/',
                 '/ventas/nueva/',
                 '/ventas/editar/',
             ]
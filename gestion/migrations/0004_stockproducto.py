@@ -0,0 +1,79 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def poblar_stock(apps, schema_editor):
+    """Calcula el stock inicial a partir del histórico de compras y ventas"""
+    Producto = apps.get_model('gestion', 'Producto')
+    Compra = apps.get_model('gestion', 'Compra')
+    Venta = apps.get_model('gestion', 'Venta')
+    HistorialPrecio = apps.get_model('gestion', 'HistorialPrecio')
+    StockProducto = apps.get_model('gestion', 'StockProducto')
+
+    compras = {
+        c['id_producto']: c for c in Compra.objects.order_by().values('id_producto').annotate(
+            cantidad=Sum('cantidad'), suma_costo=Sum('costo_unitario'), numero=Count('pk')
+        )
+    }
+    ventas = dict(
+        Venta.objects.order_by().values('id_producto').annotate(
+            cantidad=Sum('cantidad')
+        ).values_list('id_producto', 'cantidad')
+    )
+    precios = {}
+    for precio in HistorialPrecio.objects.order_by('id_producto', 'fecha', 'id_precio').values(
+        'id_precio', 'id_producto', 'fecha', 'precio_sugerido'
+    ).iterator():
+        precios[precio['id_producto']] = precio
+
+    filas = []
+    for producto_id in Producto.objects.values_list('pk', flat=True).iterator():
+        compra = compras.get(producto_id, {})
+        total_compras = compra.get('cantidad') or 0
+        total_ventas = ventas.get(producto_id) or 0
+        precio = precios.get(producto_id)
+        filas.append(StockProducto(
+            id_producto_id=producto_id,
+            total_compras=total_compras,
+            total_ventas=total_ventas,
+            stock_actual=total_compras - total_ventas,
+            suma_costo_unitario=compra.get('suma_costo') or 0,
+            numero_compras=compra.get('numero') or 0,
+            precio_venta=precio['precio_sugerido'] if precio else 0,
+            fecha_precio=precio['fecha'] if precio else None,
+            id_precio=precio['id_precio'] if precio else None,
+        ))
+    StockProducto.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0003_analisisventa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockProducto',
+            fields=[
+                ('id_producto', models.OneToOneField(db_column='id_producto', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock', serialize=False, to='gestion.producto')),
+                ('total_compras', models.IntegerField(default=0)),
+                ('total_ventas', models.IntegerField(default=0)),
+                ('stock_actual', models.IntegerField(db_index=True, default=0)),
+                ('suma_costo_unitario', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('numero_compras', models.IntegerField(default=0)),
+                ('precio_venta', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('fecha_precio', models.DateTimeField(blank=True, null=True)),
+                ('id_precio', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Stock de Producto',
+                'verbose_name_plural': 'Stock de Productos',
+                'db_table': 'stock_productos',
+            },
+        ),
+        migrations.RunPython(poblar_stock, migrations.RunPython.noop),
+    ]
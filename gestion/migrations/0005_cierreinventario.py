@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0004_stockproducto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de cierre')),
+                ('total_compras', models.IntegerField(default=0)),
+                ('total_ventas', models.IntegerField(default=0)),
+                ('stock_actual', models.IntegerField(default=0)),
+                ('suma_costo_unitario', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('numero_compras', models.IntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('id_producto', models.ForeignKey(db_column='id_producto', on_delete=django.db.models.deletion.CASCADE, related_name='cierres', to='gestion.producto')),
+            ],
+            options={
+                'verbose_name': 'Cierre de Inventario',
+                'verbose_name_plural': 'Cierres de Inventario',
+                'db_table': 'cierres_inventario',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cierreinventario',
+            constraint=models.UniqueConstraint(fields=('id_producto', 'fecha'), name='cierre_producto_fecha_unico'),
+        ),
+    ]
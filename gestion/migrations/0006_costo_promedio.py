@@ -0,0 +1,122 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:49
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Copia congelada de la reproducción de gestion/costos.py: la migración no
+# debe cambiar de comportamiento si ese módulo cambia después
+PRECISION = Decimal('0.0001')
+COMPRA, VENTA = 0, 1
+
+
+def agrupar_por_producto(compras, ventas):
+    """{producto: [(fecha, tipo, desempate, cantidad, costo_unitario)]} en orden"""
+    movimientos = {}
+    for producto_id, fecha, id_compra, cantidad, costo_unitario in compras:
+        movimientos.setdefault(producto_id, []).append((fecha, COMPRA, id_compra, cantidad, costo_unitario))
+    for producto_id, fecha_creacion, id_venta, cantidad in ventas:
+        movimientos.setdefault(producto_id, []).append(
+            (timezone.localdate(fecha_creacion), VENTA, (fecha_creacion, id_venta), cantidad, None)
+        )
+    for lista in movimientos.values():
+        lista.sort(key=lambda m: m[:3])
+    return movimientos
+
+
+def reproducir(movimientos):
+    """Costo promedio ponderado móvil y fechas del último movimiento de cada tipo"""
+    estado = {'costo_promedio': Decimal('0'), 'fecha_ultima_compra': None, 'fecha_ultima_venta': None}
+    stock = 0
+    for fecha, tipo, _, cantidad, costo_unitario in movimientos:
+        if tipo == COMPRA:
+            nuevo_stock = stock + cantidad
+            costo_unitario = Decimal(costo_unitario)
+            if stock <= 0 or nuevo_stock <= 0:
+                estado['costo_promedio'] = costo_unitario.quantize(PRECISION)
+            else:
+                estado['costo_promedio'] = (
+                    (stock * estado['costo_promedio'] + cantidad * costo_unitario) / nuevo_stock
+                ).quantize(PRECISION)
+            stock = nuevo_stock
+            estado['fecha_ultima_compra'] = fecha
+        else:
+            stock -= cantidad
+            estado['fecha_ultima_venta'] = fecha
+    return estado
+
+
+def poblar_costo_promedio(apps, schema_editor):
+    """
+    Reproduce compras y ventas de cada producto para obtener su costo promedio
+    ponderado. Los cierres anteriores no guardaban costos: se borran y se
+    regeneran con ``manage.py build_checkpoints``.
+    """
+    Compra = apps.get_model('gestion', 'Compra')
+    Venta = apps.get_model('gestion', 'Venta')
+    StockProducto = apps.get_model('gestion', 'StockProducto')
+    CierreInventario = apps.get_model('gestion', 'CierreInventario')
+
+    CierreInventario.objects.all().delete()
+    movimientos = agrupar_por_producto(
+        Compra.objects.order_by().values_list('id_producto', 'fecha', 'id_compra', 'cantidad', 'costo_unitario').iterator(),
+        Venta.objects.order_by().values_list('id_producto', 'fecha_creacion', 'id_venta', 'cantidad').iterator(),
+    )
+    filas = []
+    for stock in StockProducto.objects.filter(pk__in=list(movimientos)).iterator():
+        estado = reproducir(movimientos[stock.pk])
+        stock.costo_promedio = estado['costo_promedio']
+        stock.fecha_ultima_compra = estado['fecha_ultima_compra']
+        stock.fecha_ultima_venta = estado['fecha_ultima_venta']
+        filas.append(stock)
+    StockProducto.objects.bulk_update(
+        filas, ['costo_promedio', 'fecha_ultima_compra', 'fecha_ultima_venta'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0005_cierreinventario'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='cierreinventario',
+            name='numero_compras',
+        ),
+        migrations.RemoveField(
+            model_name='cierreinventario',
+            name='suma_costo_unitario',
+        ),
+        migrations.RemoveField(
+            model_name='stockproducto',
+            name='numero_compras',
+        ),
+        migrations.RemoveField(
+            model_name='stockproducto',
+            name='suma_costo_unitario',
+        ),
+        migrations.AddField(
+            model_name='cierreinventario',
+            name='costo_promedio',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='stockproducto',
+            name='costo_promedio',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=14, verbose_name='Costo promedio ponderado'),
+        ),
+        migrations.AddField(
+            model_name='stockproducto',
+            name='fecha_ultima_compra',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockproducto',
+            name='fecha_ultima_venta',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(poblar_costo_promedio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Resúmenes iniciales a partir de todas las ventas existentes"""
+    Venta = apps.get_model('gestion', 'Venta')
+    truncar = {
+        'dia': TruncDate('fecha_creacion'),
+        'semana': TruncWeek('fecha_creacion', output_field=DateField()),
+        'mes': TruncMonth('fecha_creacion', output_field=DateField()),
+    }
+    for nombre, campo in (('ResumenVentaProducto', 'id_producto'), ('ResumenVentaCliente', 'id_cliente')):
+        modelo = apps.get_model('gestion', nombre)
+        for granularidad, expresion in truncar.items():
+            grupos = Venta.objects.order_by().filter(**{f'{campo}__isnull': False}).annotate(
+                periodo=expresion
+            ).values('periodo', campo).annotate(
+                total_unidades=Sum('cantidad'), total_ingresos=Sum('total'), total_ventas=Count('pk')
+            )
+            modelo.objects.bulk_create([
+                modelo(**{
+                    f'{campo}_id': grupo[campo],
+                    'granularidad': granularidad,
+                    'periodo': grupo['periodo'],
+                    'unidades': grupo['total_unidades'],
+                    'ingresos': grupo['total_ingresos'] or 0,
+                    'numero_ventas': grupo['total_ventas'],
+                })
+                for grupo in grupos.iterator()
+            ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0007_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidad', models.CharField(choices=[('dia', 'Día'), ('semana', 'Semana'), ('mes', 'Mes')], max_length=10)),
+                ('periodo', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('numero_ventas', models.IntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('id_producto', models.ForeignKey(db_column='id_producto', on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_venta', to='gestion.producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Ventas por Producto',
+                'verbose_name_plural': 'Resúmenes de Ventas por Producto',
+                'db_table': 'resumen_ventas_producto',
+                'ordering': ['-periodo'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidad', models.CharField(choices=[('dia', 'Día'), ('semana', 'Semana'), ('mes', 'Mes')], max_length=10)),
+                ('periodo', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('numero_ventas', models.IntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('id_cliente', models.ForeignKey(db_column='id_cliente', on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_venta', to='gestion.cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Ventas por Cliente',
+                'verbose_name_plural': 'Resúmenes de Ventas por Cliente',
+                'db_table': 'resumen_ventas_cliente',
+                'ordering': ['-periodo'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['id_cliente', 'granularidad', 'periodo'], name='resumen_cliente_serie_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumenventacliente',
+            constraint=models.UniqueConstraint(fields=('granularidad', 'periodo', 'id_cliente'), name='resumen_cliente_unico'),
+        ),
+        migrations.AddIndex(
+            model_name='resumenventaproducto',
+            index=models.Index(fields=['id_producto', 'granularidad', 'periodo'], name='resumen_producto_serie_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumenventaproducto',
+            constraint=models.UniqueConstraint(fields=('granularidad', 'periodo', 'id_producto'), name='resumen_producto_unico'),
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
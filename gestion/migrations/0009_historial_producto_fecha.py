@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_resumen_ventas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialprecio',
+            index=models.Index(fields=['id_producto', 'fecha'], name='historial_producto_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0009_historial_producto_fecha'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['fecha', 'id_compra'], name='compra_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha_creacion', 'id_venta'], name='venta_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:20
+
+import sqlite3
+
+from django.db import migrations
+
+# El SQL queda fijo aquí: la migración no depende de gestion/busqueda.py,
+# que puede cambiar después. Trigramas GIN en PostgreSQL, tablas FTS5 con
+# triggers en SQLite (tokenizador trigram desde 3.34); nada en otras bases.
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+SQL_POSTGRES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS productos_nombre_trgm ON productos USING gin (nombre gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS productos_marca_trgm ON productos USING gin (marca gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS clientes_nombre_trgm ON clientes USING gin (nombre gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS clientes_apellido_trgm ON clientes USING gin (apellido gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS proveedores_empresa_trgm ON proveedores USING gin (empresa gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS proveedores_telefono_trgm ON proveedores USING gin (telefono gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS proveedores_productos_trgm ON proveedores USING gin (productos gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS compras_numero_factura_trgm ON compras USING gin (numero_factura gin_trgm_ops)',
+]
+
+SQL_POSTGRES_ELIMINAR = [
+    'DROP INDEX IF EXISTS productos_nombre_trgm',
+    'DROP INDEX IF EXISTS productos_marca_trgm',
+    'DROP INDEX IF EXISTS clientes_nombre_trgm',
+    'DROP INDEX IF EXISTS clientes_apellido_trgm',
+    'DROP INDEX IF EXISTS proveedores_empresa_trgm',
+    'DROP INDEX IF EXISTS proveedores_telefono_trgm',
+    'DROP INDEX IF EXISTS proveedores_productos_trgm',
+    'DROP INDEX IF EXISTS compras_numero_factura_trgm',
+]
+
+SQL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(nombre, marca, content='productos', content_rowid='id_producto', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN INSERT INTO productos_fts(rowid, nombre, marca) VALUES (new.id_producto, new.nombre, new.marca); END',
+    "CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN INSERT INTO productos_fts(productos_fts, rowid, nombre, marca) VALUES ('delete', old.id_producto, old.nombre, old.marca); END",
+    "CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE ON productos BEGIN INSERT INTO productos_fts(productos_fts, rowid, nombre, marca) VALUES ('delete', old.id_producto, old.nombre, old.marca); INSERT INTO productos_fts(rowid, nombre, marca) VALUES (new.id_producto, new.nombre, new.marca); END",
+    "INSERT INTO productos_fts(productos_fts) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(nombre, apellido, content='clientes', content_rowid='id_cliente', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS clientes_fts_ai AFTER INSERT ON clientes BEGIN INSERT INTO clientes_fts(rowid, nombre, apellido) VALUES (new.id_cliente, new.nombre, new.apellido); END',
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_ad AFTER DELETE ON clientes BEGIN INSERT INTO clientes_fts(clientes_fts, rowid, nombre, apellido) VALUES ('delete', old.id_cliente, old.nombre, old.apellido); END",
+    "CREATE TRIGGER IF NOT EXISTS clientes_fts_au AFTER UPDATE ON clientes BEGIN INSERT INTO clientes_fts(clientes_fts, rowid, nombre, apellido) VALUES ('delete', old.id_cliente, old.nombre, old.apellido); INSERT INTO clientes_fts(rowid, nombre, apellido) VALUES (new.id_cliente, new.nombre, new.apellido); END",
+    "INSERT INTO clientes_fts(clientes_fts) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS proveedores_fts USING fts5(empresa, telefono, productos, content='proveedores', content_rowid='id_proveedor', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS proveedores_fts_ai AFTER INSERT ON proveedores BEGIN INSERT INTO proveedores_fts(rowid, empresa, telefono, productos) VALUES (new.id_proveedor, new.empresa, new.telefono, new.productos); END',
+    "CREATE TRIGGER IF NOT EXISTS proveedores_fts_ad AFTER DELETE ON proveedores BEGIN INSERT INTO proveedores_fts(proveedores_fts, rowid, empresa, telefono, productos) VALUES ('delete', old.id_proveedor, old.empresa, old.telefono, old.productos); END",
+    "CREATE TRIGGER IF NOT EXISTS proveedores_fts_au AFTER UPDATE ON proveedores BEGIN INSERT INTO proveedores_fts(proveedores_fts, rowid, empresa, telefono, productos) VALUES ('delete', old.id_proveedor, old.empresa, old.telefono, old.productos); INSERT INTO proveedores_fts(rowid, empresa, telefono, productos) VALUES (new.id_proveedor, new.empresa, new.telefono, new.productos); END",
+    "INSERT INTO proveedores_fts(proveedores_fts) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS compras_fts USING fts5(numero_factura, content='compras', content_rowid='id_compra', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS compras_fts_ai AFTER INSERT ON compras BEGIN INSERT INTO compras_fts(rowid, numero_factura) VALUES (new.id_compra, new.numero_factura); END',
+    "CREATE TRIGGER IF NOT EXISTS compras_fts_ad AFTER DELETE ON compras BEGIN INSERT INTO compras_fts(compras_fts, rowid, numero_factura) VALUES ('delete', old.id_compra, old.numero_factura); END",
+    "CREATE TRIGGER IF NOT EXISTS compras_fts_au AFTER UPDATE ON compras BEGIN INSERT INTO compras_fts(compras_fts, rowid, numero_factura) VALUES ('delete', old.id_compra, old.numero_factura); INSERT INTO compras_fts(rowid, numero_factura) VALUES (new.id_compra, new.numero_factura); END",
+    "INSERT INTO compras_fts(compras_fts) VALUES ('rebuild')",
+]
+
+SQL_SQLITE_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS productos_fts_ai',
+    'DROP TRIGGER IF EXISTS productos_fts_ad',
+    'DROP TRIGGER IF EXISTS productos_fts_au',
+    'DROP TABLE IF EXISTS productos_fts',
+    'DROP TRIGGER IF EXISTS clientes_fts_ai',
+    'DROP TRIGGER IF EXISTS clientes_fts_ad',
+    'DROP TRIGGER IF EXISTS clientes_fts_au',
+    'DROP TABLE IF EXISTS clientes_fts',
+    'DROP TRIGGER IF EXISTS proveedores_fts_ai',
+    'DROP TRIGGER IF EXISTS proveedores_fts_ad',
+    'DROP TRIGGER IF EXISTS proveedores_fts_au',
+    'DROP TABLE IF EXISTS proveedores_fts',
+    'DROP TRIGGER IF EXISTS compras_fts_ai',
+    'DROP TRIGGER IF EXISTS compras_fts_ad',
+    'DROP TRIGGER IF EXISTS compras_fts_au',
+    'DROP TABLE IF EXISTS compras_fts',
+]
+
+
+def _sentencias(vendor):
+    if vendor == 'postgresql':
+        return SQL_POSTGRES
+    if vendor == 'sqlite' and SQLITE_TRIGRAM:
+        return SQL_SQLITE
+    return []
+
+
+def crear_indices_busqueda(apps, schema_editor):
+    for sentencia in _sentencias(schema_editor.connection.vendor):
+        schema_editor.execute(sentencia)
+
+
+def eliminar_indices_busqueda(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'postgresql': SQL_POSTGRES_ELIMINAR, 'sqlite': SQL_SQLITE_ELIMINAR}.get(vendor, [])
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0010_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices_busqueda, eliminar_indices_busqueda),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:09
+
+import sqlite3
+
+from django.db import migrations, models
+
+# SQL y documentos fijos aquí, sin importar código de la app: la migración
+# debe hacer lo mismo aunque gestion/busqueda.py o gestion/indice.py cambien.
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+SQL_POSTGRES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS indice_busqueda_texto_trgm ON indice_busqueda USING gin (texto gin_trgm_ops)',
+]
+
+SQL_POSTGRES_ELIMINAR = [
+    'DROP INDEX IF EXISTS indice_busqueda_texto_trgm',
+]
+
+SQL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS indice_busqueda_fts USING fts5(texto, content='indice_busqueda', content_rowid='id', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS indice_busqueda_fts_ai AFTER INSERT ON indice_busqueda BEGIN INSERT INTO indice_busqueda_fts(rowid, texto) VALUES (new.id, new.texto); END',
+    "CREATE TRIGGER IF NOT EXISTS indice_busqueda_fts_ad AFTER DELETE ON indice_busqueda BEGIN INSERT INTO indice_busqueda_fts(indice_busqueda_fts, rowid, texto) VALUES ('delete', old.id, old.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS indice_busqueda_fts_au AFTER UPDATE ON indice_busqueda BEGIN INSERT INTO indice_busqueda_fts(indice_busqueda_fts, rowid, texto) VALUES ('delete', old.id, old.texto); INSERT INTO indice_busqueda_fts(rowid, texto) VALUES (new.id, new.texto); END",
+    "INSERT INTO indice_busqueda_fts(indice_busqueda_fts) VALUES ('rebuild')",
+]
+
+SQL_SQLITE_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS indice_busqueda_fts_ai',
+    'DROP TRIGGER IF EXISTS indice_busqueda_fts_ad',
+    'DROP TRIGGER IF EXISTS indice_busqueda_fts_au',
+    'DROP TABLE IF EXISTS indice_busqueda_fts',
+]
+
+LOTE = 2000
+
+# Modelo -> (tipo, función que devuelve título, detalle y texto)
+DOCUMENTOS = {
+    'Cliente': ('cliente', lambda obj: (
+        f'{obj.nombre} {obj.apellido}', '', f'{obj.nombre} {obj.apellido}'
+    )),
+    'Producto': ('producto', lambda obj: (
+        obj.nombre, obj.marca or '', f'{obj.nombre} {obj.marca or ""}'
+    )),
+    'Proveedor': ('proveedor', lambda obj: (
+        obj.empresa, obj.telefono or '', f'{obj.empresa} {obj.telefono or ""} {obj.productos or ""}'
+    )),
+    'Compra': ('compra', lambda obj: (
+        f'Factura {obj.numero_factura}', f'{obj.fecha} · C${obj.costo_total}', obj.numero_factura
+    )),
+    'Venta': ('venta', lambda obj: (
+        f'Venta #{obj.pk}', f'{obj.fecha_creacion:%Y-%m-%d} · C${obj.total or 0}', f'venta {obj.pk}'
+    )),
+}
+
+
+def poblar_indice(apps, schema_editor):
+    """Una fila por cliente, producto, proveedor, compra y venta existentes"""
+    IndiceBusqueda = apps.get_model('gestion', 'IndiceBusqueda')
+    for nombre, (tipo, generar) in DOCUMENTOS.items():
+        filas = []
+        for obj in apps.get_model('gestion', nombre).objects.order_by('pk').iterator(chunk_size=LOTE):
+            titulo, detalle, texto = generar(obj)
+            filas.append(IndiceBusqueda(
+                tipo=tipo, objeto_id=obj.pk, titulo=titulo[:255], detalle=detalle[:255], texto=texto.strip(),
+            ))
+            if len(filas) == LOTE:
+                IndiceBusqueda.objects.bulk_create(filas)
+                filas = []
+        IndiceBusqueda.objects.bulk_create(filas)
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        sentencias = SQL_POSTGRES
+    elif vendor == 'sqlite' and SQLITE_TRIGRAM:
+        sentencias = SQL_SQLITE
+    else:
+        sentencias = []
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    sentencias = {'postgresql': SQL_POSTGRES_ELIMINAR, 'sqlite': SQL_SQLITE_ELIMINAR}.get(vendor, [])
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0011_indices_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('cliente', 'Cliente'), ('producto', 'Producto'), ('proveedor', 'Proveedor'), ('compra', 'Compra'), ('venta', 'Venta')], max_length=20)),
+                ('objeto_id', models.PositiveIntegerField()),
+                ('titulo', models.CharField(max_length=255)),
+                ('detalle', models.CharField(blank=True, max_length=255)),
+                ('texto', models.TextField()),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Entrada del índice de búsqueda',
+                'verbose_name_plural': 'Índice de búsqueda',
+                'db_table': 'indice_busqueda',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='indicebusqueda',
+            constraint=models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='indice_busqueda_unico'),
+        ),
+        migrations.RunPython(poblar_indice, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
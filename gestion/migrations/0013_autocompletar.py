@@ -0,0 +1,69 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:10
+
+import sqlite3
+import unicodedata
+
+from django.db import migrations, models
+
+# Copias fijas de gestion/indice.py y gestion/busqueda.py a esta fecha:
+# la migración no importa código de la app.
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+SQL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS indice_busqueda_fts USING fts5(texto, content='indice_busqueda', content_rowid='id', tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS indice_busqueda_fts_ai AFTER INSERT ON indice_busqueda BEGIN INSERT INTO indice_busqueda_fts(rowid, texto) VALUES (new.id, new.texto); END',
+    "CREATE TRIGGER IF NOT EXISTS indice_busqueda_fts_ad AFTER DELETE ON indice_busqueda BEGIN INSERT INTO indice_busqueda_fts(indice_busqueda_fts, rowid, texto) VALUES ('delete', old.id, old.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS indice_busqueda_fts_au AFTER UPDATE ON indice_busqueda BEGIN INSERT INTO indice_busqueda_fts(indice_busqueda_fts, rowid, texto) VALUES ('delete', old.id, old.texto); INSERT INTO indice_busqueda_fts(rowid, texto) VALUES (new.id, new.texto); END",
+    "INSERT INTO indice_busqueda_fts(indice_busqueda_fts) VALUES ('rebuild')",
+]
+
+LOTE = 2000
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Café Ñandú' -> 'cafe nandu'"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()[:255]
+
+
+def poblar_clave(apps, schema_editor):
+    """La clave de autocompletado de las filas que 0012 ya cargó: su título normalizado"""
+    IndiceBusqueda = apps.get_model('gestion', 'IndiceBusqueda')
+    filas = []
+    for fila in IndiceBusqueda.objects.only('pk', 'titulo').order_by('pk').iterator(chunk_size=LOTE):
+        fila.clave = normalizar(fila.titulo)
+        filas.append(fila)
+        if len(filas) == LOTE:
+            IndiceBusqueda.objects.bulk_update(filas, ['clave'])
+            filas = []
+    IndiceBusqueda.objects.bulk_update(filas, ['clave'])
+
+
+def recrear_indice_busqueda(apps, schema_editor):
+    # En SQLite AddField rehace la tabla y se pierden los triggers de FTS5
+    if schema_editor.connection.vendor == 'sqlite' and SQLITE_TRIGRAM:
+        for sentencia in SQL_SQLITE:
+            schema_editor.execute(sentencia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0012_indice_busqueda'),
+    ]
+
+    operations = [
+        # Al revertir, RemoveField también rehace la tabla: se reponen los triggers al final
+        migrations.RunPython(migrations.RunPython.noop, recrear_indice_busqueda),
+        migrations.AddField(
+            model_name='indicebusqueda',
+            name='clave',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='indicebusqueda',
+            index=models.Index(fields=['tipo', 'clave', 'objeto_id'], name='indice_busqueda_clave_idx'),
+        ),
+        migrations.RunPython(poblar_clave, migrations.RunPython.noop),
+        migrations.RunPython(recrear_indice_busqueda, migrations.RunPython.noop),
+    ]
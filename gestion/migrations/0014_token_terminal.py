@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0013_autocompletar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenTerminal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('clave', models.CharField(editable=False, max_length=64, unique=True)),
+                ('activo', models.BooleanField(default=True)),
+                ('ultimo_uso', models.DateTimeField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Token de terminal',
+                'verbose_name_plural': 'Tokens de terminal',
+                'db_table': 'tokens_terminal',
+                'ordering': ['nombre'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0014_token_terminal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCache',
+            fields=[
+                ('clave', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Versión de caché',
+                'verbose_name_plural': 'Versiones de caché',
+                'db_table': 'versiones_cache',
+            },
+        ),
+    ]
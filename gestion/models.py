@@ -1,10 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
 from django.dispatch import receiver
-from django.db.models import Sum
+from django.db.models import Sum, F, Q
 from decimal import Decimal
+from .cache import incrementar_version_inventario, incrementar_version_dashboard
 
 class Cliente(models.Model):
     id_cliente = models.AutoField(primary_key=True)
@@ -70,6 +72,10 @@ class Compra(models.Model):
         db_table = 'compras'
         verbose_name = 'Compra'
         verbose_name_plural = 'Compras'
+        indexes = [
+            # Paginación por cursor de la lista de compras
+            models.Index(fields=['fecha', 'id_compra'], name='compra_fecha_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Calcular campos automáticos
@@ -81,7 +87,9 @@ class Compra(models.Model):
             self.ganancia_unitaria = self.precio - self.costo_unitario
             self.ganancia_total = self.ganancia_unitaria * self.cantidad
         
-        super().save(*args, **kwargs)
+        # El stock se actualiza en post_save, dentro de la misma transacción
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Compra #{self.numero_factura} - {self.id_producto}"
@@ -100,6 +108,10 @@ class Venta(models.Model):
         db_table = 'ventas'
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
+        indexes = [
+            # Paginación por cursor de la lista de ventas
+            models.Index(fields=['fecha_creacion', 'id_venta'], name='venta_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"Venta #{self.id_venta} - {self.id_producto}"
@@ -108,7 +120,9 @@ class Venta(models.Model):
         """Calcula automáticamente el total antes de guardar"""
         if self.precio and self.cantidad:
             self.total = self.precio * self.cantidad
-        super().save(*args, **kwargs)
+        # El stock se actualiza en post_save, dentro de la misma transacción
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
     
     @property
     def precio_unitario(self):
@@ -128,10 +142,263 @@ class HistorialPrecio(models.Model):
         verbose_name = 'Historial de Precio'
         verbose_name_plural = 'Historial de Precios'
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['id_producto', 'fecha'], name='historial_producto_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.id_producto} - ${self.precio_sugerido} - {self.fecha.strftime('%Y-%m-%d')}"
 
+#---------- Stock por Producto ------------
+class StockProducto(models.Model):
+    """Existencias materializadas por producto, mantenidas por señales"""
+    id_producto = models.OneToOneField(Producto, on_delete=models.CASCADE, primary_key=True, db_column='id_producto', related_name='stock')
+    total_compras = models.IntegerField(default=0)
+    total_ventas = models.IntegerField(default=0)
+    stock_actual = models.IntegerField(default=0, db_index=True)
+    costo_promedio = models.DecimalField(max_digits=14, decimal_places=4, default=0, verbose_name="Costo promedio ponderado")
+    fecha_ultima_compra = models.DateField(blank=True, null=True)
+    fecha_ultima_venta = models.DateField(blank=True, null=True)
+    precio_venta = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    fecha_precio = models.DateTimeField(blank=True, null=True)
+    id_precio = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'stock_productos'
+        verbose_name = 'Stock de Producto'
+        verbose_name_plural = 'Stock de Productos'
+
+    def __str__(self):
+        return f"{self.id_producto_id} - Stock: {self.stock_actual}"
+
+    @property
+    def valor_total(self):
+        """Valor del stock al costo promedio ponderado"""
+        return self.stock_actual * self.costo_promedio
+
+#---------- Cierres de Inventario ------------
+class CierreInventario(models.Model):
+    """Estado acumulado de un producto al final de un mes (checkpoint)"""
+    id_producto = models.ForeignKey(Producto, on_delete=models.CASCADE, db_column='id_producto', related_name='cierres')
+    fecha = models.DateField(verbose_name="Fecha de cierre")
+    total_compras = models.IntegerField(default=0)
+    total_ventas = models.IntegerField(default=0)
+    stock_actual = models.IntegerField(default=0)
+    costo_promedio = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'cierres_inventario'
+        verbose_name = 'Cierre de Inventario'
+        verbose_name_plural = 'Cierres de Inventario'
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['id_producto', 'fecha'], name='cierre_producto_fecha_unico'),
+        ]
+
+    def __str__(self):
+        return f"Cierre {self.fecha} - {self.id_producto_id} - Stock: {self.stock_actual}"
+
+#---------- Resúmenes de ventas (rollups) ------------
+GRANULARIDADES = [
+    ('dia', 'Día'),
+    ('semana', 'Semana'),
+    ('mes', 'Mes'),
+]
+
+class ResumenVenta(models.Model):
+    """Totales de ventas de un periodo; ``periodo`` es el primer día (lunes en semanas)"""
+    granularidad = models.CharField(max_length=10, choices=GRANULARIDADES)
+    periodo = models.DateField()
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    numero_ventas = models.IntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['-periodo']
+
+class ResumenVentaProducto(ResumenVenta):
+    id_producto = models.ForeignKey(Producto, on_delete=models.CASCADE, db_column='id_producto', related_name='resumenes_venta')
+
+    class Meta(ResumenVenta.Meta):
+        db_table = 'resumen_ventas_producto'
+        verbose_name = 'Resumen de Ventas por Producto'
+        verbose_name_plural = 'Resúmenes de Ventas por Producto'
+        constraints = [
+            models.UniqueConstraint(fields=['granularidad', 'periodo', 'id_producto'], name='resumen_producto_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['id_producto', 'granularidad', 'periodo'], name='resumen_producto_serie_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_producto_id} - {self.granularidad} {self.periodo} - {self.unidades} u."
+
+class ResumenVentaCliente(ResumenVenta):
+    """Solo ventas con cliente asignado"""
+    id_cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, db_column='id_cliente', related_name='resumenes_venta')
+
+    class Meta(ResumenVenta.Meta):
+        db_table = 'resumen_ventas_cliente'
+        verbose_name = 'Resumen de Ventas por Cliente'
+        verbose_name_plural = 'Resúmenes de Ventas por Cliente'
+        constraints = [
+            models.UniqueConstraint(fields=['granularidad', 'periodo', 'id_cliente'], name='resumen_cliente_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['id_cliente', 'granularidad', 'periodo'], name='resumen_cliente_serie_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_cliente_id} - {self.granularidad} {self.periodo} - C${self.ingresos}"
+
+#---------- Tareas en segundo plano ------------
+class Job(models.Model):
+    """Tarea larga encolada en la base de datos y ejecutada por run_workers"""
+    PENDIENTE = 'pendiente'
+    EJECUTANDO = 'ejecutando'
+    COMPLETADO = 'completado'
+    FALLIDO = 'fallido'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EJECUTANDO, 'Ejecutando'),
+        (COMPLETADO, 'Completado'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=3)
+    progreso = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    mensaje = models.CharField(max_length=255, blank=True)
+    resultado = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'ejecutar_desde'], name='job_estado_ejecutar_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tarea #{self.pk} - {self.tipo} ({self.estado})"
+
+    @property
+    def porcentaje(self):
+        if self.estado == self.COMPLETADO:
+            return 100
+        return int(self.progreso * 100 / self.total) if self.total else 0
+
+    @property
+    def terminado(self):
+        return self.estado in (self.COMPLETADO, self.FALLIDO)
+
+#---------- Versiones de la caché ------------
+class VersionCache(models.Model):
+    """
+    Contador de versión de un grupo de datos cacheados (ver gestion/cache.py).
+    Vive en la base de datos para que lo vean todos los procesos aunque la
+    caché de Django sea local a cada uno.
+    """
+    clave = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=1)
+
+    class Meta:
+        db_table = 'versiones_cache'
+        verbose_name = 'Versión de caché'
+        verbose_name_plural = 'Versiones de caché'
+
+    def __str__(self):
+        return f"{self.clave} = {self.version}"
+
+#---------- Terminales de punto de venta ------------
+class TokenTerminal(models.Model):
+    """
+    Credencial de un terminal para la API de ventas por lotes
+    (cabecera ``Authorization: Token <clave>``). Solo se guarda el SHA-256
+    de la clave; se crea con ``manage.py create_terminal_token``.
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    clave = models.CharField(max_length=64, unique=True, editable=False)
+    activo = models.BooleanField(default=True)
+    ultimo_uso = models.DateTimeField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'tokens_terminal'
+        verbose_name = 'Token de terminal'
+        verbose_name_plural = 'Tokens de terminal'
+        ordering = ['nombre']
+
+    def __str__(self):
+        return self.nombre
+
+    @staticmethod
+    def resumen(clave):
+        import hashlib
+        return hashlib.sha256(clave.encode()).hexdigest()
+
+    @classmethod
+    def crear(cls, nombre):
+        """Crea el token y devuelve (token, clave en claro); la clave no se puede recuperar después"""
+        import secrets
+        clave = secrets.token_urlsafe(32)
+        return cls.objects.create(nombre=nombre, clave=cls.resumen(clave)), clave
+
+#---------- Índice de búsqueda global ------------
+class IndiceBusqueda(models.Model):
+    """Una fila por cliente, producto, proveedor, compra o venta para la búsqueda global"""
+    CLIENTE = 'cliente'
+    PRODUCTO = 'producto'
+    PROVEEDOR = 'proveedor'
+    COMPRA = 'compra'
+    VENTA = 'venta'
+    TIPOS = [
+        (CLIENTE, 'Cliente'),
+        (PRODUCTO, 'Producto'),
+        (PROVEEDOR, 'Proveedor'),
+        (COMPRA, 'Compra'),
+        (VENTA, 'Venta'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    objeto_id = models.PositiveIntegerField()
+    titulo = models.CharField(max_length=255)
+    detalle = models.CharField(max_length=255, blank=True)
+    texto = models.TextField()
+    # Título en minúsculas y sin acentos, para autocompletar por prefijo
+    clave = models.CharField(max_length=255, default='')
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'indice_busqueda'
+        verbose_name = 'Entrada del índice de búsqueda'
+        verbose_name_plural = 'Índice de búsqueda'
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='indice_busqueda_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['tipo', 'clave', 'objeto_id'], name='indice_busqueda_clave_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.objeto_id} - {self.titulo}"
+
 #---------- Análisis de Ventas ------------
 class AnalisisVenta(models.Model):
     fecha = models.DateField(unique=True, verbose_name="Fecha del análisis")
@@ -150,9 +417,16 @@ class AnalisisVenta(models.Model):
     def __str__(self):
         return f"Análisis {self.fecha} - Total: C${self.total_ventas}"
 
+# Proporciones derivadas del total del día
+PORCENTAJE_GANANCIA = Decimal('0.20')  # 20%
+PORCENTAJE_AHORRO = Decimal('0.30')  # 30% del promedio
+
 # Función para actualizar análisis
 def actualizar_analisis_fecha(fecha):
-    """Función para calcular y actualizar el análisis de una fecha específica"""
+    """
+    Recalcula desde cero el análisis de una fecha sumando todas sus ventas.
+    Es la vía de reparación: el día a día se mantiene con aplicar_delta_analisis.
+    """
 
     # Calcular total de ventas del día
     total_dia = Venta.objects.filter(
@@ -160,8 +434,8 @@ def actualizar_analisis_fecha(fecha):
     ).aggregate(total=Sum('total'))['total'] or Decimal('0')
     
     # Calcular métricas
-    promedio_ganancia = total_dia * Decimal('0.20')  # 20%
-    ahorro = promedio_ganancia * Decimal('0.30')  # 30% del promedio
+    promedio_ganancia = total_dia * PORCENTAJE_GANANCIA
+    ahorro = promedio_ganancia * PORCENTAJE_AHORRO
     
     # Crear o actualizar el registro
     AnalisisVenta.objects.update_or_create(
@@ -173,12 +447,278 @@ def actualizar_analisis_fecha(fecha):
         }
     )
 
+def aplicar_delta_analisis(fecha, delta):
+    """
+    Suma ``delta`` al total de ventas de un día con F(), sin volver a leer
+    las ventas. Las métricas derivadas se recalculan desde el nuevo total.
+    Si el día aún no tiene análisis se calcula completo una sola vez.
+    """
+    if not delta or fecha > timezone.localdate():
+        return
+
+    nuevo_total = F('total_ventas') + delta
+    actualizados = AnalisisVenta.objects.filter(fecha=fecha).update(
+        total_ventas=nuevo_total,
+        promedio_ganancia=nuevo_total * PORCENTAJE_GANANCIA,
+        ahorro=nuevo_total * (PORCENTAJE_GANANCIA * PORCENTAJE_AHORRO),
+        fecha_actualizacion=timezone.now(),
+    )
+    if not actualizados:
+        actualizar_analisis_fecha(fecha)
+
 @receiver(post_save, sender=Venta)
 def actualizar_analisis_venta(sender, instance, **kwargs):
-    """Actualizar el análisis del día cuando se crea/edita una venta"""
-    fecha_venta = instance.fecha_creacion.date()
-    hoy = timezone.now().date()
-    
-    # Solo actualizar si la venta es de hoy (o la fecha correspondiente)
-    if fecha_venta <= hoy:
-        actualizar_analisis_fecha(fecha_venta)
+    """
+    Aplica al análisis diario la diferencia que introduce la venta.
+    Corre dentro de la transacción de Venta.save, así que se confirma o
+    se revierte junto con la venta.
+    """
+    fecha = timezone.localdate(instance.fecha_creacion)
+    total = instance.total or Decimal('0')
+
+    anterior = getattr(instance, '_estado_anterior', None)
+    if not anterior:
+        aplicar_delta_analisis(fecha, total)
+        return
+
+    fecha_anterior = timezone.localdate(anterior['fecha_creacion'])
+    total_anterior = anterior['total'] or Decimal('0')
+    if fecha_anterior == fecha:
+        aplicar_delta_analisis(fecha, total - total_anterior)
+    else:
+        # La venta cambió de día: se resta de uno y se suma al otro
+        aplicar_delta_analisis(fecha_anterior, -total_anterior)
+        aplicar_delta_analisis(fecha, total)
+
+@receiver(post_delete, sender=Venta)
+def eliminar_analisis_venta(sender, instance, **kwargs):
+    aplicar_delta_analisis(timezone.localdate(instance.fecha_creacion), -(instance.total or Decimal('0')))
+
+#---------- Resúmenes de ventas ------------
+def _datos_resumen(venta):
+    return {
+        'id_producto': venta.id_producto_id,
+        'id_cliente': venta.id_cliente_id,
+        'cantidad': venta.cantidad,
+        'total': venta.total,
+        'fecha_creacion': venta.fecha_creacion,
+    }
+
+@receiver(post_save, sender=Venta)
+def venta_actualizar_resumenes(sender, instance, **kwargs):
+    from .rollups import aplicar_venta
+    aplicar_venta(nueva=_datos_resumen(instance), anterior=getattr(instance, '_estado_anterior', None))
+
+@receiver(post_delete, sender=Venta)
+def venta_eliminar_resumenes(sender, instance, **kwargs):
+    from .rollups import aplicar_venta
+    aplicar_venta(anterior=_datos_resumen(instance))
+
+#---------- Mantenimiento de StockProducto ------------
+def aplicar_movimiento_stock(producto_id, compras=0, ventas=0, crear=True):
+    """Aplica un delta sobre el stock materializado de un producto usando F()"""
+    if not (compras or ventas):
+        return
+
+    cambios = {
+        'total_compras': F('total_compras') + compras,
+        'total_ventas': F('total_ventas') + ventas,
+        'stock_actual': F('stock_actual') + compras - ventas,
+    }
+    with transaction.atomic():
+        actualizados = StockProducto.objects.filter(id_producto=producto_id).update(**cambios)
+        if not actualizados and crear:
+            StockProducto.objects.get_or_create(id_producto_id=producto_id)
+            StockProducto.objects.filter(id_producto=producto_id).update(**cambios)
+
+def refrescar_precio_stock(producto_id):
+    """Vuelve a leer el último precio sugerido del historial para un producto"""
+    ultimo = HistorialPrecio.objects.filter(
+        id_producto=producto_id
+    ).order_by('-fecha', '-id_precio').values('id_precio', 'fecha', 'precio_sugerido').first()
+
+    StockProducto.objects.filter(id_producto=producto_id).update(
+        precio_venta=ultimo['precio_sugerido'] if ultimo else Decimal('0'),
+        fecha_precio=ultimo['fecha'] if ultimo else None,
+        id_precio=ultimo['id_precio'] if ultimo else None,
+    )
+
+def _registrar_estado_anterior(sender, instance, campos):
+    """Guarda en la instancia los valores persistidos antes de una edición"""
+    instance._estado_anterior = None
+    if instance.pk and not instance._state.adding:
+        instance._estado_anterior = sender.objects.filter(pk=instance.pk).values(*campos).first()
+
+@receiver(post_save, sender=Producto)
+def crear_stock_producto(sender, instance, created, **kwargs):
+    if created:
+        StockProducto.objects.get_or_create(id_producto=instance)
+
+@receiver(pre_save, sender=Compra)
+def compra_estado_anterior(sender, instance, **kwargs):
+    _registrar_estado_anterior(sender, instance, ('id_producto', 'cantidad', 'costo_unitario', 'fecha'))
+
+@receiver(post_save, sender=Compra)
+def compra_actualizar_stock(sender, instance, **kwargs):
+    from .costos import registrar_compra, recalcular_costo_producto
+
+    anterior = getattr(instance, '_estado_anterior', None)
+    if anterior:
+        aplicar_movimiento_stock(anterior['id_producto'], compras=-anterior['cantidad'])
+    aplicar_movimiento_stock(instance.id_producto_id, compras=instance.cantidad)
+
+    if not anterior:
+        registrar_compra(instance)
+        return
+    # Una edición cambia el pasado: se reproduce el costo desde la fecha afectada
+    recalcular_costo_producto(anterior['id_producto'], desde=min(anterior['fecha'], instance.fecha))
+    if anterior['id_producto'] != instance.id_producto_id:
+        recalcular_costo_producto(instance.id_producto_id, desde=instance.fecha)
+
+@receiver(post_delete, sender=Compra)
+def compra_eliminar_stock(sender, instance, **kwargs):
+    from .costos import recalcular_costo_producto
+
+    aplicar_movimiento_stock(instance.id_producto_id, compras=-instance.cantidad, crear=False)
+    recalcular_costo_producto(instance.id_producto_id, desde=instance.fecha)
+
+@receiver(pre_save, sender=Venta)
+def venta_estado_anterior(sender, instance, **kwargs):
+    _registrar_estado_anterior(sender, instance, ('id_producto', 'id_cliente', 'cantidad', 'fecha_creacion', 'total'))
+
+@receiver(post_save, sender=Venta)
+def venta_actualizar_stock(sender, instance, **kwargs):
+    from .costos import registrar_venta, recalcular_costo_producto
+
+    anterior = getattr(instance, '_estado_anterior', None)
+    if anterior:
+        aplicar_movimiento_stock(anterior['id_producto'], ventas=-anterior['cantidad'])
+    aplicar_movimiento_stock(instance.id_producto_id, ventas=instance.cantidad)
+
+    if not anterior:
+        registrar_venta(instance)
+        return
+    fecha = timezone.localdate(instance.fecha_creacion)
+    recalcular_costo_producto(anterior['id_producto'], desde=min(timezone.localdate(anterior['fecha_creacion']), fecha))
+    if anterior['id_producto'] != instance.id_producto_id:
+        recalcular_costo_producto(instance.id_producto_id, desde=fecha)
+
+@receiver(post_delete, sender=Venta)
+def venta_eliminar_stock(sender, instance, **kwargs):
+    from .costos import recalcular_costo_producto
+
+    aplicar_movimiento_stock(instance.id_producto_id, ventas=-instance.cantidad, crear=False)
+    recalcular_costo_producto(instance.id_producto_id, desde=timezone.localdate(instance.fecha_creacion))
+
+@receiver(pre_save, sender=HistorialPrecio)
+def precio_estado_anterior(sender, instance, **kwargs):
+    _registrar_estado_anterior(sender, instance, ('id_producto',))
+
+@receiver(post_save, sender=HistorialPrecio)
+def precio_actualizar_stock(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_estado_anterior', None)
+    if not created:
+        # Una edición puede mover el registro en el tiempo o de producto
+        if anterior and anterior['id_producto'] != instance.id_producto_id:
+            refrescar_precio_stock(anterior['id_producto'])
+        refrescar_precio_stock(instance.id_producto_id)
+        return
+
+    StockProducto.objects.get_or_create(id_producto_id=instance.id_producto_id)
+    StockProducto.objects.filter(id_producto=instance.id_producto_id).filter(
+        Q(fecha_precio__isnull=True) |
+        Q(fecha_precio__lt=instance.fecha) |
+        Q(fecha_precio=instance.fecha, id_precio__lt=instance.id_precio)
+    ).update(
+        precio_venta=instance.precio_sugerido,
+        fecha_precio=instance.fecha,
+        id_precio=instance.id_precio,
+    )
+
+@receiver(post_delete, sender=HistorialPrecio)
+def precio_eliminar_stock(sender, instance, **kwargs):
+    # Solo hace falta releer el historial si se borró el precio vigente
+    if StockProducto.objects.filter(id_producto=instance.id_producto_id, id_precio=instance.id_precio).exists():
+        refrescar_precio_stock(instance.id_producto_id)
+
+#---------- Invalidación de cierres de inventario ------------
+def invalidar_cierres(producto_id, fecha):
+    """Borra los cierres de un producto que un movimiento en ``fecha`` deja desactualizados"""
+    CierreInventario.objects.filter(id_producto=producto_id, fecha__gte=fecha).delete()
+
+@receiver(post_save, sender=Compra)
+@receiver(post_delete, sender=Compra)
+def compra_invalidar_cierres(sender, instance, **kwargs):
+    anterior = getattr(instance, '_estado_anterior', None)
+    if anterior:
+        invalidar_cierres(anterior['id_producto'], anterior['fecha'])
+    invalidar_cierres(instance.id_producto_id, instance.fecha)
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def venta_invalidar_cierres(sender, instance, **kwargs):
+    anterior = getattr(instance, '_estado_anterior', None)
+    if anterior:
+        invalidar_cierres(anterior['id_producto'], timezone.localdate(anterior['fecha_creacion']))
+    invalidar_cierres(instance.id_producto_id, timezone.localdate(instance.fecha_creacion))
+
+#---------- Invalidación de la caché del inventario ------------
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Compra)
+@receiver(post_delete, sender=Compra)
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+@receiver(post_save, sender=HistorialPrecio)
+@receiver(post_delete, sender=HistorialPrecio)
+def invalidar_cache_inventario(sender, **kwargs):
+    # Tras el commit, para no cachear datos de una transacción sin confirmar
+    transaction.on_commit(incrementar_version_inventario)
+
+#---------- Invalidación de la caché del dashboard ------------
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_delete, sender=Proveedor)
+def invalidar_dashboard_catalogo(sender, **kwargs):
+    transaction.on_commit(lambda: incrementar_version_dashboard('catalogo'))
+
+@receiver(post_save, sender=Compra)
+@receiver(post_delete, sender=Compra)
+def invalidar_dashboard_compras(sender, **kwargs):
+    transaction.on_commit(lambda: incrementar_version_dashboard('compras'))
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def invalidar_dashboard_ventas(sender, **kwargs):
+    transaction.on_commit(lambda: incrementar_version_dashboard('ventas'))
+
+#---------- Índice de búsqueda global ------------
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_save, sender=Compra)
+@receiver(post_save, sender=Venta)
+def indice_busqueda_guardar(sender, instance, **kwargs):
+    # En la misma transacción: si el guardado se revierte, el índice también
+    from .indice import indexar
+    indexar(instance)
+
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_delete, sender=Compra)
+@receiver(post_delete, sender=Venta)
+def indice_busqueda_eliminar(sender, instance, **kwargs):
+    from .indice import desindexar
+    desindexar(instance)
+
+@receiver(post_migrate)
+def reparar_indices_busqueda(sender, using, **kwargs):
+    # Una migración que rehace una tabla en SQLite se lleva sus triggers de FTS5
+    if sender.name != 'gestion':
+        return
+    from .busqueda import reparar_indices
+    reparar_indices(connections[using])
@@ -0,0 +1,139 @@
+"""
+Paginación por cursor (keyset).
+
+En lugar de OFFSET, cada página se pide a partir de los valores de orden de
+la última fila vista: ``WHERE (fecha, id) < (:fecha, :id) ORDER BY fecha DESC,
+id DESC LIMIT n``. Con un índice sobre esas columnas cualquier página cuesta
+lo mismo que la primera y el total solo se cuenta si se pide.
+
+Los cursores son opacos y van firmados, así que no se pueden manipular. Las
+columnas del orden no pueden ser nulas y la última debe ser única (la pk).
+"""
+from django.core import signing
+from django.db.models import Q
+
+from . import conteo
+
+SALT_CURSOR = 'gestion.paginacion.cursor'
+
+
+class ConteoPaginaCursor:
+    """Lo que las plantillas leen de ``page_obj.paginator``"""
+
+    def __init__(self, count, count_estimado=False):
+        self.count = count
+        self.count_estimado = count_estimado
+
+
+class PaginaCursor:
+    """Página con la misma interfaz que usan las plantillas de un Page de Django"""
+
+    def __init__(self, object_list, cursor_anterior, cursor_siguiente, count=None, count_estimado=False):
+        self.object_list = object_list
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+        self.paginator = ConteoPaginaCursor(count, count_estimado)
+        self.number = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+def _campos(orden):
+    """('-fecha', '-id_compra') -> [('fecha', True), ('id_compra', True)]"""
+    return [(campo.lstrip('-'), campo.startswith('-')) for campo in orden]
+
+
+def codificar_cursor(modelo, orden, obj):
+    """Cursor opaco con los valores de orden de ``obj``"""
+    valores = [modelo._meta.get_field(nombre).value_to_string(obj) for nombre, _ in _campos(orden)]
+    return signing.dumps(valores, salt=SALT_CURSOR, compress=True)
+
+
+def decodificar_cursor(modelo, orden, token):
+    """Valores de orden de un cursor; None si el cursor no es válido"""
+    try:
+        valores = signing.loads(token, salt=SALT_CURSOR)
+        campos = _campos(orden)
+        if len(valores) != len(campos):
+            return None
+        return [modelo._meta.get_field(nombre).to_python(valor) for (nombre, _), valor in zip(campos, valores)]
+    except Exception:
+        return None
+
+
+def _despues_de(orden, valores, hacia_atras=False):
+    """
+    Filtro para las filas posteriores (o anteriores) a ``valores`` en ``orden``:
+    a < x OR (a = x AND b < y) ..., más un a <= x redundante que permite
+    recorrer el índice como un rango.
+    """
+    condicion = Q()
+    iguales = {}
+    for (nombre, descendente), valor in zip(_campos(orden), valores):
+        menor = descendente != hacia_atras
+        condicion |= Q(**iguales, **{f'{nombre}__{"lt" if menor else "gt"}': valor})
+        iguales[nombre] = valor
+    nombre, descendente = _campos(orden)[0]
+    rango = Q(**{f'{nombre}__{"lte" if descendente != hacia_atras else "gte"}': valores[0]})
+    return rango & condicion
+
+
+def paginar_por_cursor(queryset, orden, cursor=None, direccion='siguiente', filas=10, contar=False):
+    """
+    Una página de ``queryset`` ordenada por ``orden`` empezando tras ``cursor``
+    (o antes de él con ``direccion='anterior'``). Lee ``filas + 1`` filas para
+    saber si hay más. ``contar`` añade el total: True con un COUNT(*) exacto,
+    ``'estimado'`` con ``conteo.contar()``.
+    """
+    modelo = queryset.model
+    valores = decodificar_cursor(modelo, orden, cursor) if cursor else None
+    hacia_atras = valores is not None and direccion == 'anterior'
+
+    pagina = queryset.order_by(*orden)
+    if hacia_atras:
+        invertido = [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+        pagina = queryset.order_by(*invertido).filter(_despues_de(orden, valores, hacia_atras=True))
+    elif valores is not None:
+        pagina = pagina.filter(_despues_de(orden, valores))
+
+    filas_pagina = list(pagina[:filas + 1])
+    if not filas_pagina and valores is not None:
+        # El cursor quedó fuera de los datos (filas borradas, filtro nuevo): primera página
+        return paginar_por_cursor(queryset, orden, filas=filas, contar=contar)
+    hay_mas = len(filas_pagina) > filas
+    filas_pagina = filas_pagina[:filas]
+    if hacia_atras:
+        filas_pagina.reverse()
+
+    if hacia_atras:
+        anterior = hay_mas
+        siguiente = True
+    else:
+        anterior = valores is not None
+        siguiente = hay_mas
+
+    cursor_anterior = codificar_cursor(modelo, orden, filas_pagina[0]) if anterior and filas_pagina else None
+    cursor_siguiente = codificar_cursor(modelo, orden, filas_pagina[-1]) if siguiente and filas_pagina else None
+    if contar == 'estimado':
+        count, count_estimado = conteo.contar(queryset)
+    elif contar:
+        count, count_estimado = queryset.count(), False
+    else:
+        count, count_estimado = None, False
+    return PaginaCursor(filas_pagina, cursor_anterior, cursor_siguiente, count, count_estimado)
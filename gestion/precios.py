@@ -0,0 +1,163 @@
+"""
+Escritura y compactación del historial de precios.
+
+Solo se registra un precio cuando cambia respecto al vigente. La
+compactación elimina, por lotes, los registros que no aportan información:
+repeticiones consecutivas del mismo precio y, según la política de
+retención, los puntos intermedios de días o meses antiguos (se conserva el
+último precio de cada día o mes, el que estaba vigente al cerrarlo).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import HistorialPrecio, StockProducto
+
+# Días tras los que el historial se reduce a un punto por día y por mes
+RETENCION_POR_DEFECTO = {
+    'diario_despues_de_dias': 90,
+    'mensual_despues_de_dias': 365,
+}
+
+
+def get_retencion():
+    retencion = dict(RETENCION_POR_DEFECTO)
+    retencion.update(getattr(settings, 'HISTORIAL_PRECIOS_RETENCION', {}))
+    return retencion
+
+
+def registrar_precio(producto_id, precio_sugerido):
+    """
+    Registra un nuevo precio sugerido solo si difiere del vigente.
+    Devuelve el HistorialPrecio creado o None si no hubo cambio.
+    """
+    # Se compara con la misma precisión con la que se guarda
+    precio_sugerido = Decimal(precio_sugerido).quantize(Decimal('0.01'))
+    vigente = StockProducto.objects.filter(
+        id_producto=producto_id, id_precio__isnull=False
+    ).values_list('precio_venta', flat=True).first()
+    if vigente is not None and vigente == precio_sugerido:
+        return None
+    return HistorialPrecio.objects.create(id_producto_id=producto_id, precio_sugerido=precio_sugerido)
+
+
+def _cubeta(fecha, corte_diario, corte_mensual):
+    """Cubeta de retención de un registro; None si se conserva tal cual"""
+    if corte_mensual and fecha < corte_mensual:
+        local = timezone.localtime(fecha)
+        return ('mes', local.year, local.month)
+    if corte_diario and fecha < corte_diario:
+        return ('dia', timezone.localtime(fecha).date())
+    return None
+
+
+def _sobrantes(filas, corte_diario, corte_mensual, deduplicar):
+    """
+    Ids a eliminar de las filas (id, producto, fecha, precio) ordenadas por
+    producto, fecha e id. Recorre una sola vez y con una fila de adelanto.
+    """
+    anterior = None           # última fila vista, pendiente de decidir
+    precio_conservado = None  # último precio conservado del producto actual
+    for fila in filas:
+        if anterior is not None:
+            mismo_producto = anterior[1] == fila[1]
+            cubeta = _cubeta(anterior[2], corte_diario, corte_mensual)
+            if mismo_producto and cubeta is not None and cubeta == _cubeta(fila[2], corte_diario, corte_mensual):
+                # No es el último punto de su día o mes
+                yield anterior[0]
+            elif deduplicar and precio_conservado == anterior[3]:
+                yield anterior[0]
+            else:
+                precio_conservado = anterior[3]
+            if not mismo_producto:
+                precio_conservado = None
+        anterior = fila
+
+    if anterior is not None and deduplicar and precio_conservado == anterior[3]:
+        yield anterior[0]
+
+
+def compactar_historial(productos=None, deduplicar=True, retencion=True, batch_size=1000, simular=False, progreso=None):
+    """
+    Elimina registros redundantes del historial de precios por lotes,
+    informando a ``progreso`` tras cada uno.
+    ``retencion`` puede ser True (política de settings), False o un dict
+    con ``diario_despues_de_dias`` / ``mensual_despues_de_dias``.
+    Devuelve el número de registros eliminados (o que se eliminarían).
+    """
+    ahora = timezone.now()
+    corte_diario = corte_mensual = None
+    if retencion:
+        politica = get_retencion() if retencion is True else retencion
+        if politica.get('diario_despues_de_dias'):
+            corte_diario = ahora - timedelta(days=politica['diario_despues_de_dias'])
+        if politica.get('mensual_despues_de_dias'):
+            corte_mensual = ahora - timedelta(days=politica['mensual_despues_de_dias'])
+
+    filas = HistorialPrecio.objects.order_by('id_producto', 'fecha', 'id_precio')
+    if productos is not None:
+        filas = filas.filter(id_producto__in=productos)
+    filas = filas.values_list('id_precio', 'id_producto', 'fecha', 'precio_sugerido')
+
+    # Se reúnen los ids antes de borrar para no modificar la tabla mientras se recorre
+    sobrantes = list(_sobrantes(filas.iterator(chunk_size=5000), corte_diario, corte_mensual, deduplicar))
+    if simular:
+        return len(sobrantes)
+
+    for inicio in range(0, len(sobrantes), batch_size):
+        with transaction.atomic():
+            # Las señales de borrado mantienen al día el precio vigente de StockProducto
+            HistorialPrecio.objects.filter(pk__in=sobrantes[inicio:inicio + batch_size]).delete()
+        if progreso:
+            progreso(min(inicio + batch_size, len(sobrantes)), len(sobrantes), 'Registros eliminados')
+    return len(sobrantes)
+
+
+def serie_precios(producto_id, desde, hasta, cubetas=100):
+    """
+    Serie de precios de un producto entre ``desde`` y ``hasta`` (datetimes)
+    reducida a ``cubetas`` intervalos iguales. Genera, en orden y solo para
+    las cubetas con datos, dicts con inicio, fin, min, max, ultimo y n.
+    Recorre el índice (id_producto, fecha) una sola vez sin cargar la serie.
+    """
+    ancho = (hasta - desde) / cubetas
+    filas = HistorialPrecio.objects.filter(
+        id_producto=producto_id, fecha__gte=desde, fecha__lte=hasta
+    ).order_by('fecha', 'id_precio').values_list('fecha', 'precio_sugerido')
+
+    actual = None
+    for fecha, precio in filas.iterator(chunk_size=2000):
+        indice = min(int((fecha - desde) / ancho), cubetas - 1) if ancho else 0
+        if actual is None or actual['indice'] != indice:
+            if actual is not None:
+                yield _cerrar_cubeta(actual, desde, ancho)
+            actual = {'indice': indice, 'min': precio, 'max': precio, 'ultimo': precio, 'n': 0}
+        actual['min'] = min(actual['min'], precio)
+        actual['max'] = max(actual['max'], precio)
+        actual['ultimo'] = precio
+        actual['n'] += 1
+    if actual is not None:
+        yield _cerrar_cubeta(actual, desde, ancho)
+
+
+def _cerrar_cubeta(cubeta, desde, ancho):
+    inicio = desde + ancho * cubeta['indice']
+    return {
+        'inicio': inicio.isoformat(),
+        'fin': (inicio + ancho).isoformat(),
+        'min': float(cubeta['min']),
+        'max': float(cubeta['max']),
+        'ultimo': float(cubeta['ultimo']),
+        'n': cubeta['n'],
+    }
+
+
+def precio_vigente(producto_id, fecha):
+    """Precio sugerido vigente en ``fecha`` (el último registrado hasta entonces)"""
+    precio = HistorialPrecio.objects.filter(
+        id_producto=producto_id, fecha__lte=fecha
+    ).order_by('-fecha', '-id_precio').values_list('precio_sugerido', flat=True).first()
+    return float(precio) if precio is not None else None
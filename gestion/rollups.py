@@ -0,0 +1,225 @@
+"""
+Resúmenes de ventas por día, semana y mes, por producto y por cliente.
+
+Cada venta suma (o resta, al editarla o eliminarla) sus unidades, su total
+y una venta en las filas de sus periodos con F(), dentro de la misma
+transacción. Los informes leen estas tablas en lugar de recorrer ventas;
+``reconstruir_resumenes`` las rehace desde cero con consultas agrupadas.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count, F, DateField
+from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
+from django.utils import timezone
+
+from .models import Venta, ResumenVentaProducto, ResumenVentaCliente
+
+TRUNCAR = {
+    'dia': TruncDate,
+    'semana': lambda campo: TruncWeek(campo, output_field=DateField()),
+    'mes': lambda campo: TruncMonth(campo, output_field=DateField()),
+}
+
+# Modelo de resumen -> campo de la venta que hace de clave
+DIMENSIONES = {
+    ResumenVentaProducto: 'id_producto',
+    ResumenVentaCliente: 'id_cliente',
+}
+
+
+def inicio_periodo(fecha, granularidad):
+    """Primer día del periodo que contiene a ``fecha``"""
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+def fin_periodo(fecha, granularidad):
+    """Último día del periodo que contiene a ``fecha``"""
+    inicio = inicio_periodo(fecha, granularidad)
+    if granularidad == 'semana':
+        return inicio + timedelta(days=6)
+    if granularidad == 'mes':
+        return (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return inicio
+
+
+def _aportes(datos, signo):
+    """
+    Aportes de una venta (dict con id_producto, id_cliente, cantidad,
+    total y fecha_creacion) a cada fila de resumen, con el signo dado
+    """
+    fecha = timezone.localdate(datos['fecha_creacion'])
+    valores = (signo * datos['cantidad'], signo * (datos['total'] or Decimal('0')), signo)
+    for modelo, campo in DIMENSIONES.items():
+        clave = datos[campo]
+        if clave is None:
+            continue
+        for granularidad in TRUNCAR:
+            yield (modelo, campo, clave, granularidad, inicio_periodo(fecha, granularidad)), valores
+
+
+def _acumular(deltas, datos, signo):
+    for clave, (unidades, ingresos, ventas) in _aportes(datos, signo):
+        actual = deltas.setdefault(clave, [0, Decimal('0'), 0])
+        actual[0] += unidades
+        actual[1] += ingresos
+        actual[2] += ventas
+
+
+def aplicar_venta(nueva=None, anterior=None):
+    """
+    Aplica a los resúmenes la diferencia entre el estado anterior y el nuevo
+    de una venta (``None`` en alta o baja). Las filas que no cambian no se tocan
+    y las restas nunca crean filas.
+    """
+    deltas = {}
+    for datos, signo in ((anterior, -1), (nueva, 1)):
+        if datos:
+            _acumular(deltas, datos, signo)
+    _aplicar_deltas(deltas)
+
+
+def aplicar_ventas(nuevas):
+    """
+    Alta de varias ventas a la vez: los aportes se suman antes de escribir,
+    así que cada fila de resumen (periodo y producto o cliente) se actualiza
+    una sola vez por lote.
+    """
+    deltas = {}
+    for datos in nuevas:
+        _acumular(deltas, datos, 1)
+    _aplicar_deltas(deltas)
+
+
+def _aplicar_deltas(deltas):
+    for (modelo, campo, clave, granularidad, periodo), (unidades, ingresos, ventas) in deltas.items():
+        if not (unidades or ingresos or ventas):
+            continue
+        filtro = {campo: clave, 'granularidad': granularidad, 'periodo': periodo}
+        cambios = {
+            'unidades': F('unidades') + unidades,
+            'ingresos': F('ingresos') + ingresos,
+            'numero_ventas': F('numero_ventas') + ventas,
+            'fecha_actualizacion': timezone.now(),
+        }
+        if modelo.objects.filter(**filtro).update(**cambios) or ventas < 0:
+            continue
+        with transaction.atomic():
+            # Creada por otra transacción entre el update y el insert: se suma igual
+            modelo.objects.get_or_create(**{f'{campo}_id': clave, 'granularidad': granularidad, 'periodo': periodo})
+            modelo.objects.filter(**filtro).update(**cambios)
+
+
+def reconstruir_resumenes(desde=None, hasta=None, progreso=None):
+    """
+    Rehace los resúmenes con una consulta agrupada por granularidad y dimensión.
+    El rango se amplía a periodos completos. Cada tabla y granularidad se
+    reemplaza en su propia transacción e informa a ``progreso``.
+    Devuelve el número de filas escritas.
+    """
+    escritas = pasos = 0
+    total_pasos = len(TRUNCAR) * len(DIMENSIONES)
+    for granularidad, truncar in TRUNCAR.items():
+        ventas = Venta.objects.order_by()
+        if desde:
+            inicio = inicio_periodo(desde, granularidad)
+            ventas = ventas.filter(fecha_creacion__gte=timezone.make_aware(datetime.combine(inicio, time.min)))
+        if hasta:
+            fin = fin_periodo(hasta, granularidad) + timedelta(days=1)
+            ventas = ventas.filter(fecha_creacion__lt=timezone.make_aware(datetime.combine(fin, time.min)))
+
+        for modelo, campo in DIMENSIONES.items():
+            existentes = modelo.objects.filter(granularidad=granularidad)
+            if desde:
+                existentes = existentes.filter(periodo__gte=inicio_periodo(desde, granularidad))
+            if hasta:
+                existentes = existentes.filter(periodo__lte=inicio_periodo(hasta, granularidad))
+
+            grupos = ventas.filter(**{f'{campo}__isnull': False}).annotate(
+                periodo=truncar('fecha_creacion')
+            ).values('periodo', campo).annotate(
+                total_unidades=Sum('cantidad'), total_ingresos=Sum('total'), total_ventas=Count('pk')
+            )
+            filas = [
+                modelo(**{
+                    f'{campo}_id': grupo[campo],
+                    'granularidad': granularidad,
+                    'periodo': grupo['periodo'],
+                    'unidades': grupo['total_unidades'],
+                    'ingresos': grupo['total_ingresos'] or Decimal('0'),
+                    'numero_ventas': grupo['total_ventas'],
+                })
+                for grupo in grupos.iterator(chunk_size=2000)
+            ]
+            with transaction.atomic():
+                existentes.delete()
+                modelo.objects.bulk_create(filas, batch_size=1000)
+            escritas += len(filas)
+            pasos += 1
+            if progreso:
+                progreso(pasos, total_pasos, f'{modelo._meta.verbose_name_plural} ({granularidad})')
+    return escritas
+
+
+# -------------------- Consultas -------------------- #
+def _rango(queryset, granularidad, desde=None, hasta=None):
+    queryset = queryset.filter(granularidad=granularidad)
+    if desde:
+        queryset = queryset.filter(periodo__gte=inicio_periodo(desde, granularidad))
+    if hasta:
+        queryset = queryset.filter(periodo__lte=hasta)
+    return queryset
+
+
+def top_productos(desde=None, hasta=None, granularidad='mes', limite=5, orden='unidades'):
+    """
+    Productos más vendidos en el rango, con las mismas claves que usaba el dashboard:
+    id_producto, id_producto__nombre, total_vendido, total_ingresos
+    """
+    orden = '-total_ingresos' if orden == 'ingresos' else '-total_vendido'
+    return _rango(ResumenVentaProducto.objects, granularidad, desde, hasta).values(
+        'id_producto', 'id_producto__nombre'
+    ).annotate(
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos'),
+        cantidad_ventas=Sum('numero_ventas'),
+    ).order_by(orden, 'id_producto')[:limite]
+
+
+def top_clientes(desde=None, hasta=None, granularidad='mes', limite=5):
+    """Clientes con más ingresos en el rango"""
+    return _rango(ResumenVentaCliente.objects, granularidad, desde, hasta).values(
+        'id_cliente', 'id_cliente__nombre', 'id_cliente__apellido'
+    ).annotate(
+        total_vendido=Sum('unidades'),
+        total_ingresos=Sum('ingresos'),
+        cantidad_ventas=Sum('numero_ventas'),
+    ).order_by('-total_ingresos', 'id_cliente')[:limite]
+
+
+def serie_producto(producto_id, granularidad='dia', desde=None, hasta=None):
+    """Serie temporal de un producto: [{periodo, unidades, ingresos, numero_ventas}]"""
+    return _rango(
+        ResumenVentaProducto.objects.filter(id_producto=producto_id), granularidad, desde, hasta
+    ).order_by('periodo').values('periodo', 'unidades', 'ingresos', 'numero_ventas')
+
+
+def serie_cliente(cliente_id, granularidad='mes', desde=None, hasta=None):
+    """Serie temporal de compras de un cliente"""
+    return _rango(
+        ResumenVentaCliente.objects.filter(id_cliente=cliente_id), granularidad, desde, hasta
+    ).order_by('periodo').values('periodo', 'unidades', 'ingresos', 'numero_ventas')
+
+
+def totales_por_periodo(granularidad='dia', desde=None, hasta=None):
+    """Totales de todas las ventas por periodo, a partir del resumen por producto"""
+    return _rango(ResumenVentaProducto.objects, granularidad, desde, hasta).values('periodo').annotate(
+        unidades_total=Sum('unidades'),
+        ingresos_total=Sum('ingresos'),
+        ventas_total=Sum('numero_ventas'),
+    ).order_by('periodo')
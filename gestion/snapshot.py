@@ -0,0 +1,226 @@
+"""
+Snapshot columnar del inventario, uno por worker.
+
+Guarda cada columna en un array (o una lista de cadenas) en lugar de un dict
+por producto, y precalcula una permutación ordenada (ascendente y
+descendente) por cada columna que acepta el parámetro ``sort``. Una página ordenada es entonces un recorrido de
+la permutación: no se copian ni se reordenan filas, y solo se construyen los
+dicts de la página que se muestra.
+"""
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+from .cache import get_version_inventario
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Columnas ordenables y la clave con la que se ordena cada una;
+# los empates quedan por id_producto ascendente, como en la base de datos
+_CLAVES_ORDEN = {
+    'nombre': lambda s, i: s.nombre[i].lower(),
+    'marca': lambda s, i: s.marca[i].lower(),
+    'id_producto': lambda s, i: s.id_producto[i],
+    'stock_inicial': lambda s, i: s.id_producto[i],
+    'total_compras': lambda s, i: s.total_compras[i],
+    'total_ventas': lambda s, i: s.total_ventas[i],
+    'stock_actual': lambda s, i: s.stock_actual[i],
+    'costo_promedio': lambda s, i: s.costo_promedio[i],
+    'precio_venta': lambda s, i: s.precio_venta[i],
+    'valor_total': lambda s, i: s.valor_total[i],
+    'ultima_actualizacion': lambda s, i: s.ultima_actualizacion[i],
+}
+
+# Mismos rangos que FILTROS_STOCK en utils
+_FILTROS_STOCK = {
+    'critico': lambda stock: stock <= 2,
+    'bajo': lambda stock: 3 <= stock <= 5,
+    'agotado': lambda stock: stock <= 0,
+    'normal': lambda stock: stock > 5,
+}
+
+
+class InventarioSnapshot:
+    """Inventario completo en arrays paralelos, indexados por posición"""
+    __slots__ = (
+        'version', 'id_producto', 'nombre', 'marca', 'total_compras', 'total_ventas',
+        'stock_actual', 'costo_promedio', 'precio_venta', 'valor_total',
+        'ultima_actualizacion', 'ordenes', 'creado',
+    )
+
+    def __init__(self, filas, version=None):
+        """``filas`` es un iterable de dicts con el formato de get_inventario_data()"""
+        self.version = version
+        self.creado = time.monotonic()
+        self.id_producto = array('q')
+        self.nombre = []
+        self.marca = []
+        self.total_compras = array('q')
+        self.total_ventas = array('q')
+        self.stock_actual = array('q')
+        self.costo_promedio = array('d')
+        self.precio_venta = array('d')
+        self.valor_total = array('d')
+        # Microsegundos desde epoch, para no guardar un datetime por fila
+        self.ultima_actualizacion = array('q')
+
+        for fila in filas:
+            self.id_producto.append(fila['id_producto'])
+            self.nombre.append(fila['nombre'])
+            self.marca.append(sys.intern(fila['marca']))
+            self.total_compras.append(fila['total_compras'])
+            self.total_ventas.append(fila['total_ventas'])
+            self.stock_actual.append(fila['stock_actual'])
+            self.costo_promedio.append(fila['costo_promedio'])
+            self.precio_venta.append(fila['precio_venta'])
+            self.valor_total.append(fila['valor_total'])
+            self.ultima_actualizacion.append((fila['ultima_actualizacion'] - _EPOCH) // timedelta(microseconds=1))
+
+        # Permutaciones ascendentes y descendentes de posiciones (int32);
+        # sorted es estable, así que partir del orden por id desempata por id
+        por_id = sorted(range(len(self.id_producto)), key=self.id_producto.__getitem__)
+        self.ordenes = {}
+        for columna, clave in _CLAVES_ORDEN.items():
+            def key(i, clave=clave):
+                return clave(self, i)
+            self.ordenes[columna] = array('i', sorted(por_id, key=key))
+            self.ordenes['-' + columna] = array('i', sorted(por_id, key=key, reverse=True))
+
+    def __len__(self):
+        return len(self.id_producto)
+
+    def fila(self, i):
+        """Construye el dict de una fila, igual al de get_inventario_data()"""
+        return {
+            'id_producto': self.id_producto[i],
+            'nombre': self.nombre[i],
+            'marca': self.marca[i],
+            'stock_inicial': 0,
+            'total_compras': self.total_compras[i],
+            'total_ventas': self.total_ventas[i],
+            'stock_actual': self.stock_actual[i],
+            'costo_promedio': self.costo_promedio[i],
+            'precio_venta': self.precio_venta[i],
+            'valor_total': self.valor_total[i],
+            'ultima_actualizacion': _EPOCH + timedelta(microseconds=self.ultima_actualizacion[i]),
+        }
+
+    def vista(self, sort_by='', stock_filter=''):
+        """
+        Secuencia ordenada (y opcionalmente filtrada por stock) apta para Paginator.
+        Sin filtro reutiliza la permutación precalculada tal cual.
+        """
+        if sort_by not in self.ordenes:
+            sort_by = 'nombre'
+        indices = self.ordenes[sort_by]
+
+        if stock_filter in _FILTROS_STOCK:
+            cumple = _FILTROS_STOCK[stock_filter]
+            stock = self.stock_actual
+            indices = array('i', (i for i in indices if cumple(stock[i])))
+
+        return VistaInventario(self, indices)
+
+    def estadisticas(self, indices=None):
+        """Mismas estadísticas que get_estadisticas_queryset(), sin ir a la base de datos"""
+        if indices is None:
+            indices = range(len(self))
+        stock = self.stock_actual
+        valor = self.valor_total
+
+        productos = stock_total = productos_bajo_stock = productos_criticos = productos_agotados = 0
+        valor_total = 0.0
+        for i in indices:
+            s = stock[i]
+            productos += 1
+            stock_total += s
+            valor_total += valor[i]
+            if s <= 0:
+                productos_agotados += 1
+            elif s <= 2:
+                productos_criticos += 1
+                productos_bajo_stock += 1
+            elif s <= 5:
+                productos_bajo_stock += 1
+
+        return {
+            'stock_total': stock_total,
+            'valor_total': valor_total,
+            'productos_bajo_stock': productos_bajo_stock,
+            'productos_criticos': productos_criticos,
+            'productos_agotados': productos_agotados,
+            'valor_promedio_producto': valor_total / productos if productos else 0.0,
+        }
+
+
+class VistaInventario:
+    """
+    Secuencia perezosa sobre una permutación del snapshot.
+    Solo construye filas al pedir un índice o una porción.
+    """
+    __slots__ = ('snapshot', 'indices')
+
+    def __init__(self, snapshot, indices):
+        self.snapshot = snapshot
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.snapshot.fila(i) for i in self.indices[item]]
+        return self.snapshot.fila(self.indices[item])
+
+    def estadisticas(self):
+        return self.snapshot.estadisticas(self.indices)
+
+    def atencion(self, limite):
+        """Filas con stock menor o igual a 5 de esta vista, las de menor stock primero"""
+        incluidos = set(self.indices) if len(self.indices) != len(self.snapshot) else None
+        stock = self.snapshot.stock_actual
+        filas = []
+        for i in self.snapshot.ordenes['stock_actual']:
+            if stock[i] > 5 or len(filas) >= limite:
+                break
+            if incluidos is None or i in incluidos:
+                filas.append(self.snapshot.fila(i))
+        return filas
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def _vigente(snapshot, version):
+    """El snapshot es de la versión actual y no ha superado INVENTARIO_SNAPSHOT_TTL"""
+    return (
+        snapshot is not None
+        and snapshot.version == version
+        and time.monotonic() - snapshot.creado < getattr(settings, 'INVENTARIO_SNAPSHOT_TTL', 60)
+    )
+
+def get_inventario_snapshot():
+    """
+    Snapshot del inventario de este worker.
+    Se reconstruye cuando cambia la versión global del inventario (compartida
+    entre procesos, ver gestion/cache.py) y, como respaldo ante escrituras que
+    no pasan por las señales, cuando supera INVENTARIO_SNAPSHOT_TTL segundos.
+    """
+    global _snapshot
+    version = get_version_inventario()
+    snapshot = _snapshot
+    if _vigente(snapshot, version):
+        return snapshot
+
+    with _snapshot_lock:
+        if not _vigente(_snapshot, version):
+            from .utils import _inventario_queryset, _fila_inventario
+            _snapshot = InventarioSnapshot(
+                (_fila_inventario(producto) for producto in _inventario_queryset().iterator(chunk_size=2000)),
+                version=version,
+            )
+        return _snapshot
@@ -0,0 +1,45 @@
+"""Catálogo mínimo y movimientos para las pruebas"""
+from datetime import datetime, time
+from decimal import Decimal
+from itertools import count
+
+from django.utils import timezone
+
+from gestion.models import Cliente, Compra, Producto, Proveedor, Venta
+
+_facturas = count(1)
+
+
+def catalogo(productos=3, clientes=2):
+    proveedor = Proveedor.objects.create(empresa='Proveedor de prueba')
+    return (
+        proveedor,
+        [Producto.objects.create(nombre=f'Producto {i}') for i in range(productos)],
+        [Cliente.objects.create(nombre=f'Cliente {i}', apellido='Prueba') for i in range(clientes)],
+    )
+
+
+def comprar(proveedor, producto, fecha, cantidad, costo_total, ganancia=30):
+    return Compra.objects.create(
+        numero_factura=f'T-{next(_facturas)}',
+        fecha=fecha,
+        id_proveedor=proveedor,
+        id_producto=producto,
+        cantidad=cantidad,
+        costo_total=Decimal(costo_total),
+        costo_unitario=0,
+        porcentaje_ganancia=Decimal(ganancia),
+    )
+
+
+def en_fecha(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time(12)))
+
+
+def vender(producto, cantidad, precio, cliente=None, fecha=None):
+    """Venta de hoy o, con ``fecha``, editada después a ese día (fecha_creacion es auto_now_add)"""
+    venta = Venta.objects.create(id_producto=producto, id_cliente=cliente, precio=Decimal(precio), cantidad=cantidad)
+    if fecha:
+        venta.fecha_creacion = en_fecha(fecha)
+        venta.save()
+    return venta
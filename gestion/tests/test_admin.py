@@ -0,0 +1,80 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from gestion.conteo import PaginadorEstimado, contar
+from gestion.models import CierreInventario, Compra, StockProducto
+from gestion.utils import construir_cierres
+
+from .datos import catalogo, comprar
+
+
+class AdminSoloLecturaTests(TestCase):
+    """Las tablas derivadas se consultan en el admin pero no se editan"""
+
+    def setUp(self):
+        self.proveedor, (self.producto, *_), _ = catalogo()
+        comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        construir_cierres()
+        User.objects.create_superuser('admin', password='clave-de-prueba')
+        self.client.login(username='admin', password='clave-de-prueba')
+
+    def test_stock_producto(self):
+        url = '/admin/gestion/stockproducto/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(f'{url}add/').status_code, 403)
+        self.assertEqual(self.client.post(f'{url}add/', {'id_producto': self.producto.pk}).status_code, 403)
+
+        cambio = f'{url}{self.producto.pk}/change/'
+        # Se puede ver, pero no guardar
+        self.assertEqual(self.client.get(cambio).status_code, 200)
+        self.assertEqual(self.client.post(cambio, {'stock_actual': 99}).status_code, 403)
+        self.assertEqual(StockProducto.objects.get(id_producto=self.producto).stock_actual, 10)
+        self.assertEqual(self.client.get(f'{url}{self.producto.pk}/delete/').status_code, 403)
+
+    def test_cierres_y_resumenes(self):
+        cierre = CierreInventario.objects.first()
+        url = '/admin/gestion/cierreinventario/'
+        self.assertEqual(self.client.get(f'{url}add/').status_code, 403)
+        self.assertEqual(self.client.post(f'{url}{cierre.pk}/change/', {'stock_actual': 99}).status_code, 403)
+        self.assertEqual(self.client.get('/admin/gestion/resumenventaproducto/add/').status_code, 403)
+        self.assertEqual(self.client.get('/admin/gestion/resumenventacliente/add/').status_code, 403)
+
+
+class ConteoEstimadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        proveedor, (producto, otro, _), _ = catalogo()
+        for dia in range(1, 7):
+            comprar(proveedor, producto if dia % 2 else otro, date(2025, 1, dia), 1, '10')
+        self.otro = otro
+
+    def test_exacto_bajo_el_umbral(self):
+        self.assertEqual(contar(Compra.objects.all(), umbral=10), (6, False))
+
+    def test_con_filtros_sobre_el_umbral_se_cachea(self):
+        filtradas = Compra.objects.filter(id_producto=self.otro)
+        self.assertEqual(contar(filtradas, umbral=2), (3, True))
+        with self.assertNumQueries(1):
+            # Solo el conteo acotado: el total sale de la caché
+            self.assertEqual(contar(filtradas, umbral=2), (3, True))
+
+    def test_sin_filtros_usa_la_estimacion(self):
+        with mock.patch('gestion.conteo.estimar_filas_tabla', return_value=5000):
+            self.assertEqual(contar(Compra.objects.all(), umbral=2), (5000, True))
+
+    @override_settings(CONTEO_EXACTO_HASTA=4)
+    def test_paginador(self):
+        paginador = PaginadorEstimado(Compra.objects.order_by('pk'), 2)
+        self.assertEqual((paginador.count, paginador.count_estimado, paginador.num_pages), (6, True, 3))
+        self.assertEqual(PaginadorEstimado(list(range(3)), 2).count_estimado, False)
+
+    def test_changelist_del_admin(self):
+        User.objects.create_superuser('admin', password='clave-de-prueba')
+        self.client.login(username='admin', password='clave-de-prueba')
+        respuesta = self.client.get('/admin/gestion/compra/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIsInstance(respuesta.context['cl'].paginator, PaginadorEstimado)
@@ -0,0 +1,49 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from gestion.models import AnalisisVenta
+from gestion.utils import recalcular_analisis_ventas
+
+from .datos import catalogo, vender
+
+
+class AnalisisVentaTests(TestCase):
+    """Los deltas de las señales dejan el análisis diario igual que recalcularlo"""
+
+    def setUp(self):
+        _, self.productos, self.clientes = catalogo(productos=2)
+
+    def analisis(self):
+        # Un día que se queda sin ventas conserva su fila a 0; la reconstrucción la borra
+        return list(AnalisisVenta.objects.exclude(total_ventas=0).order_by('fecha').values_list(
+            'fecha', 'total_ventas', 'promedio_ganancia', 'ahorro'
+        ))
+
+    def assertIgualAlRecalculo(self):
+        incremental = self.analisis()
+        recalcular_analisis_ventas()
+        self.assertEqual(incremental, self.analisis())
+
+    def test_alta_edicion_y_baja_de_ventas(self):
+        producto, otro = self.productos
+        venta = vender(producto, 2, '10.50')
+        vender(otro, 1, '99.99', self.clientes[0])
+        vender(producto, 4, '3', fecha=date(2025, 5, 1))
+        self.assertEqual(AnalisisVenta.objects.get(fecha=date.today()).total_ventas, Decimal('120.99'))
+        self.assertIgualAlRecalculo()
+
+        venta.cantidad = 5
+        venta.save()
+        self.assertIgualAlRecalculo()
+
+        # Cambiar de día resta de uno y suma al otro
+        venta.fecha_creacion = venta.fecha_creacion.replace(year=2025, month=5, day=1)
+        venta.save()
+        self.assertEqual(AnalisisVenta.objects.get(fecha=date(2025, 5, 1)).total_ventas, Decimal('64.50'))
+        self.assertIgualAlRecalculo()
+
+        venta.delete()
+        self.assertEqual(AnalisisVenta.objects.get(fecha=date(2025, 5, 1)).total_ventas, Decimal('12'))
+        self.assertIgualAlRecalculo()
@@ -0,0 +1,163 @@
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldError
+from django.db.models import F, Q
+from django.test import TestCase
+
+from gestion import busqueda
+from gestion.busqueda import BusquedaLike, BusquedaSqliteFts, Ilike, SQLITE_TRIGRAM, buscar, filtrar
+from gestion.forms import VentaForm
+from gestion.indice import autocompletar, buscar_global
+from gestion.models import Compra, IndiceBusqueda, Producto
+
+from .datos import catalogo, comprar
+
+
+class ConBackends(TestCase):
+    def backends(self):
+        """Repite el cuerpo del bucle con cada backend disponible en SQLite"""
+        backends = [BusquedaLike()]
+        if SQLITE_TRIGRAM:
+            backends.append(BusquedaSqliteFts())
+        for backend in backends:
+            with self.subTest(backend=type(backend).__name__), mock.patch.object(busqueda, '_backend', backend):
+                yield backend
+
+
+class BusquedaTests(ConBackends):
+    """Los dos caminos (FTS5 y LIKE) encuentran lo mismo"""
+
+    def setUp(self):
+        self.proveedor, _, _ = catalogo(productos=0)
+        self.tornillo = Producto.objects.create(nombre='Tornillo hexagonal', marca='Acme')
+        self.tuerca = Producto.objects.create(nombre='Tuerca', marca='Tornimax')
+        self.clavo = Producto.objects.create(nombre='Clavo', marca='Acme')
+        self.compra = comprar(self.proveedor, self.tornillo, date(2025, 1, 5), 10, '100')
+        comprar(self.proveedor, self.clavo, date(2025, 1, 6), 10, '100')
+
+    def pks(self, queryset):
+        return sorted(queryset.values_list('pk', flat=True))
+
+    def test_filtrar_por_campos(self):
+        for _ in self.backends():
+            self.assertEqual(
+                self.pks(filtrar(Producto.objects.all(), 'TORNI', campos=('nombre', 'marca'))),
+                sorted([self.tornillo.pk, self.tuerca.pk]),
+            )
+            self.assertEqual(self.pks(filtrar(Producto.objects.all(), 'torni', campos=('nombre',))), [self.tornillo.pk])
+            self.assertEqual(self.pks(filtrar(Producto.objects.all(), 'sin coincidencias', campos=('nombre',))), [])
+
+    def test_filtrar_por_relaciones(self):
+        for _ in self.backends():
+            compras = filtrar(Compra.objects.all(), 'hexagonal', relaciones={'id_producto': ('nombre',)})
+            self.assertEqual(self.pks(compras), [self.compra.pk])
+
+    def test_texto_corto_usa_like(self):
+        for _ in self.backends():
+            self.assertEqual(self.pks(filtrar(Producto.objects.all(), 'Tu', campos=('nombre',))), [self.tuerca.pk])
+
+    def test_buscar_ordena_por_relevancia(self):
+        for _ in self.backends():
+            resultados = buscar(Producto, 'Acme')
+            self.assertEqual(sorted(p.pk for p in resultados), sorted([self.tornillo.pk, self.clavo.pk]))
+            self.assertTrue(all(p.relevancia > 0 for p in resultados))
+
+    def test_escrituras_llegan_al_indice(self):
+        for _ in self.backends():
+            self.tuerca.nombre = 'Arandela'
+            self.tuerca.save()
+            self.assertEqual(self.pks(filtrar(Producto.objects.all(), 'arandela', campos=('nombre',))), [self.tuerca.pk])
+            self.assertEqual(self.pks(filtrar(Producto.objects.all(), 'tuerca', campos=('nombre',))), [])
+            self.tuerca.nombre = 'Tuerca'
+            self.tuerca.save()
+
+
+class IlikeTests(TestCase):
+    def test_no_se_registra_como_lookup_global(self):
+        with self.assertRaises(FieldError):
+            Producto.objects.filter(nombre__ilike='%a%')
+
+    def test_expresion_explicita(self):
+        sql = str(Producto.objects.filter(Q(Ilike(F('nombre'), '%a%'))).query)
+        self.assertIn('ILIKE', sql)
+
+
+@skipUnless(SQLITE_TRIGRAM, 'SQLite sin tokenizador trigram')
+class TablasFtsTests(TestCase):
+    def test_tabla_que_faltaba_se_vuelve_a_buscar(self):
+        backend = BusquedaSqliteFts()
+        # Tablas leídas antes de que la migración creara la de productos
+        backend._tablas = set()
+        self.assertTrue(backend._disponible(Producto, 'tornillo'))
+
+    def test_reparar_indices_descarta_el_backend(self):
+        busqueda.get_backend()
+        busqueda.reparar_indices()
+        self.assertIsNone(busqueda._backend)
+
+
+class BusquedaGlobalTests(ConBackends):
+    """/api/buscar/ agrupa por tipo los mejores resultados del índice unificado"""
+
+    def setUp(self):
+        self.proveedor, _, (self.cliente, _) = catalogo(productos=0)
+        self.producto = Producto.objects.create(nombre='Martillo', marca='Acme')
+        self.compra = comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def test_resultados_agrupados_por_tipo(self):
+        for _ in self.backends():
+            grupos = buscar_global('martillo')
+            self.assertEqual(list(grupos), [IndiceBusqueda.PRODUCTO])
+            self.assertEqual(grupos[IndiceBusqueda.PRODUCTO][0]['objeto_id'], self.producto.pk)
+            self.assertEqual(buscar_global('martillo', tipos=[IndiceBusqueda.CLIENTE]), {})
+
+    def test_api(self):
+        datos = self.client.get('/api/buscar/', {'q': self.compra.numero_factura}).json()
+        compras = [grupo for grupo in datos['grupos'] if grupo['tipo'] == IndiceBusqueda.COMPRA]
+        self.assertEqual(compras[0]['resultados'][0]['id'], self.compra.pk)
+        self.assertEqual(compras[0]['resultados'][0]['url'], f'/compras/editar/{self.compra.pk}/')
+
+        self.assertEqual(self.client.get('/api/buscar/', {'q': 'x', 'limite': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/api/buscar/', {'q': 'x', 'tipos': 'otro'}).status_code, 400)
+
+    def test_el_indice_sigue_a_las_escrituras(self):
+        serrucho = Producto.objects.create(nombre='Serrucho')
+        self.assertEqual(buscar_global('serrucho')[IndiceBusqueda.PRODUCTO][0]['objeto_id'], serrucho.pk)
+        serrucho.delete()
+        self.assertEqual(buscar_global('serrucho'), {})
+
+
+class AutocompletarTests(TestCase):
+    """Opciones de los selects por prefijo del título normalizado"""
+
+    def setUp(self):
+        self.cafe = Producto.objects.create(nombre='Café molido')
+        self.cacao = Producto.objects.create(nombre='Cacao')
+        Producto.objects.create(nombre='Azúcar')
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def titulos(self, texto, limite=20):
+        return [fila['titulo'] for fila in autocompletar(IndiceBusqueda.PRODUCTO, texto, limite)]
+
+    def test_prefijo_sin_acentos_ni_mayusculas(self):
+        self.assertEqual(self.titulos('CA'), ['Cacao', 'Café molido'])
+        self.assertEqual(self.titulos('cafe'), ['Café molido'])
+        self.assertEqual(self.titulos('azu'), ['Azúcar'])
+        self.assertEqual(self.titulos('molido'), [])
+        self.assertEqual(self.titulos('', limite=2), ['Azúcar', 'Cacao'])
+
+    def test_api(self):
+        datos = self.client.get('/api/autocompletar/producto/', {'q': 'caf'}).json()
+        self.assertEqual(datos['resultados'], [{'id': self.cafe.pk, 'texto': 'Café molido', 'detalle': ''}])
+        self.assertEqual(self.client.get('/api/autocompletar/compra/').status_code, 404)
+
+    def test_el_select_solo_renderiza_lo_elegido(self):
+        html = VentaForm(initial={'id_producto': self.cacao.pk}).as_p()
+        self.assertIn('data-autocompletar="/api/autocompletar/producto/"', html)
+        self.assertIn('Cacao', html)
+        self.assertNotIn('Café molido', html)
@@ -0,0 +1,88 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+
+from gestion import snapshot
+from gestion.cache import get_version_inventario, get_versiones_dashboard
+from gestion.models import StockProducto, VersionCache
+
+from .datos import catalogo, comprar
+
+
+def otro_proceso():
+    """Caché local de otro worker: no comparte nada con la de este proceso"""
+    return mock.patch('gestion.cache.cache', LocMemCache('otro-proceso', {}))
+
+
+class VersionCacheTests(TestCase):
+    """Una escritura en cualquier proceso invalida la caché de todos"""
+
+    def setUp(self):
+        # Los contadores vuelven a 1 con el rollback de cada prueba
+        cache.clear()
+        snapshot._snapshot = None
+        self.proveedor, self.productos, _ = catalogo()
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def comprar_en_otro_proceso(self, cantidad):
+        with otro_proceso(), self.captureOnCommitCallbacks(execute=True):
+            comprar(self.proveedor, self.productos[0], date(2026, 3, 10), cantidad, '100')
+
+    def test_version_en_base_de_datos(self):
+        antes = get_version_inventario()
+        self.comprar_en_otro_proceso(10)
+        self.assertGreater(get_version_inventario(), antes)
+        self.assertEqual(VersionCache.objects.get(clave='inventario:version').version, get_version_inventario())
+
+    def test_vista_de_inventario_se_refresca(self):
+        respuesta = self.client.get('/inventario/')
+        self.assertEqual(respuesta.context['stock_total'], 0)
+
+        self.comprar_en_otro_proceso(10)
+
+        respuesta = self.client.get('/inventario/')
+        self.assertEqual(respuesta.context['stock_total'], 10)
+        self.assertEqual([fila['stock_actual'] for fila in respuesta.context['inventario'] if fila['id_producto'] == self.productos[0].pk], [10])
+
+    def test_dashboard_se_invalida_por_grupo(self):
+        antes = get_versiones_dashboard(['catalogo', 'compras', 'ventas'])
+        self.comprar_en_otro_proceso(5)
+        despues = get_versiones_dashboard(['catalogo', 'compras', 'ventas'])
+        self.assertGreater(despues['compras'], antes['compras'])
+        self.assertEqual(despues['ventas'], antes['ventas'])
+
+
+class InventarioSnapshotTests(TestCase):
+    """El snapshot del worker sigue a la versión y caduca por TTL"""
+
+    def setUp(self):
+        cache.clear()
+        snapshot._snapshot = None
+        self.proveedor, self.productos, _ = catalogo()
+
+    def stock(self, instantanea):
+        return dict(zip(instantanea.id_producto, instantanea.stock_actual))[self.productos[0].pk]
+
+    def test_escritura_de_otro_proceso_reconstruye(self):
+        anterior = snapshot.get_inventario_snapshot()
+        with otro_proceso(), self.captureOnCommitCallbacks(execute=True):
+            comprar(self.proveedor, self.productos[0], date(2026, 3, 10), 7, '70')
+        actual = snapshot.get_inventario_snapshot()
+        self.assertIsNot(actual, anterior)
+        self.assertEqual(self.stock(actual), 7)
+
+    @override_settings(INVENTARIO_SNAPSHOT_TTL=60)
+    def test_ttl_reconstruye_sin_cambio_de_version(self):
+        anterior = snapshot.get_inventario_snapshot()
+        self.assertIs(snapshot.get_inventario_snapshot(), anterior)
+        # Escritura que no pasa por las señales
+        StockProducto.objects.filter(id_producto=self.productos[0]).update(stock_actual=3)
+        with mock.patch('gestion.snapshot.time.monotonic', return_value=anterior.creado + 61):
+            actual = snapshot.get_inventario_snapshot()
+        self.assertIsNot(actual, anterior)
+        self.assertEqual(self.stock(actual), 3)
@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.test import TestCase
+
+from gestion.models import CierreInventario, StockProducto
+from gestion.utils import construir_cierres, get_inventario_producto
+
+from .datos import catalogo, comprar, vender
+
+CAMPOS = ('id_producto', 'fecha', 'total_compras', 'total_ventas', 'stock_actual', 'costo_promedio')
+
+
+class CierresTests(TestCase):
+    def setUp(self):
+        self.proveedor, (self.producto, self.otro), self.clientes = catalogo(productos=2)
+        comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        comprar(self.proveedor, self.otro, date(2025, 1, 8), 6, '120')
+        vender(self.producto, 3, '15', self.clientes[0], fecha=date(2025, 2, 10))
+        comprar(self.proveedor, self.producto, date(2025, 3, 2), 4, '60')
+        vender(self.otro, 2, '30', fecha=date(2025, 4, 20))
+
+    def cierres(self):
+        return list(CierreInventario.objects.order_by('id_producto', 'fecha').values_list(*CAMPOS))
+
+    def assertIgualALaReconstruccion(self):
+        incremental = self.cierres()
+        construir_cierres(desde=date(2025, 1, 1))
+        self.assertEqual(incremental, self.cierres())
+
+    def test_cierres_incrementales(self):
+        meses, escritos = construir_cierres()
+        self.assertGreater(meses, 0)
+        self.assertEqual(escritos, 5)
+        self.assertIgualALaReconstruccion()
+        # Sin movimientos nuevos no hay nada que cerrar
+        self.assertEqual(construir_cierres(), (0, 0))
+
+    def test_cierres_invalidados_de_un_producto(self):
+        construir_cierres()
+        otro = [fila for fila in self.cierres() if fila[0] == self.otro.pk]
+
+        comprar(self.proveedor, self.producto, date(2025, 2, 1), 5, '50')
+        self.assertFalse(CierreInventario.objects.filter(id_producto=self.producto, fecha__gte=date(2025, 2, 1)).exists())
+        self.assertEqual(otro, [fila for fila in self.cierres() if fila[0] == self.otro.pk])
+
+        meses, escritos = construir_cierres()
+        self.assertGreater(escritos, 0)
+        self.assertIgualALaReconstruccion()
+
+    def test_inventario_a_una_fecha(self):
+        construir_cierres()
+        fila = get_inventario_producto(self.producto.pk, as_of=date(2025, 2, 28))
+        self.assertEqual((fila['total_compras'], fila['total_ventas'], fila['stock_actual']), (10, 3, 7))
+        # Hoy coincide con el stock materializado
+        stock = StockProducto.objects.get(id_producto=self.producto)
+        fila = get_inventario_producto(self.producto.pk, as_of=date.today())
+        self.assertEqual(fila['stock_actual'], stock.stock_actual)
+        self.assertEqual(fila['costo_promedio'], float(stock.costo_promedio))
@@ -0,0 +1,62 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from gestion import costos
+from gestion.models import StockProducto
+from gestion.utils import construir_cierres
+
+from .datos import catalogo, comprar, vender
+
+
+class CostoPromedioTests(TestCase):
+    def setUp(self):
+        self.proveedor, (self.producto, self.otro), _ = catalogo(productos=2)
+
+    def costo(self):
+        return StockProducto.objects.get(id_producto=self.producto).costo_promedio
+
+    def assertIgualAlRecalculo(self):
+        # recalcular_costos() no escribe: devuelve el estado reproducido de cada producto
+        estados = costos.recalcular_costos()
+        incremental = dict(StockProducto.objects.values_list('id_producto', 'costo_promedio'))
+        self.assertEqual(incremental, {
+            producto_id: estados.get(producto_id, costos.estado_vacio())['costo_promedio']
+            for producto_id in incremental
+        })
+
+    def test_promedio_ponderado_en_orden(self):
+        comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        comprar(self.proveedor, self.producto, date(2025, 1, 10), 10, '300')
+        self.assertEqual(self.costo(), Decimal('20'))
+        # Vender no cambia el promedio
+        vender(self.producto, 5, '50', fecha=date(2025, 1, 20))
+        self.assertEqual(self.costo(), Decimal('20'))
+        comprar(self.proveedor, self.producto, date(2025, 2, 1), 5, '200')
+        self.assertEqual(self.costo(), Decimal('25'))
+        self.assertIgualAlRecalculo()
+
+    def test_compra_con_fecha_pasada_reproduce_el_producto(self):
+        comprar(self.proveedor, self.producto, date(2025, 1, 10), 10, '300')
+        vender(self.producto, 5, '50', fecha=date(2025, 1, 20))
+        comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        # 10 a 10 y 10 a 30 antes de la venta
+        self.assertEqual(self.costo(), Decimal('20'))
+        self.assertIgualAlRecalculo()
+
+    def test_edicion_y_baja_reproducen_desde_el_cierre(self):
+        comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        compra = comprar(self.proveedor, self.producto, date(2025, 2, 5), 10, '300')
+        comprar(self.proveedor, self.otro, date(2025, 2, 5), 4, '40')
+        construir_cierres()
+
+        compra.costo_total = Decimal('500')
+        compra.costo_unitario = 0
+        compra.save()
+        self.assertEqual(self.costo(), Decimal('30'))
+        self.assertIgualAlRecalculo()
+
+        compra.delete()
+        self.assertEqual(self.costo(), Decimal('10'))
+        self.assertIgualAlRecalculo()
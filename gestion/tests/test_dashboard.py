@@ -0,0 +1,89 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from gestion.dashboard import claves_dashboard, get_dashboard_data, get_widget
+from gestion.models import Producto
+from gestion.utils import en_paralelo, inicio_mes_actual
+
+from .datos import catalogo, comprar, vender
+
+
+def widgets(contexto):
+    """Valores de las tarjetas del dashboard"""
+    return (
+        contexto['conteos']['total_productos'], contexto['conteos']['total_clientes'],
+        contexto['resumen_mes']['compras_mes'], contexto['resumen_mes']['ventas_mes_cantidad'],
+    )
+
+
+class DashboardTests(TestCase):
+    """Cada widget se invalida solo con las escrituras de sus grupos"""
+
+    def setUp(self):
+        # Los contadores de versión vuelven a 1 con el rollback de cada prueba
+        cache.clear()
+        self.proveedor, self.productos, _ = catalogo()
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def test_claves_por_grupo(self):
+        antes = claves_dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            vender(self.productos[0], 1, '10')
+        despues = claves_dashboard()
+        self.assertEqual(despues['conteos'], antes['conteos'])
+        self.assertEqual(despues['ultimas_compras'], antes['ultimas_compras'])
+        self.assertNotEqual(despues['resumen_mes'], antes['resumen_mes'])
+        self.assertNotEqual(despues['productos_mas_vendidos'], antes['productos_mas_vendidos'])
+
+    def test_widget_cacheado_no_consulta(self):
+        inicio_mes = inicio_mes_actual()
+        clave = claves_dashboard(inicio_mes)['conteos']
+        valor = get_widget('conteos', clave, inicio_mes)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_widget('conteos', clave, inicio_mes), valor)
+
+    def test_vista_refleja_las_escrituras(self):
+        respuesta = self.client.get('/')
+        self.assertEqual(widgets(respuesta.context), (3, 2, 0, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(nombre='Nuevo')
+            comprar(self.proveedor, self.productos[0], timezone.localdate(), 10, '100')
+            vender(self.productos[0], 2, '15')
+        respuesta = self.client.get('/')
+        self.assertEqual(widgets(respuesta.context), (4, 2, 100, 2))
+
+
+class DashboardAsincronoTests(TransactionTestCase):
+    """La variante ASGI calcula los widgets a la vez con el mismo resultado"""
+
+    def setUp(self):
+        cache.clear()
+        self.proveedor, self.productos, _ = catalogo()
+        comprar(self.proveedor, self.productos[0], timezone.localdate(), 10, '100')
+        vender(self.productos[0], 2, '15')
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def test_mismo_contexto_que_la_vista_sincrona(self):
+        asincrono = self.client.get('/async/')
+        self.assertEqual(asincrono.status_code, 200)
+        self.assertEqual(widgets(asincrono.context), (3, 2, 100, 2))
+        # La vista síncrona lee los widgets que dejó en caché la asíncrona: solo consulta las versiones
+        with self.assertNumQueries(1):
+            sincrono = get_dashboard_data()
+            self.assertEqual(widgets(sincrono), widgets(asincrono.context))
+
+    def test_en_paralelo_conserva_el_orden(self):
+        resultados = async_to_sync(en_paralelo)(
+            lambda: Producto.objects.count(), lambda: 'b', lambda: Producto.objects.filter(nombre='Producto 0').count()
+        )
+        self.assertEqual(resultados, [3, 'b', 1])
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/async/').status_code, 302)
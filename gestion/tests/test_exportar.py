@@ -0,0 +1,83 @@
+import csv
+import io
+import zipfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from gestion import exportar
+from gestion.exportar import generar_csv, generar_xlsx
+
+from .datos import catalogo, comprar, vender
+
+
+def contenido(respuesta):
+    return b''.join(respuesta.streaming_content)
+
+
+class GeneradoresTests(TestCase):
+    """Los generadores entregan el archivo por trozos"""
+
+    def test_csv_por_lotes(self):
+        with mock.patch.object(exportar, 'LOTE', 2):
+            trozos = list(generar_csv(['A', 'B'], ([i, f'fila {i}'] for i in range(5))))
+        # Encabezado y tres lotes (2 + 2 + 1)
+        self.assertEqual(len(trozos), 4)
+        self.assertTrue(trozos[0].startswith('\ufeff'))
+        filas = list(csv.reader(io.StringIO(''.join(trozos).lstrip('\ufeff'))))
+        self.assertEqual(filas[0], ['A', 'B'])
+        self.assertEqual(filas[-1], ['4', 'fila 4'])
+
+    def test_xlsx_se_abre_como_zip(self):
+        with mock.patch.object(exportar, 'LOTE', 2):
+            trozos = list(generar_xlsx(
+                ['Nombre', 'Fecha', 'Total'],
+                [['A & B', date(2025, 1, 5), Decimal('1.50')], ['C', None, 3]] * 3,
+            ))
+        self.assertGreater(len(trozos), 2)
+        with zipfile.ZipFile(io.BytesIO(b''.join(trozos))) as libro:
+            self.assertIsNone(libro.testzip())
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row>'), 7)
+        self.assertIn('A &amp; B', hoja)
+        # 2025-01-05 como número de serie de Excel
+        self.assertIn('<v>45662</v>', hoja)
+
+
+class ExportarListasTests(TestCase):
+    """?exportar=csv|xlsx descarga la lista filtrada completa"""
+
+    def setUp(self):
+        proveedor, (self.tornillo, self.tuerca, _), (cliente, _) = catalogo()
+        comprar(proveedor, self.tornillo, date(2025, 1, 5), 10, '100')
+        comprar(proveedor, self.tuerca, date(2025, 1, 6), 5, '50')
+        vender(self.tornillo, 2, '15', cliente=cliente)
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def filas_csv(self, respuesta):
+        return list(csv.reader(io.StringIO(contenido(respuesta).decode('utf-8-sig'))))
+
+    def test_compras_filtradas(self):
+        respuesta = self.client.get('/compras/', {'exportar': 'csv', 'search': 'Producto 1'})
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="compras_', respuesta['Content-Disposition'])
+        filas = self.filas_csv(respuesta)
+        self.assertEqual(filas[0][:4], ['Factura', 'Fecha', 'Proveedor', 'Producto'])
+        self.assertEqual([fila[3] for fila in filas[1:]], ['Producto 1'])
+
+    def test_ventas(self):
+        filas = self.filas_csv(self.client.get('/ventas/', {'exportar': 'csv'}))
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][2:5], ['Producto 0', 'Cliente 0 Prueba', '2'])
+
+    def test_inventario_xlsx(self):
+        respuesta = self.client.get('/inventario/', {'exportar': 'xlsx'})
+        self.assertEqual(respuesta['Content-Type'], exportar.FORMATOS['xlsx'])
+        with zipfile.ZipFile(io.BytesIO(contenido(respuesta))) as libro:
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        # Encabezado más una fila por producto
+        self.assertEqual(hoja.count('<row>'), 4)
@@ -0,0 +1,144 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from gestion.importar import ErrorImportacion, importar_compras, leer_filas
+from gestion.jobs import bucle_worker
+from gestion.models import Compra, HistorialPrecio, IndiceBusqueda, Job, StockProducto
+from gestion.utils import recalcular_stock
+
+from .datos import catalogo, comprar
+
+ENCABEZADOS = 'Factura;Fecha;Proveedor;Producto;Cantidad;Costo total;% Ganancia'
+
+
+def csv(*filas, encabezados=ENCABEZADOS):
+    return '\n'.join((encabezados,) + filas).encode()
+
+
+def importar(contenido, **opciones):
+    return importar_compras(leer_filas(io.BytesIO(contenido), 'compras.csv'), **opciones)
+
+
+class ImportarComprasTests(TestCase):
+    def setUp(self):
+        self.proveedor, self.productos, _ = catalogo()
+        self.producto = self.productos[0]
+
+    def test_importa_con_los_calculos_de_compra_save(self):
+        resultado = importar(csv(
+            f'I-1;2025-02-03;{self.proveedor.empresa};{self.producto.nombre};3;10;30',
+            f'I-2;04/02/2025;{self.proveedor.pk};{self.productos[1].pk};4;10,50;',
+        ))
+        self.assertEqual((resultado.filas, resultado.creadas, resultado.errores), (2, 2, []))
+
+        importada = Compra.objects.get(numero_factura='I-1')
+        referencia = comprar(self.proveedor, self.producto, date(2025, 2, 3), 3, '10')
+        referencia.refresh_from_db()
+        for campo in ('costo_unitario', 'precio', 'ganancia_unitaria', 'ganancia_total'):
+            self.assertEqual(getattr(importada, campo), getattr(referencia, campo), campo)
+        self.assertEqual(Compra.objects.get(numero_factura='I-2').fecha, date(2025, 2, 4))
+
+        # Stock, costo, precio vigente e índice de búsqueda como si se hubieran dado de alta una a una
+        self.assertEqual(StockProducto.objects.get(id_producto=self.producto).stock_actual, 6)
+        self.assertTrue(HistorialPrecio.objects.filter(id_producto=self.producto, precio_sugerido=importada.precio).exists())
+        self.assertTrue(IndiceBusqueda.objects.filter(tipo=IndiceBusqueda.COMPRA, objeto_id=importada.pk).exists())
+        incremental = list(StockProducto.objects.order_by('pk').values())
+        recalcular_stock()
+        self.assertEqual(incremental, list(StockProducto.objects.order_by('pk').values()))
+
+    def test_una_fila_con_errores_anula_la_importacion(self):
+        comprar(self.proveedor, self.producto, date(2025, 1, 1), 1, '1')
+        contenido = csv(
+            f'I-1;2025-02-03;{self.proveedor.pk};{self.producto.pk};3;10;30',
+            f'I-1;2025-02-03;{self.proveedor.pk};{self.producto.pk};3;10;30',
+            f'T-OTRA;2025-02-03;{self.proveedor.pk};no existe;3;10;30',
+            f'I-3;2025-13-40;{self.proveedor.pk};{self.producto.pk};0;abc;30',
+        )
+        resultado = importar(contenido)
+        self.assertEqual(resultado.creadas, 0)
+        self.assertEqual([fila for fila, _ in resultado.errores], [3, 4, 5])
+        self.assertIn('repetida', resultado.errores[0][1])
+        self.assertFalse(Compra.objects.filter(numero_factura__startswith='I-').exists())
+
+        resultado = importar(contenido, omitir_errores=True)
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual(StockProducto.objects.get(id_producto=self.producto).stock_actual, 4)
+
+    def test_xlsx(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise unittest.SkipTest('openpyxl no está instalado')
+        libro = Workbook()
+        hoja = libro.active
+        hoja.append(ENCABEZADOS.split(';'))
+        hoja.append(['X-1', date(2025, 2, 3), self.proveedor.empresa, self.producto.pk, 2, Decimal('8'), 25])
+        archivo = io.BytesIO()
+        libro.save(archivo)
+        archivo.seek(0)
+        resultado = importar_compras(leer_filas(archivo, 'compras.xlsx'))
+        self.assertEqual((resultado.creadas, resultado.errores), (1, []))
+        self.assertEqual(Compra.objects.get(numero_factura='X-1').precio, Decimal('5.00'))
+
+    def test_encabezados_y_formato(self):
+        with self.assertRaisesMessage(ErrorImportacion, 'Faltan columnas'):
+            importar(csv('1;2', encabezados='factura;fecha'))
+        with self.assertRaises(ErrorImportacion):
+            importar('factura,fecha\n'.encode('utf-16'))
+
+
+class ImportarComprasVistaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.proveedor, (self.producto, *_), _ = catalogo()
+        User.objects.create_user('compras', password='clave-de-prueba')
+        self.client.login(username='compras', password='clave-de-prueba')
+
+    def subir(self, contenido, nombre='compras.csv'):
+        return self.client.post('/compras/importar/', {'archivo': SimpleUploadedFile(nombre, contenido)})
+
+    def test_encola_e_importa_en_segundo_plano(self):
+        respuesta = self.subir(csv(
+            f'W-1;2025-02-03;{self.proveedor.pk};{self.producto.pk};3;10;30',
+            f'W-2;2025-02-04;{self.proveedor.pk};{self.producto.pk};2;10;30',
+        ))
+        job = Job.objects.get(tipo='importar_compras')
+        self.assertRedirects(respuesta, f'/tareas/{job.pk}/')
+        self.assertFalse(Compra.objects.filter(numero_factura__startswith='W-').exists())
+
+        bucle_worker(una_vez=True)
+        job.refresh_from_db()
+        self.assertEqual(job.estado, Job.COMPLETADO)
+        self.assertEqual(job.resultado['creadas'], 2)
+        self.assertEqual(Compra.objects.filter(numero_factura__startswith='W-').count(), 2)
+        # El archivo subido se borra al terminar
+        self.assertEqual(os.listdir(os.path.join(self.media, 'importaciones')), [])
+
+    def test_errores_de_fila_en_la_pagina_de_la_tarea(self):
+        self.subir(csv(f'W-1;2025-02-03;{self.proveedor.pk};no existe;3;10;30'))
+        bucle_worker(una_vez=True)
+        job = Job.objects.get(tipo='importar_compras')
+        self.assertEqual(job.resultado['total_errores'], 1)
+        respuesta = self.client.get(f'/tareas/{job.pk}/')
+        self.assertContains(respuesta, 'no encontrado')
+        # El detalle de una importación vuelve a la lista de compras
+        self.assertContains(respuesta, 'href="/compras/" class="btn btn-secondary"')
+        self.assertFalse(Compra.objects.filter(numero_factura='W-1').exists())
+
+    def test_formato_invalido_se_rechaza_sin_encolar(self):
+        respuesta = self.subir(csv('1;2', encabezados='factura;fecha'))
+        self.assertContains(respuesta, 'Faltan columnas')
+        self.assertFalse(Job.objects.exists())
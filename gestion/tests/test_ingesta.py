@@ -0,0 +1,110 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.test import Client, TestCase
+
+from gestion.ingesta import registrar_ventas
+from gestion.models import (
+    AnalisisVenta, CierreInventario, IndiceBusqueda, ResumenVentaCliente, ResumenVentaProducto,
+    StockProducto, TokenTerminal, Venta,
+)
+from gestion.rollups import reconstruir_resumenes
+from gestion.utils import construir_cierres, recalcular_analisis_ventas, recalcular_stock
+
+from .datos import catalogo, comprar
+
+
+class RegistrarVentasTests(TestCase):
+    def setUp(self):
+        self.proveedor, self.productos, self.clientes = catalogo()
+        for producto in self.productos:
+            comprar(self.proveedor, producto, date(2025, 1, 5), 50, '500')
+
+    def test_lote_con_filas_validas_e_invalidas(self):
+        producto, otro, _ = self.productos
+        resultado = registrar_ventas([
+            {'producto': producto.pk, 'cliente': self.clientes[0].pk, 'precio': '12.50', 'cantidad': 2},
+            {'producto': 999999, 'precio': '1', 'cantidad': 1},
+            {'producto': otro.pk, 'precio': 3.1, 'cantidad': '4'},
+            {'producto': producto.pk, 'precio': -1, 'cantidad': 0},
+            'no es un objeto',
+            {'producto': producto.pk, 'cliente': 999999, 'precio': '1', 'cantidad': 1},
+        ])
+        self.assertEqual([indice for indice, _ in resultado.ventas], [0, 2])
+        self.assertEqual([indice for indice, _ in resultado.errores], [1, 3, 4, 5])
+        self.assertEqual(set(dict(resultado.errores)[3]), {'precio', 'cantidad'})
+        self.assertEqual(dict(resultado.errores)[5], {'cliente': ['Cliente no encontrado.']})
+        self.assertEqual(resultado.ventas[1][1].total, Decimal('12.4'))
+        self.assertEqual(StockProducto.objects.get(id_producto=producto).stock_actual, 48)
+
+    def test_los_agregados_coinciden_con_una_reconstruccion(self):
+        construir_cierres()
+        producto, otro, tercero = self.productos
+        registrar_ventas([
+            {'producto': producto.pk, 'cliente': self.clientes[0].pk, 'precio': '10', 'cantidad': 2},
+            {'producto': producto.pk, 'precio': '11', 'cantidad': 1},
+            {'producto': otro.pk, 'cliente': self.clientes[1].pk, 'precio': '7.25', 'cantidad': 3},
+        ])
+        ventas = list(Venta.objects.all())
+        self.assertEqual(len(ventas), 3)
+        self.assertEqual(
+            IndiceBusqueda.objects.filter(tipo=IndiceBusqueda.VENTA, objeto_id__in=[venta.pk for venta in ventas]).count(), 3
+        )
+        # Los cierres de un producto sin ventas en el lote se conservan
+        self.assertTrue(CierreInventario.objects.filter(id_producto=tercero).exists())
+
+        def estado():
+            return (
+                list(StockProducto.objects.order_by('pk').values()),
+                list(AnalisisVenta.objects.order_by('fecha').values_list('fecha', 'total_ventas', 'promedio_ganancia', 'ahorro')),
+                sorted(ResumenVentaProducto.objects.values_list('id_producto', 'granularidad', 'periodo', 'unidades', 'ingresos', 'numero_ventas')),
+                sorted(ResumenVentaCliente.objects.values_list('id_cliente', 'granularidad', 'periodo', 'unidades', 'ingresos', 'numero_ventas')),
+            )
+        incremental = estado()
+        recalcular_stock()
+        recalcular_analisis_ventas()
+        reconstruir_resumenes()
+        self.assertEqual(incremental, estado())
+
+
+class ApiVentasLoteTests(TestCase):
+    def setUp(self):
+        self.proveedor, (self.producto, *_), _ = catalogo()
+        comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        self.token, self.clave = TokenTerminal.crear('caja 1')
+        # Un terminal no tiene sesión ni token CSRF
+        self.client = Client(enforce_csrf_checks=True)
+
+    def enviar(self, cuerpo, clave=None):
+        cabeceras = {'HTTP_AUTHORIZATION': f'Token {clave}'} if clave else {}
+        return self.client.post('/api/ventas/lote/', json.dumps(cuerpo), content_type='application/json', **cabeceras)
+
+    def test_alta_con_token(self):
+        respuesta = self.enviar([{'producto': self.producto.pk, 'precio': '15', 'cantidad': 2}], self.clave)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['creadas'], 1)
+        self.token.refresh_from_db()
+        self.assertIsNotNone(self.token.ultimo_uso)
+
+    def test_sin_token_o_token_invalido(self):
+        for clave in (None, 'no-es-la-clave'):
+            respuesta = self.enviar([{'producto': self.producto.pk, 'precio': '15', 'cantidad': 2}], clave)
+            self.assertEqual(respuesta.status_code, 401)
+            self.assertEqual(respuesta['WWW-Authenticate'], 'Token')
+            self.assertIn('error', respuesta.json())
+        self.assertFalse(Venta.objects.exists())
+
+    def test_token_desactivado(self):
+        TokenTerminal.objects.filter(pk=self.token.pk).update(activo=False)
+        respuesta = self.enviar([{'producto': self.producto.pk, 'precio': '15', 'cantidad': 2}], self.clave)
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertFalse(Venta.objects.exists())
+
+    def test_cuerpo_invalido(self):
+        self.assertEqual(self.enviar({'producto': self.producto.pk}, self.clave).status_code, 400)
+        self.assertEqual(self.enviar([], self.clave).status_code, 400)
+        respuesta = self.enviar([{'producto': self.producto.pk, 'precio': 'x', 'cantidad': 1}], self.clave)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['errores'][0]['indice'], 0)
+        self.assertEqual(self.client.get('/api/ventas/lote/', HTTP_AUTHORIZATION=f'Token {self.clave}').status_code, 405)
@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from gestion import jobs
+from gestion.jobs import TAREAS, encolar, ejecutar_job, recuperar_perdidos, tarea, tomar_job
+from gestion.models import Job
+
+from .datos import catalogo, comprar
+
+
+class ColaTareasTests(TestCase):
+    def setUp(self):
+        self.llamadas = []
+
+        @tarea('prueba')
+        def tarea_prueba(progreso, fallar=False):
+            self.llamadas.append(fallar)
+            if fallar:
+                raise RuntimeError('falla de prueba')
+            progreso(1, 2, 'mitad')
+            return {'ok': True}
+        self.addCleanup(TAREAS.pop, 'prueba')
+
+    def test_tomar_job_en_orden_y_una_sola_vez(self):
+        primero = encolar('prueba')
+        segundo = encolar('prueba')
+        encolar('prueba', ejecutar_desde=timezone.now() + timedelta(hours=1))
+
+        tomado = tomar_job()
+        self.assertEqual(tomado.pk, primero.pk)
+        self.assertEqual(tomado.estado, Job.EJECUTANDO)
+        self.assertTrue(tomado.worker)
+        self.assertEqual(tomar_job().pk, segundo.pk)
+        # El tercero aún no toca
+        self.assertIsNone(tomar_job())
+
+    def test_el_update_condicionado_hace_de_cerrojo(self):
+        job = encolar('prueba')
+        Job.objects.filter(pk=job.pk).update(estado=Job.EJECUTANDO, worker='otro')
+        filtrar = Job.objects.filter
+
+        def candidatos_desactualizados(*args, **kwargs):
+            # Candidatos leídos justo antes de que otro worker tomara la tarea
+            if 'ejecutar_desde__lte' in kwargs:
+                return Job.objects.all()
+            return filtrar(*args, **kwargs)
+
+        with mock.patch.object(Job.objects, 'filter', candidatos_desactualizados):
+            self.assertIsNone(tomar_job())
+        self.assertEqual(Job.objects.get(pk=job.pk).worker, 'otro')
+
+    def test_ejecucion_correcta(self):
+        encolar('prueba')
+        job = ejecutar_job(tomar_job())
+        self.assertEqual(job.estado, Job.COMPLETADO)
+        self.assertEqual(job.resultado, {'ok': True})
+        self.assertEqual((job.intentos, job.progreso, job.total, job.mensaje), (1, 2, 2, 'mitad'))
+        self.assertIsNotNone(job.fecha_fin)
+
+    def test_reintentos_y_fallo_definitivo(self):
+        encolar('prueba', {'fallar': True}, max_intentos=2)
+        with self.assertLogs('gestion.jobs', 'ERROR'):
+            job = ejecutar_job(tomar_job())
+        self.assertEqual((job.estado, job.intentos, job.mensaje), (Job.PENDIENTE, 1, 'falla de prueba'))
+        self.assertGreater(job.ejecutar_desde, timezone.now())
+        self.assertIsNone(tomar_job())
+
+        Job.objects.filter(pk=job.pk).update(ejecutar_desde=timezone.now())
+        with self.assertLogs('gestion.jobs', 'ERROR'):
+            job = ejecutar_job(tomar_job())
+        self.assertEqual((job.estado, job.intentos), (Job.FALLIDO, 2))
+        self.assertIn('RuntimeError', job.error)
+        self.assertEqual(self.llamadas, [True, True])
+
+    def test_recuperar_tareas_perdidas(self):
+        job = encolar('prueba', max_intentos=2)
+        tomar_job()
+        self.assertEqual(recuperar_perdidos(), (0, 0))
+        Job.objects.filter(pk=job.pk).update(fecha_actualizacion=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('gestion.jobs', 'WARNING'):
+            self.assertEqual(recuperar_perdidos(), (1, 0))
+        self.assertEqual(tomar_job().pk, job.pk)
+
+        # La ejecución perdida contó como intento: ya no quedan más
+        Job.objects.filter(pk=job.pk).update(fecha_actualizacion=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('gestion.jobs', 'WARNING'):
+            self.assertEqual(recuperar_perdidos(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.estado, job.intentos), (Job.FALLIDO, 2))
+        self.assertIsNotNone(job.fecha_fin)
+        self.assertIsNone(tomar_job())
+
+    def test_el_worker_sobrevive_a_errores_del_bucle(self):
+        encolar('prueba')
+        original = jobs.tomar_job
+        fallos = iter([RuntimeError('base de datos caída')])
+
+        def tomar_con_fallo():
+            for error in fallos:
+                raise error
+            return original()
+
+        with mock.patch.object(jobs, 'tomar_job', tomar_con_fallo), mock.patch.object(jobs.time, 'sleep'):
+            with self.assertLogs('gestion.jobs', 'ERROR') as registro:
+                self.assertEqual(jobs.bucle_worker(una_vez=True), 1)
+        self.assertIn('Traceback', registro.output[0])
+        self.assertEqual(self.llamadas, [False])
+
+    def test_traza_solo_para_staff(self):
+        encolar('prueba', {'fallar': True}, max_intentos=1)
+        with self.assertLogs('gestion.jobs', 'ERROR'):
+            job = ejecutar_job(tomar_job())
+        usuario = User.objects.create_user('usuario', password='clave-de-prueba')
+        User.objects.create_user('admin', password='clave-de-prueba', is_staff=True)
+
+        self.client.login(username='usuario', password='clave-de-prueba')
+        respuesta = self.client.get(f'/tareas/{job.pk}/')
+        self.assertContains(respuesta, 'falla de prueba')
+        self.assertNotContains(respuesta, 'Traceback')
+
+        self.client.login(username='admin', password='clave-de-prueba')
+        self.assertContains(self.client.get(f'/tareas/{job.pk}/'), 'Traceback')
+
+
+class ProgresoTareasTests(TestCase):
+    def test_construir_cierres_informa_cada_mes(self):
+        proveedor, (producto, *_), _ = catalogo()
+        comprar(proveedor, producto, date(2025, 1, 5), 10, '100')
+        comprar(proveedor, producto, date(2025, 3, 5), 10, '100')
+        encolar('construir_cierres')
+
+        avisos = []
+        original = jobs.Progreso.__call__
+        def registrar(progreso, actual, total=None, mensaje=''):
+            avisos.append((actual, total, mensaje))
+            return original(progreso, actual, total, mensaje)
+
+        with mock.patch.object(jobs.Progreso, '__call__', registrar):
+            job = ejecutar_job(tomar_job())
+        self.assertEqual(job.estado, Job.COMPLETADO)
+        cierres = [aviso for aviso in avisos if aviso[2].startswith('Cierre de')]
+        self.assertEqual(cierres[0][:2], (1, len(cierres)))
+        self.assertEqual(cierres[-1][:2], (len(cierres), len(cierres)))
+        self.assertEqual(cierres[0][2], 'Cierre de 01/2025')
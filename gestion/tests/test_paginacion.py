@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from gestion.models import Compra
+from gestion.paginacion import paginar_por_cursor
+
+from .datos import catalogo, comprar
+
+ORDEN = ('-fecha', '-id_compra')
+
+
+class PaginacionCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        proveedor, productos, _ = catalogo()
+        # Fechas repetidas: el desempate lo decide la pk
+        for i in range(23):
+            comprar(proveedor, productos[i % 3], date(2025, 1, 1) + timedelta(days=i // 4), 1, '10')
+        cls.esperado = list(Compra.objects.order_by(*ORDEN).values_list('pk', flat=True))
+
+    def pks(self, pagina):
+        return [compra.pk for compra in pagina]
+
+    def test_recorre_todas_las_filas_hacia_adelante_y_hacia_atras(self):
+        paginas = []
+        pagina = paginar_por_cursor(Compra.objects.all(), ORDEN, filas=5)
+        self.assertFalse(pagina.has_previous())
+        while True:
+            paginas.append(self.pks(pagina))
+            if not pagina.has_next():
+                break
+            pagina = paginar_por_cursor(Compra.objects.all(), ORDEN, cursor=pagina.cursor_siguiente, filas=5)
+        self.assertEqual([pk for filas in paginas for pk in filas], self.esperado)
+        self.assertEqual([len(filas) for filas in paginas], [5, 5, 5, 5, 3])
+
+        hacia_atras = []
+        while pagina.has_previous():
+            pagina = paginar_por_cursor(
+                Compra.objects.all(), ORDEN, cursor=pagina.cursor_anterior, direccion='anterior', filas=5
+            )
+            hacia_atras.insert(0, self.pks(pagina))
+        self.assertEqual(hacia_atras, paginas[:-1])
+
+    def test_respeta_los_filtros(self):
+        queryset = Compra.objects.filter(fecha__gte=date(2025, 1, 3))
+        pagina = paginar_por_cursor(queryset, ORDEN, filas=4, contar=True)
+        siguiente = paginar_por_cursor(queryset, ORDEN, cursor=pagina.cursor_siguiente, filas=4)
+        self.assertEqual(self.pks(pagina) + self.pks(siguiente), list(queryset.order_by(*ORDEN).values_list('pk', flat=True))[:8])
+        self.assertEqual(pagina.paginator.count, queryset.count())
+
+    def test_cursor_manipulado_vuelve_a_la_primera_pagina(self):
+        pagina = paginar_por_cursor(Compra.objects.all(), ORDEN, cursor='no-es-un-cursor', filas=5)
+        self.assertEqual(self.pks(pagina), self.esperado[:5])
+        self.assertIsNone(pagina.paginator.count)
+
+    def test_lista_de_compras_por_cursor(self):
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+        respuesta = self.client.get('/compras/', {'filas': 10})
+        self.assertEqual(respuesta.status_code, 200)
+        primera = respuesta.context['compras']
+        respuesta = self.client.get('/compras/', {'filas': 10, 'cursor': primera.cursor_siguiente})
+        self.assertEqual(self.pks(primera) + self.pks(respuesta.context['compras']), self.esperado[:20])
@@ -0,0 +1,186 @@
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from gestion.models import HistorialPrecio, StockProducto
+from gestion.precios import _sobrantes, compactar_historial, registrar_precio, serie_precios
+
+from .datos import catalogo, comprar, en_fecha
+
+
+class CompactacionTests(TestCase):
+    """Deduplicación y retención del historial de precios"""
+
+    def setUp(self):
+        _, (self.producto, self.otro), _ = catalogo(productos=2)
+
+    def precio(self, fecha, precio, producto=None):
+        return HistorialPrecio.objects.create(
+            id_producto=producto or self.producto, fecha=fecha, precio_sugerido=Decimal(precio)
+        )
+
+    def precios(self, producto=None):
+        return [
+            float(precio) for precio in HistorialPrecio.objects.filter(
+                id_producto=producto or self.producto
+            ).order_by('fecha', 'id_precio').values_list('precio_sugerido', flat=True)
+        ]
+
+    def test_registrar_precio_solo_si_cambia(self):
+        self.assertIsNotNone(registrar_precio(self.producto.pk, '10.004'))
+        # Se compara con la precisión con la que se guarda
+        self.assertIsNone(registrar_precio(self.producto.pk, '10.00'))
+        self.assertIsNotNone(registrar_precio(self.producto.pk, '11'))
+        self.assertEqual(self.precios(), [10.0, 11.0])
+
+    def test_sobrantes_repeticiones_consecutivas(self):
+        t = [en_fecha(date(2025, 1, dia)) for dia in range(1, 5)]
+        filas = [
+            (1, 'a', t[0], 10), (2, 'a', t[1], 10), (3, 'a', t[2], 12), (4, 'a', t[3], 12),
+            # Otro producto: su primer precio se conserva aunque coincida
+            (5, 'b', t[0], 12), (6, 'b', t[1], 10), (7, 'b', t[2], 12),
+        ]
+        self.assertEqual(list(_sobrantes(filas, None, None, deduplicar=True)), [2, 4])
+        self.assertEqual(list(_sobrantes(filas, None, None, deduplicar=False)), [])
+
+    def test_sobrantes_ultimo_punto_de_cada_dia_y_mes(self):
+        dia = date(2025, 1, 10)
+        filas = [
+            (1, 'a', en_fecha(date(2024, 3, 5)), 20), (2, 'a', en_fecha(date(2024, 3, 20)), 21),
+            (3, 'a', en_fecha(dia) - timedelta(hours=2), 10), (4, 'a', en_fecha(dia), 11),
+            (5, 'a', en_fecha(dia + timedelta(days=1)), 12),
+        ]
+        corte_mensual = en_fecha(date(2024, 6, 1))
+        corte_diario = en_fecha(date(2025, 2, 1))
+        self.assertEqual(list(_sobrantes(filas, corte_diario, corte_mensual, deduplicar=False)), [1, 3])
+        # Sin retención solo se quitan repeticiones
+        self.assertEqual(list(_sobrantes(filas, None, None, deduplicar=True)), [])
+
+    def test_compactar_historial(self):
+        ahora = timezone.now()
+        # Mediodía local: las horas anteriores caen en el mismo día
+        antiguo = en_fecha(timezone.localdate() - timedelta(days=200))
+        # Tres precios el mismo día antiguo: queda el último
+        self.precio(antiguo - timedelta(hours=2), '10')
+        self.precio(antiguo - timedelta(hours=1), '11')
+        self.precio(antiguo, '12')
+        self.precio(antiguo + timedelta(days=1), '13')
+        # Recientes: el 13 repite el anterior
+        self.precio(ahora - timedelta(days=1), '13')
+        self.precio(ahora - timedelta(hours=1), '14')
+        self.precio(ahora - timedelta(days=1), '7', producto=self.otro)
+
+        self.assertEqual(compactar_historial(simular=True), 3)
+        self.assertEqual(len(self.precios()), 6)
+
+        avisos = []
+        eliminados = compactar_historial(batch_size=2, progreso=lambda *aviso: avisos.append(aviso[:2]))
+        self.assertEqual(eliminados, 3)
+        self.assertEqual(avisos, [(2, 3), (3, 3)])
+        self.assertEqual(self.precios(), [12.0, 13.0, 14.0])
+        self.assertEqual(self.precios(self.otro), [7.0])
+        self.assertEqual(compactar_historial(), 0)
+
+    def test_compactar_mantiene_el_precio_vigente(self):
+        self.precio(timezone.now() - timedelta(days=2), '10')
+        vigente = self.precio(timezone.now() - timedelta(days=1), '10')
+        stock = StockProducto.objects.get(id_producto=self.producto)
+        self.assertEqual(stock.id_precio, vigente.pk)
+
+        self.assertEqual(compactar_historial(retencion=False), 1)
+        stock.refresh_from_db()
+        self.assertEqual((stock.precio_venta, stock.id_precio), (Decimal('10'), HistorialPrecio.objects.get().pk))
+
+
+class SeriePreciosTests(TestCase):
+    """Serie de precios reducida a cubetas en el servidor"""
+
+    def setUp(self):
+        _, (self.producto,), _ = catalogo(productos=1)
+        for dia, precio in ((2, '9'), (10, '10'), (11, '14'), (12, '12'), (25, '11')):
+            HistorialPrecio.objects.create(
+                id_producto=self.producto, fecha=en_fecha(date(2025, 1, dia)), precio_sugerido=Decimal(precio)
+            )
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def test_cubetas_con_datos(self):
+        desde = timezone.make_aware(datetime(2025, 1, 5))
+        puntos = list(serie_precios(self.producto.pk, desde, desde + timedelta(days=30), cubetas=3))
+        self.assertEqual(
+            [(p['min'], p['max'], p['ultimo'], p['n']) for p in puntos],
+            [(10.0, 14.0, 12.0, 3), (11.0, 11.0, 11.0, 1)],
+        )
+        self.assertEqual(puntos[0]['inicio'], desde.isoformat())
+
+    def test_api(self):
+        respuesta = self.client.get(
+            f'/api/productos/{self.producto.pk}/precios/serie/',
+            {'desde': '2025-01-05', 'hasta': '2025-01-31', 'cubetas': 2},
+        )
+        datos = json.loads(b''.join(respuesta.streaming_content))
+        self.assertEqual((datos['producto'], datos['cubetas'], datos['inicial']), (self.producto.pk, 2, 9.0))
+        self.assertEqual([p['n'] for p in datos['puntos']], [3, 1])
+
+    def test_api_parametros_invalidos(self):
+        url = f'/api/productos/{self.producto.pk}/precios/serie/'
+        self.assertEqual(self.client.get(url, {'desde': '05/01/2025'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'desde': '2025-02-01', 'hasta': '2025-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cubetas': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/api/productos/0/precios/serie/').status_code, 404)
+
+
+class PrecioVigenteTests(TestCase):
+    """StockProducto guarda el último precio del historial para el formulario de ventas"""
+
+    def setUp(self):
+        _, (self.producto,), _ = catalogo(productos=1)
+
+    def vigente(self):
+        return StockProducto.objects.values_list('precio_venta', 'id_precio').get(id_producto=self.producto)
+
+    def test_empate_de_fecha_por_id(self):
+        fecha = en_fecha(date(2025, 1, 10))
+        HistorialPrecio.objects.create(id_producto=self.producto, fecha=fecha, precio_sugerido=Decimal('10'))
+        ultimo = HistorialPrecio.objects.create(id_producto=self.producto, fecha=fecha, precio_sugerido=Decimal('12'))
+        # Un precio con fecha anterior no reemplaza al vigente
+        HistorialPrecio.objects.create(id_producto=self.producto, fecha=fecha - timedelta(days=1), precio_sugerido=Decimal('8'))
+        self.assertEqual(self.vigente(), (Decimal('12'), ultimo.pk))
+
+        ultimo.delete()
+        self.assertEqual(self.vigente()[0], Decimal('10'))
+
+
+class ApiPreciosTests(TestCase):
+    """/api/productos/precios/ para el formulario de ventas, revalidada por ETag"""
+
+    def setUp(self):
+        self.proveedor, (self.producto, self.otro), _ = catalogo(productos=2)
+        comprar(self.proveedor, self.producto, date(2025, 1, 5), 10, '100')
+        registrar_precio(self.producto.pk, '13')
+        User.objects.create_user('lector', password='clave-de-prueba')
+        self.client.login(username='lector', password='clave-de-prueba')
+
+    def test_precio_y_stock(self):
+        datos = self.client.get('/api/productos/precios/', {'ids': f'{self.producto.pk},{self.otro.pk}'}).json()
+        self.assertEqual(datos['productos'], {
+            str(self.producto.pk): {'precio_sugerido': 13.0, 'stock_actual': 10},
+            str(self.otro.pk): {'precio_sugerido': None, 'stock_actual': 0},
+        })
+        self.assertEqual(self.client.get('/api/productos/precios/', {'ids': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/productos/precios/').status_code, 400)
+
+    def test_etag_cambia_con_las_escrituras(self):
+        parametros = {'ids': str(self.producto.pk)}
+        etag = self.client.get('/api/productos/precios/', parametros)['ETag']
+        self.assertEqual(self.client.get('/api/productos/precios/', parametros, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_precio(self.producto.pk, '15')
+        respuesta = self.client.get('/api/productos/precios/', parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['productos'][str(self.producto.pk)]['precio_sugerido'], 15.0)
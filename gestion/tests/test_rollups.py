@@ -0,0 +1,55 @@
+from datetime import date
+
+from django.test import TestCase
+
+from gestion.models import ResumenVentaCliente, ResumenVentaProducto
+from gestion.rollups import reconstruir_resumenes
+
+from .datos import catalogo, vender
+
+CAMPOS = ('granularidad', 'periodo', 'unidades', 'ingresos', 'numero_ventas')
+
+
+class ResumenesTests(TestCase):
+    """Los resúmenes por día, semana y mes que mantienen las señales coinciden con una reconstrucción"""
+
+    def setUp(self):
+        _, self.productos, self.clientes = catalogo(productos=2)
+
+    def resumenes(self):
+        return (
+            sorted(ResumenVentaProducto.objects.exclude(numero_ventas=0).values_list('id_producto', *CAMPOS)),
+            sorted(ResumenVentaCliente.objects.exclude(numero_ventas=0).values_list('id_cliente', *CAMPOS)),
+        )
+
+    def assertIgualALaReconstruccion(self):
+        incremental = self.resumenes()
+        reconstruir_resumenes()
+        self.assertEqual(incremental, self.resumenes())
+
+    def test_alta_edicion_y_baja_de_ventas(self):
+        producto, otro = self.productos
+        cliente, otro_cliente = self.clientes
+        venta = vender(producto, 2, '10', cliente)
+        vender(producto, 1, '10')
+        vender(otro, 3, '5', cliente, fecha=date(2025, 3, 31))
+        vender(otro, 1, '5', otro_cliente, fecha=date(2025, 4, 1))
+        self.assertEqual(
+            ResumenVentaProducto.objects.get(id_producto=producto, granularidad='dia', periodo=date.today()).unidades, 3
+        )
+        self.assertIgualALaReconstruccion()
+
+        venta.cantidad = 6
+        venta.id_cliente = otro_cliente
+        venta.save()
+        self.assertIgualALaReconstruccion()
+
+        # Otro producto, sin cliente y en otra semana y otro mes
+        venta.id_producto = otro
+        venta.id_cliente = None
+        venta.fecha_creacion = venta.fecha_creacion.replace(year=2025, month=3, day=30)
+        venta.save()
+        self.assertIgualALaReconstruccion()
+
+        venta.delete()
+        self.assertIgualALaReconstruccion()
@@ -0,0 +1,80 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from gestion.models import StockProducto
+from gestion.utils import recalcular_stock
+
+from .datos import catalogo, comprar, vender
+
+CAMPOS = (
+    'id_producto', 'total_compras', 'total_ventas', 'stock_actual', 'costo_promedio',
+    'fecha_ultima_compra', 'fecha_ultima_venta', 'precio_venta', 'id_precio',
+)
+
+
+class StockProductoTests(TestCase):
+    """Las señales dejan StockProducto igual que una reconstrucción completa"""
+
+    def setUp(self):
+        self.proveedor, self.productos, self.clientes = catalogo()
+
+    def estado(self):
+        return list(StockProducto.objects.order_by('id_producto').values_list(*CAMPOS))
+
+    def assertIgualAlRecalculo(self):
+        incremental = self.estado()
+        recalcular_stock()
+        self.assertEqual(incremental, self.estado())
+
+    def test_producto_nuevo_sin_movimientos(self):
+        stock = StockProducto.objects.get(id_producto=self.productos[0])
+        self.assertEqual((stock.total_compras, stock.total_ventas, stock.stock_actual), (0, 0, 0))
+
+    def test_alta_edicion_y_baja_de_compras(self):
+        producto, otro = self.productos[:2]
+        compra = comprar(self.proveedor, producto, date(2026, 3, 10), 10, '100')
+        comprar(self.proveedor, producto, date(2026, 2, 1), 5, '75')
+        self.assertEqual(StockProducto.objects.get(id_producto=producto).stock_actual, 15)
+        self.assertIgualAlRecalculo()
+
+        compra.cantidad = 4
+        compra.costo_total = Decimal('60')
+        compra.costo_unitario = 0
+        compra.fecha = date(2026, 1, 15)
+        compra.save()
+        self.assertIgualAlRecalculo()
+
+        compra.id_producto = otro
+        compra.save()
+        self.assertEqual(StockProducto.objects.get(id_producto=producto).stock_actual, 5)
+        self.assertEqual(StockProducto.objects.get(id_producto=otro).stock_actual, 4)
+        self.assertIgualAlRecalculo()
+
+        compra.delete()
+        self.assertEqual(StockProducto.objects.get(id_producto=otro).stock_actual, 0)
+        self.assertIgualAlRecalculo()
+
+    def test_alta_edicion_y_baja_de_ventas(self):
+        producto, otro = self.productos[:2]
+        comprar(self.proveedor, producto, date(2026, 1, 5), 20, '200')
+        comprar(self.proveedor, otro, date(2026, 1, 5), 20, '400')
+        venta = vender(producto, 3, '15', self.clientes[0])
+        vender(producto, 2, '15', fecha=date(2026, 2, 1))
+        self.assertEqual(StockProducto.objects.get(id_producto=producto).stock_actual, 15)
+        self.assertIgualAlRecalculo()
+
+        venta.cantidad = 7
+        venta.save()
+        self.assertIgualAlRecalculo()
+
+        venta.id_producto = otro
+        venta.save()
+        self.assertEqual(StockProducto.objects.get(id_producto=producto).stock_actual, 18)
+        self.assertEqual(StockProducto.objects.get(id_producto=otro).stock_actual, 13)
+        self.assertIgualAlRecalculo()
+
+        venta.delete()
+        self.assertEqual(StockProducto.objects.get(id_producto=otro).stock_actual, 20)
+        self.assertIgualAlRecalculo()
@@ -7,11 +7,13 @@ urlpatterns = [
 
     #Dashboard
     path('', views.dashboard, name='dashboard'),
+    path('async/', views.dashboard_async, name='dashboard_async'),
     
     # Compras
     path('compras/', views.compra_list, name='compra_list'),
     path('compras/nueva/', views.compra_create, name='compra_create'), 
     path('compras/editar/<int:pk>/', views.compra_edit, name='compra_edit'),
+    path('compras/importar/', views.compra_importar, name='compra_importar'),
     
     # Ventas
     path('ventas/', views.venta_list, name='venta_list'),
@@ -34,6 +36,17 @@ urlpatterns = [
    
     # Análisis de Ventas
     path('analisis-ventas/', views.analisis_ventas_list, name='analisis_ventas_list'),
+    path('analisis-ventas/async/', views.analisis_ventas_list_async, name='analisis_ventas_list_async'),
     path('analisis-ventas/recalcular-todo/', views.analisis_ventas_recalcular_todo, name='analisis_ventas_recalcular_todo'),
+
+    # API
+    path('api/productos/precios/', views.api_precios_productos, name='api_precios_productos'),
+    path('api/productos/<int:pk>/precios/serie/', views.api_serie_precios, name='api_serie_precios'),
+    path('api/buscar/', views.api_buscar, name='api_buscar'),
+    path('api/autocompletar/<str:tipo>/', views.api_autocompletar, name='api_autocompletar'),
+    path('api/ventas/lote/', views.api_ventas_lote, name='api_ventas_lote'),
+
+    # Tareas en segundo plano
+    path('tareas/<int:pk>/', views.job_detail, name='job_detail'),
 ]
     
\ No newline at end of file
@@ -1,125 +1,450 @@
-from django.db.models import Sum, Avg, F, Subquery, OuterRef, Value, IntegerField, DecimalField
-from django.db.models.functions import Coalesce
+from argparse import ArgumentTypeError
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import asyncio
+from asgiref.sync import sync_to_async
+from django.db import transaction, close_old_connections
+from django.db.models import Sum, Count, Max, Min, F, Q, Subquery, OuterRef, Value, ExpressionWrapper, IntegerField, DecimalField
+from django.db.models.functions import Coalesce, Lower, TruncDate
 from django.utils import timezone
-from .models import Producto, Compra, Venta, HistorialPrecio
+from .models import (
+    Producto, Compra, Venta, HistorialPrecio, StockProducto, CierreInventario, AnalisisVenta,
+    PORCENTAJE_GANANCIA, PORCENTAJE_AHORRO,
+)
+from .cache import cache_inventario, incrementar_version_inventario
+from . import costos
+from .busqueda import filtrar as filtrar_busqueda
 
-def get_inventario_data():
+def _inventario_recalculado_queryset():
+    """
+    Recalcula el inventario a partir del histórico de compras, ventas y precios.
+
+    Anota cada producto con sus totales usando subconsultas agrupadas por
+    producto, de modo que todo el inventario se resuelve en una sola consulta
+    sin importar cuántos productos existan. Es la fuente de verdad con la que
+    se reconstruye la tabla StockProducto; el costo promedio se reproduce
+    aparte en costos.recalcular_costos().
+    """
+    compras = Compra.objects.filter(id_producto=OuterRef('pk')).order_by().values('id_producto')
+    ventas = Venta.objects.filter(id_producto=OuterRef('pk')).order_by().values('id_producto')
+    precios = HistorialPrecio.objects.filter(id_producto=OuterRef('pk')).order_by('-fecha', '-id_precio')
+
+    total_compras = Subquery(
+        compras.annotate(total=Sum('cantidad')).values('total'),
+        output_field=IntegerField()
+    )
+    total_ventas = Subquery(
+        ventas.annotate(total=Sum('cantidad')).values('total'),
+        output_field=IntegerField()
+    )
+
+    return Producto.objects.annotate(
+        total_compras=Coalesce(total_compras, Value(0)),
+        total_ventas=Coalesce(total_ventas, Value(0)),
+        precio_venta=Coalesce(
+            Subquery(precios.values('precio_sugerido')[:1], output_field=DecimalField()),
+            Value(Decimal('0')), output_field=DecimalField()
+        ),
+        fecha_precio=Subquery(precios.values('fecha')[:1]),
+        id_precio=Subquery(precios.values('id_precio')[:1]),
+    ).annotate(
+        stock_actual=F('total_compras') - F('total_ventas'),
+    )
+
+def _inventario_queryset():
+    """
+    Queryset base del motor de inventario.
+
+    Lee los totales materializados en StockProducto, por lo que el inventario
+    completo es un recorrido de una tabla unida por clave primaria.
+    """
+    return Producto.objects.annotate(
+        total_compras=Coalesce(F('stock__total_compras'), Value(0)),
+        total_ventas=Coalesce(F('stock__total_ventas'), Value(0)),
+        stock_actual=Coalesce(F('stock__stock_actual'), Value(0)),
+        costo_promedio=Coalesce(F('stock__costo_promedio'), Value(Decimal('0')), output_field=DecimalField()),
+        precio_venta=Coalesce(F('stock__precio_venta'), Value(Decimal('0')), output_field=DecimalField()),
+    ).annotate(
+        valor_total=ExpressionWrapper(F('stock_actual') * F('costo_promedio'), output_field=DecimalField()),
+    )
+
+def _inicio_dia_siguiente(fecha):
+    """Primer instante del día posterior a ``fecha`` en la zona horaria actual"""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+def _filas_as_of(fecha, productos=None):
+    """
+    Filas de inventario al cierre del día ``fecha``.
+
+    El estado de cada producto (totales y costo promedio) sale de su cierre
+    mensual más reciente más los movimientos posteriores, reproducidos en
+    orden; el precio es el último registrado hasta esa fecha.
+    """
+    estados = costos.estados_as_of(fecha, productos)
+    queryset = Producto.objects.annotate(
+        precio_venta=Coalesce(
+            Subquery(
+                HistorialPrecio.objects.filter(
+                    id_producto=OuterRef('pk'), fecha__lt=_inicio_dia_siguiente(fecha)
+                ).order_by('-fecha', '-id_precio').values('precio_sugerido')[:1],
+                output_field=DecimalField()
+            ),
+            Value(Decimal('0')), output_field=DecimalField()
+        ),
+    ).order_by('id_producto')
+    if productos is not None:
+        queryset = queryset.filter(pk__in=productos)
+
+    filas = []
+    for producto in queryset.iterator(chunk_size=2000):
+        estado = estados.get(producto.id_producto) or costos.estado_vacio()
+        producto.total_compras = estado['total_compras']
+        producto.total_ventas = estado['total_ventas']
+        producto.stock_actual = estado['total_compras'] - estado['total_ventas']
+        producto.costo_promedio = estado['costo_promedio']
+        producto.valor_total = producto.stock_actual * estado['costo_promedio']
+        filas.append(_fila_inventario(producto))
+    return filas
+
+# Filas por upsert en las reconstrucciones
+LOTE_ESCRITURA = 1000
+
+def fecha_iso(valor):
+    """Fecha YYYY-MM-DD de los argumentos de los comandos (``type=`` de argparse)"""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise ArgumentTypeError(f'Fecha inválida: {valor} (formato YYYY-MM-DD)')
+
+def inicio_mes_actual():
+    """Primer instante del mes en curso"""
+    return timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _fin_de_mes(fecha):
+    siguiente = (fecha.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return siguiente - timedelta(days=1)
+
+def _meses_pendientes(hasta):
+    """
+    {producto: primer mes sin cierre}, hasta el día ``hasta``: el mes del
+    primer movimiento posterior a su último cierre. Cubre los meses nuevos y
+    los cierres que ``invalidar_cierres`` borró de un solo producto.
+    """
+    ultimo_cierre = Subquery(
+        CierreInventario.objects.filter(id_producto=OuterRef('id_producto')).order_by('-fecha').values('fecha')[:1]
+    )
+    compras = Compra.objects.filter(fecha__lte=hasta).annotate(cierre=ultimo_cierre).filter(
+        Q(cierre__isnull=True) | Q(fecha__gt=F('cierre'))
+    )
+    ventas = Venta.objects.filter(fecha_creacion__lt=_inicio_dia_siguiente(hasta)).annotate(cierre=ultimo_cierre).filter(
+        Q(cierre__isnull=True) | Q(fecha_creacion__date__gt=F('cierre'))
+    )
+
+    pendientes = {}
+    for producto_id, fecha in compras.values('id_producto').annotate(primera=Min('fecha')).values_list('id_producto', 'primera'):
+        pendientes[producto_id] = fecha
+    for producto_id, fecha in ventas.values('id_producto').annotate(primera=Min('fecha_creacion')).values_list('id_producto', 'primera'):
+        fecha = timezone.localdate(fecha)
+        pendientes[producto_id] = min(pendientes.get(producto_id, fecha), fecha)
+    return {producto_id: fecha.replace(day=1) for producto_id, fecha in pendientes.items()}
+
+def construir_cierres(desde=None, hasta=None, progreso=None):
+    """
+    Genera los cierres mensuales de inventario que falten.
+
+    Sin ``desde`` cada producto continúa desde su primer mes sin cierre, así
+    que también se rehacen los cierres invalidados de un solo producto; con
+    ``desde`` se rehacen todos desde ese mes. Solo se escribe un cierre para
+    los productos con movimientos en el mes, el resto conserva el anterior.
+    Cada mes se confirma por separado e informa a ``progreso`` (ver jobs.py).
+    Devuelve (meses procesados, cierres escritos).
+    """
+    ultimo_mes_cerrado = timezone.localdate().replace(day=1) - timedelta(days=1)
+    hasta = min(_fin_de_mes(hasta), ultimo_mes_cerrado) if hasta else ultimo_mes_cerrado
+
+    if desde is None:
+        pendientes = _meses_pendientes(hasta)
+        if not pendientes:
+            return 0, 0
+        inicio = min(pendientes.values())
+    else:
+        pendientes = None
+        inicio = desde.replace(day=1)
+        CierreInventario.objects.filter(fecha__gte=inicio).delete()
+
+    # Estado real al terminar el mes anterior, desde los cierres que ya existen
+    estado = costos.estados_as_of(inicio - timedelta(days=1))
+    total_meses = max((hasta.year - inicio.year) * 12 + hasta.month - inicio.month + 1, 0)
+
+    meses = escritos = 0
+    while _fin_de_mes(inicio) <= hasta:
+        fin = _fin_de_mes(inicio)
+        compras = Compra.objects.filter(fecha__gte=inicio, fecha__lte=fin).order_by()
+        ventas = Venta.objects.filter(
+            fecha_creacion__gte=timezone.make_aware(datetime.combine(inicio, time.min)),
+            fecha_creacion__lt=_inicio_dia_siguiente(fin),
+        ).order_by()
+        movimientos = costos.agrupar_por_producto(
+            compras.values_list('id_producto', 'fecha', 'id_compra', 'cantidad', 'costo_unitario'),
+            ventas.values_list('id_producto', 'fecha_creacion', 'id_venta', 'cantidad'),
+        )
+
+        filas = []
+        for producto_id, lista in movimientos.items():
+            actual = costos.reproducir(estado.setdefault(producto_id, costos.estado_vacio()), lista)
+            # Los meses que el producto ya tiene cerrados solo avanzan su estado
+            if pendientes is not None and pendientes.get(producto_id, fin) > inicio:
+                continue
+            filas.append(CierreInventario(
+                id_producto_id=producto_id,
+                fecha=fin,
+                total_compras=actual['total_compras'],
+                total_ventas=actual['total_ventas'],
+                stock_actual=actual['total_compras'] - actual['total_ventas'],
+                costo_promedio=actual['costo_promedio'],
+            ))
+        with transaction.atomic():
+            CierreInventario.objects.bulk_create(
+                filas,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['id_producto', 'fecha'],
+                update_fields=['total_compras', 'total_ventas', 'stock_actual', 'costo_promedio'],
+            )
+        meses += 1
+        escritos += len(filas)
+        inicio = fin + timedelta(days=1)
+        if progreso:
+            progreso(meses, total_meses, f'Cierre de {fin:%m/%Y}')
+
+    return meses, escritos
+
+def recalcular_analisis_ventas(desde=None, hasta=None, progreso=None):
+    """
+    Reconstruye AnalisisVenta con una sola consulta agrupada por día.
+
+    Los totales se escriben por lotes con un upsert (cada lote se confirma
+    e informa a ``progreso``) y se eliminan los días del rango que ya no
+    tienen ventas. Sin rango se rehace todo el histórico hasta hoy.
+    Devuelve (días escritos, días eliminados).
+    """
+    hasta = min(hasta, timezone.localdate()) if hasta else timezone.localdate()
+    ventas = Venta.objects.filter(fecha_creacion__lt=_inicio_dia_siguiente(hasta))
+    analisis = AnalisisVenta.objects.filter(fecha__lte=hasta)
+    if desde:
+        ventas = ventas.filter(fecha_creacion__gte=timezone.make_aware(datetime.combine(desde, time.min)))
+        analisis = analisis.filter(fecha__gte=desde)
+
+    totales = ventas.order_by().annotate(
+        fecha_venta=TruncDate('fecha_creacion')
+    ).values('fecha_venta').annotate(total=Sum('total')).values_list('fecha_venta', 'total')
+
+    filas = []
+    for fecha, total in totales.iterator(chunk_size=2000):
+        total = total or Decimal('0')
+        promedio_ganancia = total * PORCENTAJE_GANANCIA
+        filas.append(AnalisisVenta(
+            fecha=fecha,
+            total_ventas=total,
+            promedio_ganancia=promedio_ganancia,
+            ahorro=promedio_ganancia * PORCENTAJE_AHORRO,
+        ))
+
+    for inicio in range(0, len(filas), LOTE_ESCRITURA):
+        AnalisisVenta.objects.bulk_create(
+            filas[inicio:inicio + LOTE_ESCRITURA],
+            update_conflicts=True,
+            unique_fields=['fecha'],
+            update_fields=['total_ventas', 'promedio_ganancia', 'ahorro', 'fecha_actualizacion'],
+        )
+        if progreso:
+            progreso(min(inicio + LOTE_ESCRITURA, len(filas)), len(filas), 'Días recalculados')
+    # Días del rango que ya no tienen ventas (normalmente pocos)
+    sobrantes = set(analisis.values_list('fecha', flat=True)) - {fila.fecha for fila in filas}
+    eliminados, _ = AnalisisVenta.objects.filter(fecha__in=sobrantes).delete()
+    return len(filas), eliminados
+
+# Columnas por las que se puede ordenar el inventario (parámetro sort)
+ORDEN_INVENTARIO = {
+    'nombre': Lower('nombre'),
+    'marca': Lower('marca'),
+    'id_producto': F('id_producto'),
+    'stock_inicial': F('id_producto'),
+    'total_compras': F('total_compras'),
+    'total_ventas': F('total_ventas'),
+    'stock_actual': F('stock_actual'),
+    'costo_promedio': F('costo_promedio'),
+    'precio_venta': F('precio_venta'),
+    'valor_total': F('valor_total'),
+    'ultima_actualizacion': F('fecha_actualizacion'),
+}
+
+# Filtros de stock disponibles en la vista de inventario (parámetro stock)
+FILTROS_STOCK = {
+    'critico': Q(stock_actual__lte=2),
+    'bajo': Q(stock_actual__gte=3, stock_actual__lte=5),
+    'agotado': Q(stock_actual__lte=0),
+    'normal': Q(stock_actual__gt=5),
+}
+
+def get_inventario_queryset(search_query='', stock_filter='', sort_by=''):
+    """
+    Inventario filtrado y ordenado en la base de datos.
+    Solo se construyen filas para la página que se llegue a evaluar.
+    """
+    queryset = _inventario_queryset()
+
+    if search_query:
+        queryset = filtrar_busqueda(queryset, search_query, campos=('nombre', 'marca'))
+
+    if stock_filter in FILTROS_STOCK:
+        queryset = queryset.filter(FILTROS_STOCK[stock_filter])
+
+    key = sort_by.lstrip('-')
+    if key in ORDEN_INVENTARIO:
+        orden = ORDEN_INVENTARIO[key]
+        orden = orden.desc() if sort_by.startswith('-') else orden.asc()
+    else:
+        # Orden por defecto por nombre
+        orden = Lower('nombre').asc()
+
+    return queryset.order_by(orden, 'id_producto')
+
+def filas_inventario(productos):
+    """Convierte productos anotados (por ejemplo una página) en filas de inventario"""
+    return [_fila_inventario(producto) for producto in productos]
+
+def recalcular_stock(productos=None, progreso=None):
+    """
+    Reconstruye StockProducto desde el histórico, incluido el costo promedio.
+    Con ``progreso`` informa por lotes: primero la reproducción de costos y
+    después la escritura, que se confirma lote a lote.
+    Devuelve el número de productos recalculados.
+    """
+    queryset = _inventario_recalculado_queryset()
+    if productos is not None:
+        queryset = queryset.filter(pk__in=productos)
+    total = queryset.count() if progreso else 0
+
+    def avance(hechos, mensaje):
+        if progreso:
+            progreso(hechos, 2 * total, mensaje)
+
+    estados = costos.recalcular_costos(
+        productos, progreso=lambda reproducidos: avance(min(reproducidos, total), 'Reproduciendo costos')
+    )
+
+    filas = []
+    for producto in queryset.iterator(chunk_size=2000):
+        estado = estados.get(producto.id_producto) or costos.estado_vacio()
+        filas.append(StockProducto(
+            id_producto_id=producto.id_producto,
+            total_compras=producto.total_compras,
+            total_ventas=producto.total_ventas,
+            stock_actual=producto.stock_actual,
+            costo_promedio=estado['costo_promedio'],
+            fecha_ultima_compra=estado['fecha_ultima_compra'],
+            fecha_ultima_venta=estado['fecha_ultima_venta'],
+            precio_venta=producto.precio_venta,
+            fecha_precio=producto.fecha_precio,
+            id_precio=producto.id_precio,
+        ))
+    for inicio in range(0, len(filas), LOTE_ESCRITURA):
+        StockProducto.objects.bulk_create(
+            filas[inicio:inicio + LOTE_ESCRITURA],
+            update_conflicts=True,
+            unique_fields=['id_producto'],
+            update_fields=[
+                'total_compras', 'total_ventas', 'stock_actual', 'costo_promedio',
+                'fecha_ultima_compra', 'fecha_ultima_venta', 'precio_venta', 'fecha_precio', 'id_precio',
+            ],
+        )
+        avance(total + min(inicio + LOTE_ESCRITURA, len(filas)), 'Guardando stock')
+    incrementar_version_inventario()
+    return len(filas)
+
+def _fila_inventario(producto):
+    """Convierte un producto anotado en la fila que consumen vistas y plantillas"""
+    return {
+        'id_producto': producto.id_producto,
+        'nombre': producto.nombre,
+        'marca': producto.marca or '',
+        'stock_inicial': 0,
+        'total_compras': int(producto.total_compras),
+        'total_ventas': int(producto.total_ventas),
+        'stock_actual': int(producto.stock_actual),
+        'costo_promedio': float(producto.costo_promedio),
+        'precio_venta': float(producto.precio_venta),
+        'valor_total': float(producto.valor_total),
+        'ultima_actualizacion': producto.fecha_actualizacion
+    }
+
+def get_inventario_data(as_of=None):
     """
     Obtiene datos del inventario usando ORM de Django
-    Versión corregida y optimizada
+    Todo el inventario se lee de StockProducto en una sola consulta
+    y se cachea hasta la siguiente escritura.
+    Con ``as_of`` se calcula al cierre de esa fecha desde los cierres mensuales.
     """
-    inventario = []
-    
     try:
-        # Obtener todos los productos
-        productos = Producto.objects.all()
-        
-        for producto in productos:
-            # Calcular total de compras para este producto
-            total_compras = Compra.objects.filter(
-                id_producto=producto
-            ).aggregate(total=Sum('cantidad'))['total'] or 0
-            
-            # Calcular total de ventas para este producto
-            total_ventas = Venta.objects.filter(
-                id_producto=producto
-            ).aggregate(total=Sum('cantidad'))['total'] or 0
-            
-            # Calcular costo promedio de compras
-            costo_promedio = Compra.objects.filter(
-                id_producto=producto
-            ).aggregate(promedio=Avg('costo_unitario'))['promedio'] or 0
-            
-            # Obtener último precio histórico
-            ultimo_precio = HistorialPrecio.objects.filter(
-                id_producto=producto
-            ).order_by('-fecha').first()
-            
-            # Calcular stock actual
-            stock_actual = total_compras - total_ventas
-            
-            # Calcular valor total a costo
-            valor_total = stock_actual * costo_promedio
-            
-            # Agregar al inventario
-            inventario.append({
-                'id_producto': producto.id_producto,
-                'nombre': producto.nombre,
-                'marca': producto.marca or '',
-                'stock_inicial': 0,
-                'total_compras': int(total_compras),
-                'total_ventas': int(total_ventas),
-                'stock_actual': int(stock_actual),
-                'costo_promedio': float(costo_promedio),
-                'precio_venta': float(ultimo_precio.precio_sugerido) if ultimo_precio else 0.0,
-                'valor_total': float(valor_total),
-                'ultima_actualizacion': producto.fecha_actualizacion
-            })
-        
-        return inventario
-        
+        if as_of:
+            return cache_inventario(f'data:{as_of.isoformat()}', lambda: _filas_as_of(as_of))
+        return cache_inventario('data', lambda: filas_inventario(_inventario_queryset()))
+
     except Exception as e:
         print(f"Error en get_inventario_data: {e}")
         # En caso de error, retornar lista vacía
         return []
 
-def get_inventario_producto(producto_id):
+def get_inventario_producto(producto_id, as_of=None):
     """
     Obtiene datos de inventario para un producto específico
     """
     try:
-        producto = Producto.objects.get(id_producto=producto_id)
-        
-        # Calcular total de compras
-        total_compras = Compra.objects.filter(
-            id_producto=producto_id
-        ).aggregate(total=Sum('cantidad'))['total'] or 0
-        
-        # Calcular total de ventas
-        total_ventas = Venta.objects.filter(
-            id_producto=producto_id
-        ).aggregate(total=Sum('cantidad'))['total'] or 0
-        
-        # Calcular costo promedio
-        costo_promedio = Compra.objects.filter(
-            id_producto=producto_id
-        ).aggregate(promedio=Avg('costo_unitario'))['promedio'] or 0
-        
-        # Obtener último precio histórico
-        ultimo_precio = HistorialPrecio.objects.filter(
-            id_producto=producto_id
-        ).order_by('-fecha').first()
-        
-        # Calcular stock actual
-        stock_actual = total_compras - total_ventas
-        
-        return {
-            'id_producto': producto.id_producto,
-            'nombre': producto.nombre,
-            'marca': producto.marca or '',
-            'stock_inicial': 0,
-            'total_compras': int(total_compras),
-            'total_ventas': int(total_ventas),
-            'stock_actual': int(stock_actual),
-            'costo_promedio': float(costo_promedio),
-            'precio_venta': float(ultimo_precio.precio_sugerido) if ultimo_precio else 0.0,
-            'valor_total': float(stock_actual * costo_promedio),
-            'ultima_actualizacion': producto.fecha_actualizacion
-        }
-        
+        if as_of:
+            filas = _filas_as_of(as_of, productos=[producto_id])
+            return filas[0] if filas else None
+        producto = _inventario_queryset().get(id_producto=producto_id)
+        return _fila_inventario(producto)
+
     except Producto.DoesNotExist:
         return None
     except Exception as e:
         print(f"Error en get_inventario_producto: {e}")
         return None
 
-def get_estadisticas_inventario(inventario_data=None):
+def get_estadisticas_queryset(queryset):
+    """
+    Estadísticas de un queryset de inventario en una sola consulta
+    con agregados condicionales
+    """
+    estadisticas = queryset.aggregate(
+        productos=Count('pk'),
+        stock_total=Sum('stock_actual'),
+        valor_inventario=Sum('valor_total'),
+        productos_bajo_stock=Count('pk', filter=Q(stock_actual__gt=0, stock_actual__lte=5)),
+        productos_criticos=Count('pk', filter=Q(stock_actual__gt=0, stock_actual__lte=2)),
+        productos_agotados=Count('pk', filter=Q(stock_actual__lte=0)),
+    )
+    productos = estadisticas.pop('productos')
+    estadisticas['stock_total'] = int(estadisticas['stock_total'] or 0)
+    estadisticas['valor_total'] = float(estadisticas.pop('valor_inventario') or 0)
+    estadisticas['valor_promedio_producto'] = estadisticas['valor_total'] / productos if productos else 0.0
+    return estadisticas
+
+def get_estadisticas_inventario(inventario_data=None, as_of=None):
     """
     Calcula estadísticas del inventario
+    Sin datos previos, se agrega en la base de datos y se cachea
     """
+    if inventario_data is None and as_of:
+        return cache_inventario(
+            f'estadisticas:{as_of.isoformat()}',
+            lambda: get_estadisticas_inventario(get_inventario_data(as_of))
+        )
     if inventario_data is None:
-        inventario_data = get_inventario_data()
-    
+        return cache_inventario('estadisticas', lambda: get_estadisticas_queryset(_inventario_queryset()))
+
     if not inventario_data:
         return {
             'stock_total': 0,
@@ -129,15 +454,15 @@ def get_estadisticas_inventario(inventario_data=None):
             'productos_agotados': 0,
             'valor_promedio_producto': 0.0
         }
-    
+
     stock_total = sum(item.get('stock_actual', 0) for item in inventario_data)
     valor_total = sum(item.get('valor_total', 0.0) for item in inventario_data)
     productos_bajo_stock = sum(1 for item in inventario_data if item.get('stock_actual', 0) <= 5 and item.get('stock_actual', 0) > 0)
     productos_criticos = sum(1 for item in inventario_data if item.get('stock_actual', 0) <= 2 and item.get('stock_actual', 0) > 0)
     productos_agotados = sum(1 for item in inventario_data if item.get('stock_actual', 0) <= 0)
-    
+
     valor_promedio = valor_total / len(inventario_data) if inventario_data else 0
-    
+
     return {
         'stock_total': stock_total,
         'valor_total': valor_total,
@@ -145,4 +470,23 @@ def get_estadisticas_inventario(inventario_data=None):
         'productos_criticos': productos_criticos,
         'productos_agotados': productos_agotados,
         'valor_promedio_producto': valor_promedio
-    }
\ No newline at end of file
+    }
+
+
+def _en_hilo(funcion):
+    """Ejecuta ``funcion`` en un hilo del pool y cierra su conexión al terminar"""
+    def ejecutar():
+        try:
+            return funcion()
+        finally:
+            close_old_connections()
+    return sync_to_async(ejecutar, thread_sensitive=False)()
+
+
+async def en_paralelo(*funciones):
+    """
+    Ejecuta funciones síncronas independientes (consultas al ORM) a la vez,
+    cada una en su hilo y con su propia conexión. Devuelve los resultados en
+    el mismo orden.
+    """
+    return await asyncio.gather(*(_en_hilo(funcion) for funcion in funciones))
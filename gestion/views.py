@@ -3,18 +3,43 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Q, Max  
+from django.db.models import Sum, Q
 from django.utils import timezone
 from django.urls import reverse
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from .models import *
 from .forms import *
-from .utils import get_inventario_data, get_estadisticas_inventario
+from .snapshot import get_inventario_snapshot, InventarioSnapshot
+from .utils import get_inventario_queryset, get_estadisticas_queryset, get_estadisticas_inventario, get_inventario_data, filas_inventario, FILTROS_STOCK
+from .jobs import encolar
+from .dashboard import get_dashboard_data, aget_dashboard_data
+from .precios import registrar_precio, serie_precios, precio_vigente
 from django.db.models import Sum, F, DecimalField
-from django.db.models.functions import TruncDate, Cast
+from django.db.models.functions import Cast
 from decimal import Decimal
+from datetime import datetime, time, timedelta
+import json
 from django.contrib.auth.models import User
-from django.http import HttpResponse  
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+from .cache import get_version_inventario
+from .utils import en_paralelo
+from .paginacion import paginar_por_cursor
+from .conteo import PaginadorEstimado
+from .busqueda import filtrar as filtrar_busqueda
+from .indice import buscar_global, url_resultado, autocompletar
+from .ingesta import registrar_ventas
+from .importar import leer_filas, ErrorImportacion, COLUMNAS as COLUMNAS_IMPORTACION
+from django.core.files.storage import default_storage
+from .exportar import (
+    FORMATOS as FORMATOS_EXPORTACION, exportar_queryset, respuesta_exportacion,
+    COLUMNAS_VENTAS, COLUMNAS_COMPRAS, COLUMNAS_HISTORIAL, COLUMNAS_INVENTARIO,
+)
+from asgiref.sync import sync_to_async
+from functools import partial, wraps
+from django.contrib.auth.views import redirect_to_login
+from django.views.decorators.csrf import csrf_exempt
 
 # -------------------- Usuario Demo -------------------- #
 def login_demo(request):
@@ -30,8 +55,59 @@ def login_demo(request):
     login(request, user)
     return redirect('dashboard')
 
+# Máximo de productos en el panel de bajo stock del inventario
+LIMITE_PRODUCTOS_ATENCION = 12
+
+# Orden de las listas paginadas por cursor (la última columna es la pk)
+ORDEN_COMPRAS = ('-fecha', '-id_compra')
+ORDEN_VENTAS = ('-fecha_creacion', '-id_venta')
+ORDEN_CLIENTES = ('-fecha_creacion', '-id_cliente')
+ORDEN_PRODUCTOS = ('-fecha_creacion', '-id_producto')
+ORDEN_PROVEEDORES = ('-fecha_creacion', '-id_proveedor')
+
+def login_required_async(vista):
+    """login_required para vistas asíncronas (el de Django 5.0 solo admite síncronas)"""
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+def token_terminal_requerido(vista):
+    """
+    Autenticación de las APIs para terminales: cabecera ``Authorization: Token
+    <clave>`` (ver TokenTerminal). Sin sesión no hay CSRF que comprobar. Sin
+    token o con uno desconocido responde 401 en JSON; desactivado, 403.
+    """
+    @csrf_exempt
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        esquema, _, clave = request.headers.get('Authorization', '').partition(' ')
+        token = None
+        if esquema == 'Token' and clave.strip():
+            token = TokenTerminal.objects.filter(clave=TokenTerminal.resumen(clave.strip())).first()
+        if token is None:
+            respuesta = JsonResponse({'error': 'Falta un token de terminal válido.'}, status=401)
+            respuesta['WWW-Authenticate'] = 'Token'
+            return respuesta
+        if not token.activo:
+            return JsonResponse({'error': 'El token de terminal está desactivado.'}, status=403)
+        TokenTerminal.objects.filter(pk=token.pk).update(ultimo_uso=timezone.now())
+        request.terminal = token
+        return vista(request, *args, **kwargs)
+    return envoltura
+
 # -------------------- Paginación y Filtrado -------------------- #
-def paginar_queryset(request, queryset, default_filas=10):
+def paginar_queryset(request, queryset, default_filas=10, orden_cursor=None, contar=True):
+    """
+    Pagina ``queryset`` según ``page`` y ``filas``. Con ``orden_cursor`` (p. ej.
+    ``('-fecha', '-id_compra')``) pagina por cursor con ``cursor`` y
+    ``direccion``: sin OFFSET y, con ``contar=False``, sin COUNT(*).
+    Con ``contar='estimado'`` el total se estima por encima de
+    CONTEO_EXACTO_HASTA filas (ver gestion/conteo.py).
+    """
     search_query = request.GET.get('search', '')
     filas_por_pagina = request.GET.get('filas', default_filas)
     
@@ -40,15 +116,24 @@ def paginar_queryset(request, queryset, default_filas=10):
     except ValueError:
         filas_por_pagina = default_filas
 
-    paginator = Paginator(queryset, filas_por_pagina)
-    page_number = request.GET.get('page')
-    
-    try:
-        page_obj = paginator.page(page_number)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    if orden_cursor:
+        page_obj = paginar_por_cursor(
+            queryset, orden_cursor,
+            cursor=request.GET.get('cursor'),
+            direccion=request.GET.get('direccion', 'siguiente'),
+            filas=max(filas_por_pagina, 1),
+            contar=contar,
+        )
+    else:
+        paginator = (PaginadorEstimado if contar == 'estimado' else Paginator)(queryset, filas_por_pagina)
+        page_number = request.GET.get('page')
+        
+        try:
+            page_obj = paginator.page(page_number)
+        except PageNotAnInteger:
+            page_obj = paginator.page(1)
+        except EmptyPage:
+            page_obj = paginator.page(paginator.num_pages)
 
     context = {
         'page_obj': page_obj,
@@ -75,60 +160,32 @@ def register(request):
 
 @login_required
 def dashboard(request):
-    total_productos = Producto.objects.count()
-    total_clientes = Cliente.objects.count()
-    total_proveedores = Proveedor.objects.count()
-    
-    inicio_mes = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Cálculo de compras del mes
-    compras_mes = Compra.objects.filter(fecha__gte=inicio_mes).aggregate(
-        total=Sum('costo_total'), cantidad=Sum('cantidad')
-    )
-    
-    # Cálculo de ventas del mes 
-    ventas_mes = Venta.objects.filter(fecha_creacion__gte=inicio_mes).aggregate(
-        total=Sum('total'), 
-        cantidad=Sum('cantidad')
-    )
-    
-    # Productos más vendidos 
-    productos_mas_vendidos = Venta.objects.filter(fecha_creacion__gte=inicio_mes).values(
-        'id_producto__nombre'
-    ).annotate(
-        total_vendido=Sum('cantidad'),
-        total_ingresos=Sum('total')  
-    ).order_by('-total_vendido')[:5]
-    
-    # Últimas compras del mes para el dashboard
-    ultimas_compras = Compra.objects.filter(fecha__gte=inicio_mes).select_related(
-        'id_producto'
-    ).order_by('-fecha')[:5]
-    
-    context = {
-        'total_productos': total_productos,
-        'total_clientes': total_clientes,
-        'total_proveedores': total_proveedores,
-        'compras_mes': compras_mes['total'] or 0,
-        'ventas_mes': ventas_mes['total'] or 0,
-        'productos_mas_vendidos': productos_mas_vendidos,
-        'ultimas_compras': ultimas_compras,  
-    }
-    
-    return render(request, 'gestion/dashboard.html', context)
+    # Widgets cacheados por separado; ver gestion/dashboard.py
+    return render(request, 'gestion/dashboard.html', get_dashboard_data())
+
+@login_required_async
+async def dashboard_async(request):
+    # Los widgets sin caché se calculan a la vez; ver aget_dashboard_data()
+    context = await aget_dashboard_data()
+    # El render consulta request.user (procesadores de contexto): fuera del bucle de eventos
+    return await sync_to_async(render)(request, 'gestion/dashboard.html', context)
 
 # -------------------- Compras -------------------- #
 @login_required
 def compra_list(request):
-    compras_qs = Compra.objects.all().select_related('id_proveedor', 'id_producto').order_by('-fecha')
+    compras_qs = Compra.objects.all().select_related('id_proveedor', 'id_producto')
 
     if request.GET.get('search'):
         search_query = request.GET.get('search', '')
-        compras_qs = compras_qs.filter(
-            Q(numero_factura__icontains=search_query) |
-            Q(id_proveedor__empresa__icontains=search_query) |
-            Q(id_producto__nombre__icontains=search_query)
+        compras_qs = filtrar_busqueda(
+            compras_qs, search_query,
+            campos=('numero_factura',),
+            relaciones={'id_proveedor': ('empresa',), 'id_producto': ('nombre',)},
         )
+
+    # ?exportar=csv|xlsx descarga la lista filtrada completa, por streaming
+    if request.GET.get('exportar') in FORMATOS_EXPORTACION:
+        return exportar_queryset(request.GET['exportar'], 'compras', compras_qs.order_by(*ORDEN_COMPRAS), COLUMNAS_COMPRAS)
     
     if request.method == 'POST' and 'delete' in request.POST:
         compra_id = request.POST.get('compra_id')
@@ -146,7 +203,7 @@ def compra_list(request):
     if action == 'delete' and pk:
         compra_eliminar = get_object_or_404(Compra, pk=pk)
 
-    context = paginar_queryset(request, compras_qs, default_filas=10)
+    context = paginar_queryset(request, compras_qs, default_filas=10, orden_cursor=ORDEN_COMPRAS, contar='estimado')
     context['compras'] = context.pop('page_obj')
     context['compra_eliminar'] = compra_eliminar
     context['action'] = action
@@ -172,14 +229,8 @@ def compra_create(request):
 
             compra.save()
             
-            # Guardar en historial de precios 
-            producto = compra.id_producto
-            precio_sugerido = compra.precio
-            
-            HistorialPrecio.objects.create(
-                id_producto=producto,
-                precio_sugerido=precio_sugerido
-            )
+            # Guardar en historial de precios (solo si el precio cambió)
+            registrar_precio(compra.id_producto_id, compra.precio)
             
             messages.success(request, 'Compra registrada exitosamente.')
             return redirect('compra_list')
@@ -209,14 +260,8 @@ def compra_edit(request, pk):
 
             compra.save()
             
-            # Actualizar historial de precios 
-            producto = compra.id_producto
-            precio_sugerido = compra.precio
-            
-            HistorialPrecio.objects.create(
-                id_producto=producto,
-                precio_sugerido=precio_sugerido
-            )
+            # Guardar en historial de precios (solo si el precio cambió)
+            registrar_precio(compra.id_producto_id, compra.precio)
             
             messages.success(request, 'Compra actualizada exitosamente.')
             return redirect('compra_list')
@@ -225,18 +270,56 @@ def compra_edit(request, pk):
     
     return render(request, 'gestion/compras/formulario.html', {'form': form})
 
+@login_required
+def compra_importar(request):
+    """
+    Alta masiva de compras desde un CSV o XLSX (ver gestion/importar.py).
+    El formato se comprueba aquí; las filas se validan e importan en segundo
+    plano y los errores se muestran en la página de la tarea.
+    """
+    if request.method == 'POST':
+        form = ImportarComprasForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            filas = leer_filas(archivo, archivo.name)
+            try:
+                next(filas, None)
+            except ErrorImportacion as error:
+                messages.error(request, str(error))
+            else:
+                filas.close()
+                archivo.seek(0)
+                ruta = default_storage.save(f'importaciones/{archivo.name}', archivo)
+                # El archivo se borra al terminar: no tiene sentido reintentar
+                job = encolar('importar_compras', {
+                    'archivo': ruta,
+                    'nombre': archivo.name,
+                    'omitir_errores': form.cleaned_data['omitir_errores'],
+                }, usuario=request.user, max_intentos=1)
+                messages.info(request, 'La importación se encoló y se ejecutará en segundo plano.')
+                return redirect('job_detail', pk=job.pk)
+    else:
+        form = ImportarComprasForm()
+
+    return render(request, 'gestion/compras/importar.html', {
+        'form': form,
+        'columnas': COLUMNAS_IMPORTACION,
+    })
+
 # -------------------- Ventas -------------------- #
 @login_required
 def venta_list(request):
-    ventas_qs = Venta.objects.select_related('id_producto', 'id_cliente').order_by('-fecha_creacion')
+    ventas_qs = Venta.objects.select_related('id_producto', 'id_cliente')
 
     if request.GET.get('search'):
         search_query = request.GET.get('search', '')
-        ventas_qs = ventas_qs.filter(
-            Q(id_producto__nombre__icontains=search_query) |
-            Q(id_cliente__nombre__icontains=search_query) |
-            Q(id_cliente__apellido__icontains=search_query)
+        ventas_qs = filtrar_busqueda(
+            ventas_qs, search_query,
+            relaciones={'id_producto': ('nombre',), 'id_cliente': ('nombre', 'apellido')},
         )
+
+    if request.GET.get('exportar') in FORMATOS_EXPORTACION:
+        return exportar_queryset(request.GET['exportar'], 'ventas', ventas_qs.order_by(*ORDEN_VENTAS), COLUMNAS_VENTAS)
     
     # Manejar POST request para eliminar (desde modal)
     if request.method == 'POST' and 'delete' in request.POST:
@@ -255,7 +338,7 @@ def venta_list(request):
     if action == 'delete' and pk:
         venta_eliminar = get_object_or_404(Venta, pk=pk)
 
-    context = paginar_queryset(request, ventas_qs, default_filas=10)
+    context = paginar_queryset(request, ventas_qs, default_filas=10, orden_cursor=ORDEN_VENTAS, contar='estimado')
     context['ventas'] = context.pop('page_obj')
     context['venta_eliminar'] = venta_eliminar
     context['action'] = action
@@ -276,24 +359,11 @@ def venta_create(request):
     else:
         form = VentaForm()
 
-    # Precios recomendados por producto
-    ultimos_precios = HistorialPrecio.objects.values('id_producto') \
-        .annotate(ultima_fecha=Max('fecha'))
-
-    precios_recomendados = {}
-    for item in ultimos_precios:
-        historial = HistorialPrecio.objects.get(
-            id_producto=item['id_producto'],
-            fecha=item['ultima_fecha']
-        )
-        precios_recomendados[item['id_producto']] = float(historial.precio_sugerido)
-
     # Últimas ventas
     ultimas_ventas = Venta.objects.select_related('id_producto').order_by('-id_venta')[:5]
 
     context = {
         'form': form,
-        'precios_recomendados': precios_recomendados,
         'ultimas_ventas': ultimas_ventas,
     }
 
@@ -314,25 +384,12 @@ def venta_edit(request, pk):
             messages.error(request, 'Error al actualizar la venta. Revisa los datos.')
     else:
         form = VentaForm(instance=venta)
-        
-        # Precios recomendados para el formulario de edición
-        ultimos_precios = HistorialPrecio.objects.values('id_producto') \
-            .annotate(ultima_fecha=Max('fecha'))
-
-        precios_recomendados = {}
-        for item in ultimos_precios:
-            historial = HistorialPrecio.objects.get(
-                id_producto=item['id_producto'],
-                fecha=item['ultima_fecha']
-            )
-            precios_recomendados[item['id_producto']] = float(historial.precio_sugerido)
     
     # Últimas ventas
     ultimas_ventas = Venta.objects.select_related('id_producto').order_by('-id_venta')[:5]
     
     context = {
         'form': form,
-        'precios_recomendados': precios_recomendados,
         'ultimas_ventas': ultimas_ventas,
         'venta': venta,
     }
@@ -342,53 +399,58 @@ def venta_edit(request, pk):
 # -------------------- Inventario -------------------- #
 @login_required
 def inventario_list(request):
-    inventario = get_inventario_data()
     search_query = request.GET.get('search', '')
-    
-    # Filtrar por búsqueda
-    if search_query:
-        inventario = [
-            i for i in inventario 
-            if search_query.lower() in i['nombre'].lower() 
-            or (i['marca'] and search_query.lower() in i['marca'].lower())
-        ]
-    
-    # Filtrar por stock
     stock_filter = request.GET.get('stock', '')
-    if stock_filter:
-        if stock_filter == 'critico':
-            inventario = [i for i in inventario if i['stock_actual'] <= 2]
-        elif stock_filter == 'bajo':
-            inventario = [i for i in inventario if 3 <= i['stock_actual'] <= 5]
-        elif stock_filter == 'agotado':
-            inventario = [i for i in inventario if i['stock_actual'] <= 0]
-        elif stock_filter == 'normal':
-            inventario = [i for i in inventario if i['stock_actual'] > 5]
-    
-    # Ordenar
     sort_by = request.GET.get('sort', '')
-    if sort_by:
-        reverse = sort_by.startswith('-')
-        key = sort_by.lstrip('-')
-        inventario.sort(key=lambda x: x.get(key, ''), reverse=reverse)
-    else:
-        # Orden por defecto por nombre
-        inventario.sort(key=lambda x: x['nombre'].lower())
     
-    # Configurar paginación
-    filas_por_pagina = int(request.GET.get('filas', 10))
-    paginator = Paginator(inventario, filas_por_pagina)
+    # Inventario a una fecha pasada (YYYY-MM-DD)
+    as_of = None
+    if request.GET.get('as_of'):
+        try:
+            as_of = datetime.strptime(request.GET.get('as_of'), '%Y-%m-%d').date()
+        except ValueError:
+            messages.error(request, 'Fecha de inventario inválida, se muestra el inventario actual.')
+
+    if request.GET.get('exportar') in FORMATOS_EXPORTACION:
+        return _exportar_inventario(request.GET['exportar'], search_query, stock_filter, sort_by, as_of)
     
-    page_number = request.GET.get('page')
+    # Configurar paginación
     try:
-        page_obj = paginator.get_page(page_number)
-    except PageNotAnInteger:
-        page_obj = paginator.get_page(1)
-    except EmptyPage:
-        page_obj = paginator.get_page(paginator.num_pages)
+        filas_por_pagina = int(request.GET.get('filas', 10))
+    except ValueError:
+        filas_por_pagina = 10
     
-    # Calcular estadísticas del inventario completo 
-    estadisticas = get_estadisticas_inventario(inventario)
+    if search_query and not as_of:
+        # La búsqueda de texto se resuelve en la base de datos
+        inventario_qs = get_inventario_queryset(search_query, stock_filter, sort_by)
+        paginator = Paginator(inventario_qs, filas_por_pagina)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        
+        # Solo se construyen las filas de la página actual
+        page_obj.object_list = filas_inventario(page_obj.object_list)
+        
+        # Estadísticas del inventario filtrado en una sola consulta
+        estadisticas = get_estadisticas_queryset(inventario_qs)
+        
+        # Productos que necesitan atención (los de menor stock primero)
+        productos_atencion = filas_inventario(
+            inventario_qs.filter(stock_actual__lte=5).order_by('stock_actual', 'nombre')[:LIMITE_PRODUCTOS_ATENCION]
+        )
+    else:
+        if as_of:
+            snapshot = InventarioSnapshot(_inventario_a_fecha(as_of, search_query))
+        else:
+            # Sin búsqueda se usa el snapshot en memoria del worker, ya ordenado
+            snapshot = get_inventario_snapshot()
+        inventario_vista = snapshot.vista(sort_by, stock_filter)
+        paginator = Paginator(inventario_vista, filas_por_pagina)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        
+        if stock_filter in FILTROS_STOCK or as_of:
+            estadisticas = inventario_vista.estadisticas()
+        else:
+            estadisticas = get_estadisticas_inventario()
+        productos_atencion = inventario_vista.atencion(LIMITE_PRODUCTOS_ATENCION)
     
     context = {
         'inventario': page_obj.object_list, 
@@ -401,11 +463,32 @@ def inventario_list(request):
         'productos_bajo_stock': estadisticas['productos_bajo_stock'],
         'productos_criticos': estadisticas['productos_criticos'],
         'productos_agotados': estadisticas['productos_agotados'],
+        'productos_atencion': productos_atencion,
+        'as_of': as_of.isoformat() if as_of else '',
         'ahora': timezone.now(),
         'opciones_filas': [5, 10, 20, 50, 100],  
     }
     return render(request, 'gestion/inventario/lista.html', context)
 
+def _inventario_a_fecha(as_of, search_query=''):
+    # El inventario a una fecha se reproduce desde los cierres mensuales (cacheado por fecha)
+    filas = get_inventario_data(as_of)
+    if search_query:
+        busqueda = search_query.lower()
+        filas = [f for f in filas if busqueda in f['nombre'].lower() or busqueda in f['marca'].lower()]
+    return filas
+
+def _exportar_inventario(formato, search_query, stock_filter, sort_by, as_of):
+    if not as_of:
+        queryset = get_inventario_queryset(search_query, stock_filter, sort_by)
+        return exportar_queryset(formato, 'inventario', queryset, COLUMNAS_INVENTARIO)
+    # A una fecha pasada hay una fila por producto, ya calculada en memoria
+    vista = InventarioSnapshot(_inventario_a_fecha(as_of, search_query)).vista(sort_by, stock_filter)
+    encabezados = [encabezado for encabezado, _ in COLUMNAS_INVENTARIO]
+    campos = [campo for _, campo in COLUMNAS_INVENTARIO]
+    filas = ([fila[campo] for campo in campos] for fila in vista)
+    return respuesta_exportacion(formato, f'inventario_{as_of:%Y%m%d}', encabezados, filas)
+
 # -------------------- Historial de Precios -------------------- #
 @login_required
 def historial_precio_list(request):
@@ -413,12 +496,13 @@ def historial_precio_list(request):
 
     if request.GET.get('search'):
         search_query = request.GET.get('search', '')
-        historial_qs = historial_qs.filter(
-            id_producto__nombre__icontains=search_query
-        )
+        historial_qs = filtrar_busqueda(historial_qs, search_query, relaciones={'id_producto': ('nombre',)})
 
     historial_qs = historial_qs.order_by('id_producto', '-fecha')
-    context = paginar_queryset(request, historial_qs, default_filas=10)
+    if request.GET.get('exportar') in FORMATOS_EXPORTACION:
+        return exportar_queryset(request.GET['exportar'], 'historial_precios', historial_qs, COLUMNAS_HISTORIAL)
+
+    context = paginar_queryset(request, historial_qs, default_filas=10, contar='estimado')
     context['historial'] = context.pop('page_obj')
     
     total_productos = Producto.objects.count()
@@ -534,28 +618,15 @@ def clientes_view(request):
             # Preparar formulario vacío para creación
             form = ClienteForm()
     
-    clientes_qs = Cliente.objects.all().order_by('-fecha_creacion')
+    clientes_qs = Cliente.objects.all()
     
     if search_query:
-        clientes_qs = clientes_qs.filter(
-            Q(nombre__icontains=search_query) |
-            Q(apellido__icontains=search_query)
-        )
+        clientes_qs = filtrar_busqueda(clientes_qs, search_query, campos=('nombre', 'apellido'))
     
     # Paginación
-    filas_por_pagina = request.GET.get('filas', 10)
-    try:
-        filas_por_pagina = int(filas_por_pagina)
-    except ValueError:
-        filas_por_pagina = 10
-    
-    paginator = Paginator(clientes_qs, filas_por_pagina)
-    page_number = request.GET.get('page', 1)
-    
-    try:
-        clientes = paginator.page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        clientes = paginator.page(1)
+    paginacion = paginar_queryset(request, clientes_qs, default_filas=10, orden_cursor=ORDEN_CLIENTES)
+    clientes = paginacion['page_obj']
+    filas_por_pagina = paginacion['filas_por_pagina']
     
     # Si no hay formulario activo, crear uno vacío para el formulario principal
     if form is None:
@@ -684,29 +755,15 @@ def productos_view(request):
             # Preparar formulario vacío para creación
             form = ProductoForm()
     
-    productos_qs = Producto.objects.all().order_by('-fecha_creacion')
+    productos_qs = Producto.objects.all()
     
     if search_query:
-        productos_qs = productos_qs.filter(
-            Q(nombre__icontains=search_query) |
-            Q(marca__icontains=search_query) |
-            Q(categoria__icontains=search_query)
-        )
+        productos_qs = filtrar_busqueda(productos_qs, search_query, campos=('nombre', 'marca'))
     
     # Paginación
-    filas_por_pagina = request.GET.get('filas', 10)
-    try:
-        filas_por_pagina = int(filas_por_pagina)
-    except ValueError:
-        filas_por_pagina = 10
-    
-    paginator = Paginator(productos_qs, filas_por_pagina)
-    page_number = request.GET.get('page', 1)
-    
-    try:
-        productos = paginator.page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        productos = paginator.page(1)
+    paginacion = paginar_queryset(request, productos_qs, default_filas=10, orden_cursor=ORDEN_PRODUCTOS)
+    productos = paginacion['page_obj']
+    filas_por_pagina = paginacion['filas_por_pagina']
     
     # Si no hay formulario activo, crear uno vacío para el formulario principal
     if form is None:
@@ -822,30 +879,15 @@ def proveedores_view(request):
             form = ProveedorForm()
     
      
-    proveedores_qs = Proveedor.objects.all().order_by('-fecha_creacion')
+    proveedores_qs = Proveedor.objects.all()
     
     if search_query:
-        proveedores_qs = proveedores_qs.filter(
-            Q(empresa__icontains=search_query) |
-            Q(contacto__icontains=search_query) |
-            Q(productos__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
+        proveedores_qs = filtrar_busqueda(proveedores_qs, search_query, campos=('empresa', 'telefono', 'productos'))
     
     # Paginación
-    filas_por_pagina = request.GET.get('filas', 10)
-    try:
-        filas_por_pagina = int(filas_por_pagina)
-    except ValueError:
-        filas_por_pagina = 10
-    
-    paginator = Paginator(proveedores_qs, filas_por_pagina)
-    page_number = request.GET.get('page', 1)
-    
-    try:
-        proveedores = paginator.page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        proveedores = paginator.page(1)
+    paginacion = paginar_queryset(request, proveedores_qs, default_filas=10, orden_cursor=ORDEN_PROVEEDORES)
+    proveedores = paginacion['page_obj']
+    filas_por_pagina = paginacion['filas_por_pagina']
     
     # Si no hay formulario activo, crear uno vacío para el formulario principal
     if form is None:
@@ -868,12 +910,8 @@ def proveedores_view(request):
 
 
 # -------------------- Análisis de Ventas -------------------- #
-@login_required
-def analisis_ventas_list(request):
-    # Obtener filtros del formulario
-    form = AnalisisVentaFilterForm(request.GET or None)
-    
-    # Consulta base
+def _filtrar_analisis(request):
+    """Consulta de análisis de ventas con los filtros de la petición"""
     analisis_qs = AnalisisVenta.objects.all()
     
     # Aplicar filtros de fecha
@@ -900,14 +938,40 @@ def analisis_ventas_list(request):
         )
     
     # Ordenar por fecha descendente
-    analisis_qs = analisis_qs.order_by('-fecha')
-    
-    # Calcular totales generales
-    total_general = analisis_qs.aggregate(
+    return analisis_qs.order_by('-fecha'), fecha_inicio, fecha_fin, search_query
+
+def _totales_analisis(analisis_qs):
+    return analisis_qs.aggregate(
         total_ventas=Sum('total_ventas'),
         total_ganancia=Sum('promedio_ganancia'),
         total_ahorro=Sum('ahorro')
     )
+
+def _paginar_analisis(request, analisis_qs):
+    context = paginar_queryset(request, analisis_qs, default_filas=10)
+    # Se evalúa aquí la página para que las consultas ocurran en este hilo
+    list(context['page_obj'].object_list)
+    return context
+
+def _contexto_analisis(request, context, total_general, fecha_inicio, fecha_fin, search_query):
+    context['analisis_list'] = context.pop('page_obj')
+    context['form'] = AnalisisVentaFilterForm(request.GET or None)
+    context['search_query'] = search_query
+    context['total_general'] = total_general
+    
+    # Agregar los parámetros de filtro al contexto para mantenerlos en la paginación
+    if fecha_inicio:
+        context['fecha_inicio'] = fecha_inicio
+    if fecha_fin:
+        context['fecha_fin'] = fecha_fin
+    return context
+
+@login_required
+def analisis_ventas_list(request):
+    analisis_qs, fecha_inicio, fecha_fin, search_query = _filtrar_analisis(request)
+    
+    # Calcular totales generales
+    total_general = _totales_analisis(analisis_qs)
     
     # Manejar solicitudes para recalcular análisis
     if request.method == 'POST' and 'recalcular' in request.POST:
@@ -924,38 +988,257 @@ def analisis_ventas_list(request):
     
     # Paginación
     context = paginar_queryset(request, analisis_qs, default_filas=10)
-    context['analisis_list'] = context.pop('page_obj')
-    context['form'] = form
-    context['search_query'] = search_query
-    context['total_general'] = total_general
-    
-    # Agregar los parámetros de filtro al contexto para mantenerlos en la paginación
-    if fecha_inicio:
-        context['fecha_inicio'] = fecha_inicio
-    if fecha_fin:
-        context['fecha_fin'] = fecha_fin
-    
+    context = _contexto_analisis(request, context, total_general, fecha_inicio, fecha_fin, search_query)
     return render(request, 'gestion/analisis_ventas/lista.html', context)
 
+@login_required_async
+@require_GET
+async def analisis_ventas_list_async(request):
+    # Totales, conteo y página se consultan a la vez
+    analisis_qs, fecha_inicio, fecha_fin, search_query = _filtrar_analisis(request)
+    total_general, context = await en_paralelo(
+        partial(_totales_analisis, analisis_qs),
+        partial(_paginar_analisis, request, analisis_qs),
+    )
+    context = _contexto_analisis(request, context, total_general, fecha_inicio, fecha_fin, search_query)
+    return await sync_to_async(render)(request, 'gestion/analisis_ventas/lista.html', context)
+
 @login_required
 def analisis_ventas_recalcular_todo(request):
-    """Vista para recalcular todo el histórico"""
+    """Vista para recalcular todo el histórico (o un rango de fechas)"""
     if request.method == 'POST':
-        # Obtener todas las fechas únicas de ventas
-        from django.db.models import Count
-        
-        fechas_ventas = Venta.objects.annotate(
-            fecha_venta=TruncDate('fecha_creacion')
-        ).values('fecha_venta').annotate(
-            total=Count('id_venta')
-        ).order_by('fecha_venta')
-        
-        total_recalculado = 0
-        for item in fechas_ventas:
-            actualizar_analisis_fecha(item['fecha_venta'])
-            total_recalculado += 1
+        try:
+            desde = datetime.strptime(request.POST['desde'], '%Y-%m-%d').date() if request.POST.get('desde') else None
+            hasta = datetime.strptime(request.POST['hasta'], '%Y-%m-%d').date() if request.POST.get('hasta') else None
+        except ValueError:
+            messages.error(request, 'Rango de fechas inválido (formato YYYY-MM-DD).')
+            return redirect('analisis_ventas_recalcular_todo')
         
-        messages.success(request, f'{total_recalculado} días recalculados exitosamente.')
-        return redirect('analisis_ventas_list')
-    
-    return render(request, 'gestion/analisis_ventas/recalcular.html')
\ No newline at end of file
+        # Se ejecuta en segundo plano (manage.py run_workers) para no bloquear el worker web
+        job = encolar('recalcular_analisis', {
+            'desde': desde.isoformat() if desde else None,
+            'hasta': hasta.isoformat() if hasta else None,
+        }, usuario=request.user)
+        messages.info(request, 'El recálculo se encoló y se ejecutará en segundo plano.')
+        return redirect('job_detail', pk=job.pk)
+    
+    return render(request, 'gestion/analisis_ventas/recalcular.html')
+
+# -------------------- Tareas en segundo plano -------------------- #
+# Página a la que vuelve el detalle de cada tipo de tarea
+VOLVER_TAREAS = {
+    'importar_compras': 'compra_list',
+    'recalcular_analisis': 'analisis_ventas_list',
+    'recalcular_stock': 'inventario_list',
+    'construir_cierres': 'inventario_list',
+    'reconstruir_resumenes': 'analisis_ventas_list',
+    'compactar_precios': 'historial_precio_list',
+}
+
+@login_required
+def job_detail(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return render(request, 'gestion/jobs/detalle.html', {
+        'job': job,
+        'volver': VOLVER_TAREAS.get(job.tipo, 'dashboard'),
+    })
+
+# -------------------- API -------------------- #
+# Máximo de productos por consulta a la API de precios
+MAX_IDS_API_PRECIOS = 100
+
+def _ids_productos(request):
+    """Lista ordenada y sin repetidos de ids en ?ids=1,2,3 (o ?id=1&id=2); None si es inválida"""
+    valores = request.GET.getlist('id') + request.GET.get('ids', '').split(',')
+    try:
+        ids = sorted({int(valor) for valor in valores if valor.strip()})
+    except ValueError:
+        return None
+    return ids if 0 < len(ids) <= MAX_IDS_API_PRECIOS else None
+
+def _etag_precios(request):
+    # Cambia con cualquier escritura sobre el inventario o los precios
+    ids = _ids_productos(request)
+    if ids is None:
+        return None
+    return f'W/"precios-{get_version_inventario()}-{".".join(map(str, ids))}"'
+
+@login_required
+@require_GET
+@condition(etag_func=_etag_precios)
+def api_precios_productos(request):
+    """
+    Precio sugerido vigente y stock disponible de uno o varios productos.
+    Uso: /api/productos/precios/?ids=1,2,3
+    """
+    ids = _ids_productos(request)
+    if ids is None:
+        return JsonResponse(
+            {'error': f'Indica entre 1 y {MAX_IDS_API_PRECIOS} ids numéricos en el parámetro ids.'},
+            status=400
+        )
+
+    productos = {
+        str(producto_id): {
+            'precio_sugerido': float(precio) if id_precio is not None else None,
+            'stock_actual': stock,
+        }
+        for producto_id, precio, id_precio, stock in StockProducto.objects.filter(
+            id_producto__in=ids
+        ).values_list('id_producto', 'precio_venta', 'id_precio', 'stock_actual')
+    }
+    response = JsonResponse({'productos': productos})
+    # El navegador puede guardarla, pero debe revalidar con el ETag en cada uso
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+# Cubetas por defecto y máximas de la serie de precios
+CUBETAS_SERIE_PRECIOS = 100
+MAX_CUBETAS_SERIE_PRECIOS = 1000
+
+@login_required
+@require_GET
+def api_serie_precios(request, pk):
+    """
+    Serie de precios de un producto reducida en el servidor a N cubetas
+    (min/max/último de cada una). Uso:
+    /api/productos/<id>/precios/serie/?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&cubetas=100
+    Por defecto cubre el último año. La respuesta JSON se genera por partes.
+    """
+    if not Producto.objects.filter(pk=pk).exists():
+        return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+
+    try:
+        hasta = timezone.now()
+        if request.GET.get('hasta'):
+            dia = datetime.strptime(request.GET['hasta'], '%Y-%m-%d').date()
+            hasta = timezone.make_aware(datetime.combine(dia, time.max))
+        desde = hasta - timedelta(days=365)
+        if request.GET.get('desde'):
+            dia = datetime.strptime(request.GET['desde'], '%Y-%m-%d').date()
+            desde = timezone.make_aware(datetime.combine(dia, time.min))
+        cubetas = int(request.GET.get('cubetas', CUBETAS_SERIE_PRECIOS))
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos (fechas YYYY-MM-DD, cubetas entero).'}, status=400)
+    if desde >= hasta or not 1 <= cubetas <= MAX_CUBETAS_SERIE_PRECIOS:
+        return JsonResponse(
+            {'error': f'El rango debe ser creciente y cubetas estar entre 1 y {MAX_CUBETAS_SERIE_PRECIOS}.'},
+            status=400
+        )
+
+    def generar():
+        cabecera = {
+            'producto': pk,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'cubetas': cubetas,
+            # Precio vigente al inicio del rango, para dibujar desde el primer punto
+            'inicial': precio_vigente(pk, desde),
+        }
+        yield json.dumps(cabecera)[:-1] + ', "puntos": ['
+        for i, punto in enumerate(serie_precios(pk, desde, hasta, cubetas)):
+            yield (',' if i else '') + json.dumps(punto)
+        yield ']}'
+
+    return StreamingHttpResponse(generar(), content_type='application/json')
+
+# Resultados por tipo en la búsqueda global
+LIMITE_BUSQUEDA_GLOBAL = 5
+MAX_LIMITE_BUSQUEDA_GLOBAL = 50
+
+@login_required
+@require_GET
+def api_buscar(request):
+    """
+    Búsqueda global en clientes, productos, proveedores, facturas de compra
+    e ids de venta, en una sola consulta al índice unificado. Uso:
+    /api/buscar/?q=texto&limite=5&tipos=cliente,producto
+    Devuelve los ``limite`` mejores de cada tipo, agrupados y ordenados por relevancia.
+    """
+    texto = request.GET.get('q', '').strip()
+    tipos_validos = dict(IndiceBusqueda.TIPOS)
+    tipos = [tipo for tipo in request.GET.get('tipos', '').split(',') if tipo]
+    try:
+        limite = int(request.GET.get('limite', LIMITE_BUSQUEDA_GLOBAL))
+    except ValueError:
+        limite = 0
+    if not 1 <= limite <= MAX_LIMITE_BUSQUEDA_GLOBAL or any(tipo not in tipos_validos for tipo in tipos):
+        return JsonResponse(
+            {'error': f'limite debe estar entre 1 y {MAX_LIMITE_BUSQUEDA_GLOBAL} y tipos ser de: {", ".join(tipos_validos)}.'},
+            status=400
+        )
+
+    resultados = [
+        {
+            'tipo': tipo,
+            'etiqueta': tipos_validos[tipo],
+            'resultados': [
+                {
+                    'id': fila['objeto_id'],
+                    'titulo': fila['titulo'],
+                    'detalle': fila['detalle'],
+                    'url': url_resultado(tipo, fila['objeto_id']),
+                    'relevancia': round(float(fila['relevancia']), 4),
+                }
+                for fila in filas
+            ],
+        }
+        for tipo, filas in buscar_global(texto, limite, tipos).items()
+    ]
+    return JsonResponse({'q': texto, 'grupos': resultados})
+
+# Opciones por respuesta de los selects con autocompletado
+LIMITE_AUTOCOMPLETAR = 20
+TIPOS_AUTOCOMPLETAR = (IndiceBusqueda.CLIENTE, IndiceBusqueda.PRODUCTO, IndiceBusqueda.PROVEEDOR)
+
+@login_required
+@require_GET
+def api_autocompletar(request, tipo):
+    """
+    Opciones para los selects de producto, cliente y proveedor: las primeras
+    cuyo nombre empieza por ``q``, por el índice (tipo, clave). Uso:
+    /api/autocompletar/producto/?q=texto
+    """
+    if tipo not in TIPOS_AUTOCOMPLETAR:
+        return JsonResponse({'error': f'Tipo no válido; usa: {", ".join(TIPOS_AUTOCOMPLETAR)}.'}, status=404)
+    filas = autocompletar(tipo, request.GET.get('q', ''), LIMITE_AUTOCOMPLETAR)
+    return JsonResponse({
+        'resultados': [
+            {'id': fila['objeto_id'], 'texto': fila['titulo'], 'detalle': fila['detalle']}
+            for fila in filas
+        ],
+    })
+
+# Ventas por petición en el alta por lotes
+MAX_VENTAS_LOTE = 1000
+
+@token_terminal_requerido
+@require_POST
+def api_ventas_lote(request):
+    """
+    Alta de ventas por lotes para los terminales de punto de venta. Recibe
+    una lista JSON de ventas {"producto", "cliente" (opcional), "precio",
+    "cantidad"} y da de alta las válidas en una transacción; las demás se
+    devuelven con sus errores por posición. El terminal se autentica con su
+    token, no con la sesión.
+    """
+    try:
+        filas = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        filas = None
+    if not isinstance(filas, list) or not 1 <= len(filas) <= MAX_VENTAS_LOTE:
+        return JsonResponse(
+            {'error': f'El cuerpo debe ser una lista JSON de entre 1 y {MAX_VENTAS_LOTE} ventas.'},
+            status=400
+        )
+
+    resultado = registrar_ventas(filas)
+    return JsonResponse({
+        'recibidas': len(filas),
+        'creadas': len(resultado.ventas),
+        'ventas': [
+            {'indice': indice, 'id': venta.pk, 'total': str(venta.total)}
+            for indice, venta in resultado.ventas
+        ],
+        'errores': [{'indice': indice, 'errores': errores} for indice, errores in resultado.errores],
+    }, status=201 if resultado.ventas else 400)
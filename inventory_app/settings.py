@@ -82,6 +82,47 @@ DATABASES = {
 database_url = os.environ.get("DATABASE_URL")
 DATABASES["default"] = dj_database_url.parse(database_url)
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Las versiones que invalidan el inventario y el dashboard están en la base de
+# datos (gestion/cache.py), así que LocMemCache es correcta con varios procesos;
+# un backend compartido solo evita que cada worker recalcule su propia copia:
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# CACHE_LOCATION=/var/tmp/inventario_cache
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "inventario"),
+    }
+}
+
+# Segundos que se conserva una versión cacheada del inventario
+INVENTARIO_CACHE_TIMEOUT = int(os.environ.get("INVENTARIO_CACHE_TIMEOUT", 300))
+
+# Segundos máximos que cada worker reutiliza su snapshot del inventario
+# aunque la versión no cambie (cubre escrituras hechas sin señales)
+INVENTARIO_SNAPSHOT_TTL = int(os.environ.get("INVENTARIO_SNAPSHOT_TTL", 60))
+
+# Segundos que vive cada widget del dashboard aunque no haya escrituras
+# (los no indicados usan los valores de gestion/dashboard.py)
+DASHBOARD_CACHE_TTL = {
+    'conteos': int(os.environ.get("DASHBOARD_TTL_CONTEOS", 600)),
+    'resumen_mes': int(os.environ.get("DASHBOARD_TTL_RESUMEN_MES", 120)),
+}
+
+# Listas y changelists grandes: total exacto hasta este número de filas;
+# por encima, estimado por la base de datos o cacheado estos segundos
+CONTEO_EXACTO_HASTA = int(os.environ.get("CONTEO_EXACTO_HASTA", 10000))
+CONTEO_CACHE_TIMEOUT = int(os.environ.get("CONTEO_CACHE_TIMEOUT", 300))
+
+# Retención del historial de precios (manage.py compact_price_history):
+# lo anterior a estos días se reduce a un precio por día / por mes
+HISTORIAL_PRECIOS_RETENCION = {
+    'diario_despues_de_dias': int(os.environ.get("HISTORIAL_PRECIOS_DIAS_DIARIO", 90)),
+    'mensual_despues_de_dias': int(os.environ.get("HISTORIAL_PRECIOS_DIAS_MENSUAL", 365)),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -118,6 +159,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Archivos subidos que procesa un worker (importación de compras); web y
+# workers deben compartir este directorio
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -96,6 +96,49 @@ $(document).ready(function() {
             showToast('info', 'Actualización automática', 'Desactivada');
         }
     });
+
+    // ===== AUTOCOMPLETAR EN SELECTS GRANDES =====
+    // El select llega solo con la opción elegida: las demás se piden al servidor al escribir
+    $('select[data-autocompletar]').each(function() {
+        const $select = $(this);
+        const url = $select.data('autocompletar');
+        const $buscador = $('<input type="search" class="form-control form-control-sm mb-1" autocomplete="off">')
+            .attr('placeholder', 'Escribe para buscar...');
+        let temporizador = null;
+        let consultaActual = null;
+
+        function cargarOpciones(texto) {
+            consultaActual = texto;
+            $.getJSON(url, {q: texto}).done(function(data) {
+                if (consultaActual !== texto) {
+                    return;
+                }
+                const elegido = $select.val();
+                $select.find('option').filter(function() {
+                    return this.value && this.value !== elegido;
+                }).remove();
+                data.resultados.forEach(function(resultado) {
+                    if (String(resultado.id) !== elegido) {
+                        $('<option>').val(resultado.id)
+                            .text(resultado.detalle ? `${resultado.texto} (${resultado.detalle})` : resultado.texto)
+                            .appendTo($select);
+                    }
+                });
+            });
+        }
+
+        $select.before($buscador);
+        $buscador.on('input', function() {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(cargarOpciones, 250, $buscador.val().trim());
+        });
+        // Primeras opciones al abrir el select sin haber buscado
+        $select.one('focus mousedown', function() {
+            if (consultaActual === null) {
+                cargarOpciones('');
+            }
+        });
+    });
 });
 
 // ===== FUNCIONES GLOBALES =====